@@ -0,0 +1 @@
+"""Benchmarks for the routing engine; run with ``python -m benchmarks.<name>``"""
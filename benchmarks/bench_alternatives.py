@@ -0,0 +1,204 @@
+"""
+k alternative routes: the plateau method on cached forward/reverse trees
+against Yen's k shortest simple paths.
+
+    python -m benchmarks.bench_alternatives --nodes 100000 --queries 20 --k 3
+
+Plateau alternatives are timed cold (both trees searched), with the reverse
+tree into the destination already cached (a hospital, as in the GUI) and
+fully warm. Yen's algorithm runs on a smaller graph (``--yen-nodes``) since
+it needs a search per spur node; it is the baseline for latency and for how
+different its routes are. Every plateau answer is checked: the first route
+must equal Dijkstra's, each route must visit no node twice, its cost must
+match its edges and lie within the stretch bound, and no later route may
+share more than the overlap limit with the routes before it. The script
+exits with status 1 on any violation.
+"""
+import argparse
+import heapq
+import sys
+import time
+
+from routing import dijkstra
+from routing.alternatives import alternative_routes
+from routing.cache import RouteCache
+from routing.search import INF
+
+from .common import random_geometric_graph, random_queries, summarize
+
+
+def banned_dijkstra(graph, source, target, banned_nodes, banned_edges):
+    """Dijkstra from ``source`` to ``target`` avoiding the given nodes and (u, v) edges"""
+    offsets, targets, weights = graph.adjacency_lists()
+    distances = {source: 0.0}
+    previous = {source: -1}
+    done = set()
+    heap = [(0.0, source)]
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        done.add(node)
+        if node == target:
+            path = [node]
+            while previous[path[-1]] != -1:
+                path.append(previous[path[-1]])
+            return path[::-1], dist
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = targets[i]
+            if neighbour in banned_nodes or (node, neighbour) in banned_edges:
+                continue
+            new_distance = dist + weights[i]
+            if new_distance < distances.get(neighbour, INF):
+                distances[neighbour] = new_distance
+                previous[neighbour] = node
+                heapq.heappush(heap, (new_distance, neighbour))
+    return None, INF
+
+
+def yen(graph, source, target, k):
+    """Yen's k shortest simple paths as [(path, cost)]"""
+    def cost_of(path):
+        return sum(float(graph.weights[graph.edge_index(u, v)]) for u, v in zip(path, path[1:]))
+
+    path, cost = banned_dijkstra(graph, source, target, set(), set())
+    if path is None:
+        return []
+    found = [(path, cost)]
+    candidates, seen = [], {tuple(path)}
+    while len(found) < k:
+        last = found[-1][0]
+        for i in range(len(last) - 1):
+            root = last[:i + 1]
+            banned_edges = {(p[i], p[i + 1]) for p, _ in found if p[:i + 1] == root}
+            spur, spur_cost = banned_dijkstra(graph, last[i], target, set(root[:-1]), banned_edges)
+            if spur is None:
+                continue
+            candidate = root[:-1] + spur
+            if tuple(candidate) not in seen:
+                seen.add(tuple(candidate))
+                heapq.heappush(candidates, (cost_of(root) + spur_cost, candidate))
+        if not candidates:
+            break
+        cost, path = heapq.heappop(candidates)
+        found.append((path, cost))
+    return found
+
+
+def shared_share(graph, path, others):
+    """Share of ``path``'s cost on edges used by any of ``others``"""
+    used = {edge for other in others for edge in zip(other, other[1:])}
+    costs = [float(graph.weights[graph.edge_index(u, v)]) for u, v in zip(path, path[1:])]
+    total = sum(costs)
+    return sum(c for c, edge in zip(costs, zip(path, path[1:])) if edge in used) / total if total else 0.0
+
+
+def check(graph, routes, best, stretch, overlap):
+    """Return the number of rule violations in one plateau answer"""
+    violations = 0
+    if routes and abs(routes[0].distance - best) > 1e-6 * max(1.0, best):
+        violations += 1
+    for i, route in enumerate(routes):
+        path = route.path
+        edge_cost = sum(float(graph.weights[graph.edge_index(u, v)]) for u, v in zip(path, path[1:]))
+        if len(set(path)) != len(path) or abs(edge_cost - route.distance) > 1e-6 * max(1.0, best):
+            violations += 1
+        if route.distance > best * (1 + stretch) + 1e-9:
+            violations += 1
+        if i and shared_share(graph, path, [r.path for r in routes[:i]]) > overlap + 1e-9:
+            violations += 1
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--yen-nodes", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--stretch", type=float, default=0.25)
+    parser.add_argument("--overlap", type=float, default=0.7)
+    args = parser.parse_args()
+
+    graph = random_geometric_graph(args.nodes, seed=13)
+    queries = random_queries(graph, args.queries, seed=3)
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges")
+    graph.reverse()
+    graph.adjacency_lists()
+    graph.reverse().adjacency_lists()
+
+    # Cold: a fresh cache for every query, so both trees are searched
+    cold, counts, violations = [], [], 0
+    for source, target in queries:
+        cache = RouteCache()
+        started = time.perf_counter()
+        routes = alternative_routes(cache.tree(graph, source), cache.reverse_tree(graph, target),
+                                    args.k, args.stretch, args.overlap)
+        cold.append(time.perf_counter() - started)
+        counts.append(len(routes))
+        best = dijkstra(graph, source, target)[0][target]
+        if best == INF:
+            violations += len(routes) != 0
+        else:
+            violations += check(graph, routes, best, args.stretch, args.overlap)
+
+    # Reverse tree into the destination already cached, as for a hospital
+    hospital, warm = [], []
+    cache = RouteCache(maxsize=4 * args.queries)
+    hospital_node = queries[0][1]
+    cache.reverse_tree(graph, hospital_node)
+    for source, _ in queries:
+        started = time.perf_counter()
+        alternative_routes(cache.tree(graph, source), cache.reverse_tree(graph, hospital_node),
+                           args.k, args.stretch, args.overlap)
+        hospital.append(time.perf_counter() - started)
+
+    # Both trees cached: the same request again
+    for source, _ in queries:
+        started = time.perf_counter()
+        alternative_routes(cache.tree(graph, source), cache.reverse_tree(graph, hospital_node),
+                           args.k, args.stretch, args.overlap)
+        warm.append(time.perf_counter() - started)
+
+    for label, timings in [("plateau cold", cold), ("plateau hospital", hospital),
+                           ("plateau warm", warm)]:
+        mean, p50, p99 = summarize(timings)
+        print(f"{label:<18}mean {mean:.1f} ms, p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    print(f"routes found      {sum(counts) / len(counts):.2f} per query (k={args.k}), "
+          f"{sum(1 for c in counts if c >= args.k)}/{len(counts)} with all {args.k}")
+
+    # Yen's baseline on a smaller graph, against plateau on the same queries
+    small = random_geometric_graph(args.yen_nodes, seed=13)
+    small_queries = random_queries(small, max(3, args.queries // 4), seed=3)
+    yen_times, plateau_times, yen_shared, plateau_shared = [], [], [], []
+    for source, target in small_queries:
+        started = time.perf_counter()
+        paths = yen(small, source, target, args.k)
+        yen_times.append(time.perf_counter() - started)
+        cache = RouteCache()
+        started = time.perf_counter()
+        routes = alternative_routes(cache.tree(small, source), cache.reverse_tree(small, target),
+                                    args.k, args.stretch, args.overlap)
+        plateau_times.append(time.perf_counter() - started)
+        if len(paths) > 1:
+            yen_shared.append(shared_share(small, paths[1][0], [paths[0][0]]))
+        if len(routes) > 1:
+            plateau_shared.append(shared_share(small, routes[1].path, [routes[0].path]))
+        if paths and routes and abs(paths[0][1] - routes[0].distance) > 1e-6 * max(1.0, paths[0][1]):
+            violations += 1
+
+    mean_yen = summarize(yen_times)[0]
+    mean_plateau = summarize(plateau_times)[0]
+    print(f"yen baseline      {small.num_nodes} nodes: mean {mean_yen:.1f} ms vs plateau {mean_plateau:.1f} ms "
+          f"({mean_yen / mean_plateau:.0f}x)")
+    if yen_shared and plateau_shared:
+        print(f"2nd route shared  yen {sum(yen_shared) / len(yen_shared):.0%}, "
+              f"plateau {sum(plateau_shared) / len(plateau_shared):.0%} of its cost on the 1st route")
+    print(f"violations        {violations}")
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measure batch CLI throughput in queries per second: a JSONL file of random
+coordinate-to-coordinate queries is streamed through ``routing.batch`` with
+a growing number of worker processes.
+
+    python -m benchmarks.bench_batch --nodes 100000 --queries 2000 --processes 1 2 4
+"""
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from routing.batch import read_queries, run_batch, write_results
+from routing.engine import RoutingEngine
+
+from .common import random_geometric_graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--mode", default="astar")
+    parser.add_argument("--chunk-size", type=int, default=32)
+    args = parser.parse_args()
+
+    graph = random_geometric_graph(args.nodes, seed=3)
+    rng = random.Random(0)
+    coords = graph.coords.tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = RoutingEngine(locations=[], snapshot_file=os.path.join(tmp, "network.snapshot"))
+        engine.set_graph(graph)
+        engine.save_snapshot()
+
+        query_file = os.path.join(tmp, "queries.jsonl")
+        with open(query_file, "w") as f:
+            for i in range(args.queries):
+                start, end = rng.choice(coords), rng.choice(coords)
+                f.write(json.dumps({"id": i, "start": start, "end": end}) + "\n")
+
+        print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges; "
+              f"{args.queries} {args.mode} queries, {os.cpu_count()} CPUs")
+        baseline = None
+        for processes in args.processes:
+            # A fresh engine per run so no run benefits from another's route cache
+            engine = RoutingEngine.from_snapshot(engine.snapshot_file, locations=[])
+            out = io.StringIO()
+            started = time.perf_counter()
+            with open(query_file) as source:
+                results = run_batch(engine, read_queries(source, "jsonl"), mode=args.mode,
+                                    processes=processes, chunk_size=args.chunk_size)
+                count = write_results(results, out)
+            elapsed = time.perf_counter() - started
+            rate = count / elapsed
+            baseline = baseline or rate
+            print(f"{processes:2d} process(es)   {rate:10.1f} queries/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
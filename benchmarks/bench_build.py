@@ -0,0 +1,74 @@
+"""
+Time road-network construction: the original all-pairs scalar haversine
+scan against the vectorized, grid-indexed k-nearest-neighbour builder.
+
+    python -m benchmarks.bench_build --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from routing import haversine_distance, haversine_one_to_many, knn_graph
+
+
+def legacy_network(locations):
+    """The original ``_create_dummy_road_network``: O(V^2 log V) Python work"""
+    road_network = {}
+    for name1, coords1 in locations:
+        distances = []
+        for name2, coords2 in locations:
+            if name1 != name2:
+                distances.append((name2, haversine_distance(coords1, coords2)))
+        distances.sort(key=lambda x: x[1])
+        num_connections = random.randint(3, min(5, len(distances)))
+        road_network[name1] = distances[:num_connections]
+    return road_network
+
+
+def random_points(n, seed=0, radius_km=10.0):
+    rng = np.random.default_rng(seed)
+    deg = radius_km / 111.0
+    return np.column_stack([20.7937 + rng.uniform(-deg, deg, n),
+                            76.6994 + rng.uniform(-deg, deg, n)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--legacy-max-nodes", type=int, default=2_000,
+                        help="skip the all-pairs builder above this size")
+    args = parser.parse_args()
+
+    # Scalar vs vectorized one-to-many haversine
+    points = random_points(100_000)
+    started = time.perf_counter()
+    for lat, lon in points.tolist():
+        haversine_distance(points[0], (lat, lon))
+    scalar = time.perf_counter() - started
+    started = time.perf_counter()
+    haversine_one_to_many(points[0], points)
+    vectorized = time.perf_counter() - started
+    print(f"haversine 1x100k: scalar {scalar * 1000:.1f} ms, vectorized {vectorized * 1000:.2f} ms\n")
+
+    print(f"{'nodes':>9} {'edges':>9} {'knn s':>9} {'legacy s':>10}")
+    for size in args.sizes:
+        coords = random_points(size)
+        started = time.perf_counter()
+        graph = knn_graph(coords, k=(3, 5), seed=0)
+        built = time.perf_counter() - started
+
+        legacy = ""
+        if size <= args.legacy_max_nodes:
+            locations = [(i, tuple(c)) for i, c in enumerate(coords.tolist())]
+            started = time.perf_counter()
+            legacy_network(locations)
+            legacy = f"{time.perf_counter() - started:.2f}"
+
+        print(f"{graph.num_nodes:>9} {graph.num_edges:>9} {built:>9.2f} {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure the route cache on a dispatch-like workload: a few stations and
+hospitals queried over and over, then a batch of weight changes.
+
+    python -m benchmarks.bench_cache --nodes 100000 --queries 2000
+
+Every cached answer is checked against a fresh Dijkstra search, including
+after the weight changes; the script exits with status 1 on a mismatch.
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from routing import RouteCache, shortest_path
+
+from .common import random_geometric_graph, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--places", type=int, default=12,
+                        help="distinct stations/hospitals the queries are drawn from")
+    parser.add_argument("--maxsize", type=int, default=256)
+    parser.add_argument("--changes", type=int, default=50, help="edge weights increased per update")
+    args = parser.parse_args()
+
+    graph = random_geometric_graph(args.nodes, seed=1)
+    rng = random.Random(0)
+    places = rng.sample(range(graph.num_nodes), args.places)
+    hospitals = places[:3]
+    queries = [(rng.choice(places), rng.choice(places)) for _ in range(args.queries)]
+    cache = RouteCache(maxsize=args.maxsize)
+
+    def run(cache_queries):
+        timings, mismatches = [], 0
+        for source, target in cache_queries:
+            started = time.perf_counter()
+            result = cache.route(graph, source, target, "dijkstra",
+                                 lambda: shortest_path(graph, source, target))
+            timings.append(time.perf_counter() - started)
+            if not np.isclose(result.cost, shortest_path(graph, source, target).distance):
+                mismatches += 1
+        return timings, mismatches
+
+    # Cold: every query searches
+    started = time.perf_counter()
+    cold = [shortest_path(graph, s, t) for s, t in queries[:200]]
+    cold_ms = (time.perf_counter() - started) / len(cold) * 1000
+
+    timings, mismatches = run(queries)
+    mean, p50, p99 = summarize(timings)
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges")
+    print(f"uncached query    {cold_ms:8.3f} ms mean")
+    print(f"cached workload   {mean:8.3f} ms mean  {p50:8.3f} p50  {p99:8.3f} p99")
+    print(f"counters          {cache.stats()}")
+
+    # Trees from the hospitals answer queries to every destination
+    started = time.perf_counter()
+    for hospital in hospitals:
+        cache.tree(graph, hospital)
+    tree_ms = (time.perf_counter() - started) / len(hospitals) * 1000
+    tree_queries = [(rng.choice(hospitals), rng.randrange(graph.num_nodes)) for _ in range(200)]
+    tree_timings, tree_mismatches = run(tree_queries)
+    print(f"tree build        {tree_ms:8.1f} ms per hospital")
+    print(f"tree answers      {summarize(tree_timings)[0]:8.3f} ms mean to random destinations")
+    mismatches += tree_mismatches
+
+    # Close some roads: untouched routes and trees carry over, the rest are dropped
+    edges = np.array(rng.sample(range(graph.num_edges), args.changes))
+    before = len(cache)
+    previous = graph.set_weights(edges, graph.weights[edges] * 10)
+    cache.weights_changed(graph, edges, previous)
+    print(f"after {args.changes} closures  kept {len(cache)} of {before} entries "
+          f"(graph version {graph.version})")
+    _, after_mismatches = run(queries[:500] + tree_queries[:100])
+    mismatches += after_mismatches
+
+    # A weight decrease can shorten any route, so every older entry goes
+    previous = graph.set_weights(edges, graph.weights[edges] / 20)
+    cache.weights_changed(graph, edges, previous)
+    print(f"after reopening   kept {len(cache)} entries")
+    _, after_mismatches = run(queries[:500])
+    mismatches += after_mismatches
+
+    print(f"counters          {cache.stats()}")
+    print(f"mismatches        {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
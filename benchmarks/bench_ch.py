@@ -0,0 +1,70 @@
+"""
+Measure contraction-hierarchy preprocessing time, memory overhead and query
+latency against the plain search engine, checking that distances agree.
+
+    python -m benchmarks.bench_ch --sizes 2000 10000 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from routing import ContractionHierarchy, shortest_path
+
+from .common import grid_graph, random_queries, summarize, time_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 10_000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    mismatches = 0
+    for size in args.sizes:
+        graph = grid_graph(size)
+        started = time.perf_counter()
+        hierarchy = ContractionHierarchy.build(graph)
+        build = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "hierarchy.npz")
+            started = time.perf_counter()
+            hierarchy.save(path)
+            saved = time.perf_counter() - started
+            started = time.perf_counter()
+            hierarchy = ContractionHierarchy.load(path)
+            loaded = time.perf_counter() - started
+            file_size = os.path.getsize(path)
+
+        print(f"{graph.num_nodes} nodes, {graph.num_edges} edges")
+        print(f"  preprocessing   {build:.2f}s, {hierarchy.num_shortcuts} shortcuts")
+        print(f"  memory          graph {graph.nbytes / 1e6:.2f} MB, "
+              f"hierarchy {hierarchy.nbytes / 1e6:.2f} MB "
+              f"({hierarchy.nbytes / graph.nbytes:.2f}x)")
+        print(f"  disk            {file_size / 1e6:.2f} MB, save {saved * 1000:.1f} ms, "
+              f"load {loaded * 1000:.1f} ms")
+
+        queries = random_queries(graph, args.queries)
+        for label, fn in (("dijkstra", lambda s, t: shortest_path(graph, s, t)),
+                          ("biastar", lambda s, t: shortest_path(graph, s, t, mode="biastar")),
+                          ("ch", hierarchy.shortest_path)):
+            mean, p50, p99 = summarize(time_queries(fn, queries))
+            print(f"  {label:<14}  mean {mean:8.3f} ms  p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+
+        for source, target in queries:
+            expected = shortest_path(graph, source, target).distance
+            result = hierarchy.shortest_path(source, target)
+            if abs(result.distance - expected) > 1e-9 * max(1.0, expected):
+                mismatches += 1
+        print()
+
+    print(f"agreement check: {mismatches} mismatches")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
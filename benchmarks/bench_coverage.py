@@ -0,0 +1,112 @@
+"""
+Coverage analysis: one multi-source search vs a search per facility,
+isochrone polygons, and greedy standby-point placement with and without
+search reuse.
+
+    python -m benchmarks.bench_coverage --nodes 100000 --facilities 4 --candidates 30 --picks 3
+
+The multi-source times must equal the minimum over per-facility Dijkstra
+runs, and the planner (bounded candidate searches, kept across rounds,
+lazy re-scoring) must pick the same points as a naive greedy that re-runs
+a multi-source search for every candidate in every round. The script exits
+with status 1 otherwise.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from routing import dijkstra
+from routing.coverage import CoveragePlanner, coverage, covered_share, isochrones
+
+from .common import grid_graph
+
+
+SPEED_KMH = 40
+
+
+def naive_greedy(graph, facilities, candidates, count, threshold, minutes_per_unit):
+    """Re-run the whole multi-source search for every candidate in every round"""
+    chosen, searches = list(facilities), 0
+    picks = []
+    for _ in range(count):
+        base = covered_share(coverage(graph, chosen, minutes_per_unit).minutes, threshold)
+        scores = []
+        for candidate in candidates:
+            if candidate in chosen:
+                continue
+            share = covered_share(coverage(graph, chosen + [candidate], minutes_per_unit).minutes, threshold)
+            searches += 1
+            scores.append((share - base, -candidates.index(candidate), candidate))
+        gain, _, best = max(scores)
+        if gain <= 0:
+            break
+        chosen.append(best)
+        picks.append(best)
+    return picks, searches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--facilities", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=30)
+    parser.add_argument("--picks", type=int, default=3)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[4, 8])
+    args = parser.parse_args()
+
+    graph = grid_graph(args.nodes, seed=9)
+    minutes_per_unit = 60 / SPEED_KMH
+    rng = np.random.default_rng(5)
+    facilities = rng.choice(graph.num_nodes, args.facilities, replace=False).tolist()
+    candidates = rng.choice(graph.num_nodes, args.candidates, replace=False).tolist()
+    threshold = max(args.minutes)
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges")
+
+    started = time.perf_counter()
+    result = coverage(graph, facilities, minutes_per_unit)
+    multi_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    separate = np.min([np.array(dijkstra(graph, f)[0]) for f in facilities], axis=0) * minutes_per_unit
+    separate_s = time.perf_counter() - started
+    mismatches = int((~np.isclose(result.minutes, separate)).sum())
+    print(f"coverage          one search {multi_s * 1000:.0f} ms vs {args.facilities} searches "
+          f"{separate_s * 1000:.0f} ms, {mismatches} mismatches")
+    for limit in args.minutes:
+        print(f"within {limit:>4g} min   {covered_share(result.minutes, limit):.1%} of nodes")
+
+    started = time.perf_counter()
+    bands = isochrones(graph, result.minutes, args.minutes, minutes_per_unit)
+    iso_s = time.perf_counter() - started
+    rings = sum(len(r) for _, r in bands)
+    points = sum(len(ring) for _, r in bands for ring in r)
+    print(f"isochrones        {iso_s * 1000:.0f} ms, {rings} rings, {points} points")
+
+    started = time.perf_counter()
+    planner = CoveragePlanner(graph, facilities, minutes_per_unit)
+    picks = planner.greedy(candidates, args.picks, threshold)
+    planner_s = time.perf_counter() - started
+    started = time.perf_counter()
+    planner.greedy(candidates, args.picks, threshold)
+    again_s = time.perf_counter() - started
+    print(f"planner           {planner_s * 1000:.0f} ms ({planner.searches} searches), "
+          f"again {again_s * 1000:.0f} ms: " + ", ".join(f"{p.candidate} -> {p.share:.1%}" for p in picks))
+
+    started = time.perf_counter()
+    naive, searches = naive_greedy(graph, facilities, candidates, args.picks, threshold, minutes_per_unit)
+    naive_s = time.perf_counter() - started
+    print(f"naive greedy      {naive_s * 1000:.0f} ms ({searches} full searches)")
+    if naive != [p.candidate for p in picks]:
+        print(f"pick mismatch     planner {[p.candidate for p in picks]} vs naive {naive}")
+        mismatches += 1
+
+    print(f"mismatches        {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
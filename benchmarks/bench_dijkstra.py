@@ -0,0 +1,78 @@
+"""
+Compare the heap/CSR Dijkstra engine with the original O(V^2) implementation.
+
+    python -m benchmarks.bench_dijkstra --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+from routing import shortest_path
+
+from .common import grid_graph, random_queries, summarize, time_queries
+
+
+def legacy_dijkstra(road_network, nodes, start, end):
+    """The original ``AmbulanceRouteFinder._dijkstra``, kept for comparison"""
+    distances = {node: float('infinity') for node in nodes}
+    distances[start] = 0
+    previous = {node: None for node in nodes}
+    unvisited = set(nodes)
+
+    while unvisited:
+        current = min(unvisited, key=lambda x: distances[x])
+        if current == end or distances[current] == float('infinity'):
+            break
+        unvisited.remove(current)
+        for neighbor, distance in road_network[current]:
+            new_distance = distances[current] + distance
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+
+    return distances[end]
+
+
+def to_road_network(graph):
+    """Convert a RoadGraph into the legacy ``{node: [(node, km)]}`` dict"""
+    offsets, targets, weights = graph.adjacency_lists()
+    return {
+        u: list(zip(targets[offsets[u]:offsets[u + 1]], weights[offsets[u]:offsets[u + 1]]))
+        for u in range(graph.num_nodes)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--legacy-queries", type=int, default=3)
+    parser.add_argument("--legacy-max-nodes", type=int, default=10_000,
+                        help="skip the O(V^2) implementation above this size")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>9} {'edges':>9} {'impl':>8} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for size in args.sizes:
+        started = time.perf_counter()
+        graph = grid_graph(size)
+        graph.adjacency_lists()
+        build = time.perf_counter() - started
+
+        queries = random_queries(graph, args.queries)
+        timings = time_queries(lambda s, t: shortest_path(graph, s, t), queries)
+        mean, p50, p99 = summarize(timings)
+        print(f"{graph.num_nodes:>9} {graph.num_edges:>9} {'heap':>8} "
+              f"{mean:>10.2f} {p50:>10.2f} {p99:>10.2f}   (build {build:.2f}s)")
+
+        if graph.num_nodes <= args.legacy_max_nodes:
+            network = to_road_network(graph)
+            nodes = list(range(graph.num_nodes))
+            legacy = queries[:args.legacy_queries]
+            timings = time_queries(lambda s, t: legacy_dijkstra(network, nodes, s, t), legacy)
+            mean, p50, p99 = summarize(timings)
+            print(f"{graph.num_nodes:>9} {graph.num_edges:>9} {'legacy':>8} "
+                  f"{mean:>10.2f} {p50:>10.2f} {p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
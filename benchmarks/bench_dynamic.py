@@ -0,0 +1,87 @@
+"""
+Compare incremental shortest-path tree repair with a full recompute after
+batches of live edge updates (congestion and closures, then reopening).
+
+    python -m benchmarks.bench_dynamic --nodes 100000 --batches 1 10 1000
+
+Trees are kept from a few hospital nodes. For every batch the repaired
+trees are checked against fresh Dijkstra searches; the script exits with
+status 1 on a mismatch. The flagging of active routes is timed as well.
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from routing import ShortestPathTree, affected_routes, dijkstra, repair_tree, route_result
+from routing.search import SearchResult, _unwind
+
+from .common import random_geometric_graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 10, 1000],
+                        help="edge changes per batch")
+    parser.add_argument("--trees", type=int, default=3, help="hospital trees kept up to date")
+    parser.add_argument("--routes", type=int, default=200, help="active routes checked per batch")
+    args = parser.parse_args()
+
+    graph = random_geometric_graph(args.nodes, seed=5)
+    rng = random.Random(0)
+    hospitals = rng.sample(range(graph.num_nodes), args.trees)
+    trees = [ShortestPathTree(h, *dijkstra(graph, h)[:2]) for h in hospitals]
+    base = graph.weights.copy()
+    # Repairs read in-edges from the reversed graph, built once and then patched in place
+    graph.reverse().adjacency_lists()
+
+    routes = {}
+    for i in range(args.routes):
+        tree = rng.choice(trees)
+        target = rng.randrange(graph.num_nodes)
+        if tree.distances[target] < float("inf"):
+            path = _unwind(tree.previous, tree.source, target)
+            routes[i] = route_result(graph, SearchResult(path, tree.distances[target], 0))
+
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges; "
+          f"{args.trees} trees, {len(routes)} active routes")
+    mismatches = 0
+    for size in args.batches:
+        edges = np.array(rng.sample(range(graph.num_edges), size))
+        # Half the batch is congestion (x1.5-4), half closures; then everything reopens
+        factors = np.where(np.arange(size) % 2 == 0,
+                           np.array([rng.uniform(1.5, 4) for _ in range(size)]), np.inf)
+        for label, new_weights in (("congestion", base[edges] * factors), ("reopen", base[edges])):
+            previous = graph.set_weights(edges, new_weights)
+
+            started = time.perf_counter()
+            settled = sum(repair_tree(graph, tree, edges, previous) for tree in trees)
+            incremental = time.perf_counter() - started
+
+            started = time.perf_counter()
+            fresh = [dijkstra(graph, h)[0] for h in hospitals]
+            full = time.perf_counter() - started
+
+            started = time.perf_counter()
+            flagged = affected_routes(graph, routes, edges, previous)
+            flagging = time.perf_counter() - started
+
+            for tree, distances in zip(trees, fresh):
+                if not np.allclose(tree.distances, distances):
+                    mismatches += 1
+            print(f"{size:5d} edges {label:<10}  incremental {incremental * 1000:9.2f} ms "
+                  f"({settled} settled)   full {full * 1000:9.2f} ms   "
+                  f"x{full / max(incremental, 1e-9):7.1f}   "
+                  f"{len(flagged)} routes flagged in {flagging * 1000:.2f} ms")
+
+    print(f"mismatches        {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
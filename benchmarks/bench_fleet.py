@@ -0,0 +1,86 @@
+"""
+Fleet simulation: a day of incidents replayed against a whole fleet.
+
+    python -m benchmarks.bench_fleet --nodes 20000 --units 200 --calls 10000
+
+Units are spread over a set of stations and patients go to the nearest of
+a few hospitals. At the default load (a call every ~9 seconds for 200
+units) the fleet runs near capacity, so calls queue at busy times. The
+travel-time tables are built once (station and
+hospital trees come from the engine's route cache) and then the event loop
+runs the day. The script checks that every reachable call was served, that
+no call was reached sooner than the nearest station could drive there, and
+that the simulation itself stays within ``--budget`` seconds; it exits
+with status 1 otherwise.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from routing import RoutingEngine
+from routing.fleet import FleetSimulator, fleet_summary, poisson_calls
+
+from .common import grid_graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--units", type=int, default=200)
+    parser.add_argument("--stations", type=int, default=40)
+    parser.add_argument("--hospitals", type=int, default=10)
+    parser.add_argument("--calls", type=int, default=10_000)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--on-scene", type=float, default=8.0, help="mean minutes on scene")
+    parser.add_argument("--handover", type=float, default=8.0, help="mean minutes of hospital handover")
+    parser.add_argument("--transport", type=float, default=0.4, help="share of patients taken to hospital")
+    parser.add_argument("--budget", type=float, default=10.0, help="seconds allowed for the simulation")
+    args = parser.parse_args()
+
+    engine = RoutingEngine()
+    engine.set_graph(grid_graph(args.nodes, seed=8))
+    graph = engine.graph
+    rng = np.random.default_rng(3)
+    stations = rng.choice(graph.num_nodes, args.stations, replace=False)
+    hospitals = rng.choice(graph.num_nodes, args.hospitals, replace=False).tolist()
+    unit_stations = stations[np.arange(args.units) % args.stations].tolist()
+    call_minutes, call_nodes = poisson_calls(graph.num_nodes, args.calls, args.hours, seed=4)
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges")
+    print(f"fleet             {args.units} units at {args.stations} stations, {args.hospitals} hospitals")
+
+    started = time.perf_counter()
+    simulator = FleetSimulator(engine, unit_stations, hospitals, args.on_scene, args.handover,
+                               args.transport)
+    tables_s = time.perf_counter() - started
+    print(f"travel tables     {tables_s:.2f} s, {simulator.travel.nbytes / 1e6:.1f} MB, "
+          f"{len(engine.route_cache)} trees cached")
+
+    started = time.perf_counter()
+    report = simulator.run(call_minutes, call_nodes)
+    run_s = time.perf_counter() - started
+    summary = fleet_summary(report)
+    print(f"simulation        {run_s:.2f} s for {args.calls} calls over {args.hours:g} h "
+          f"({report.events} events, {report.events / run_s:,.0f} events/s)")
+    print(f"served            {summary['served']} ({summary['unreached']} unreached, "
+          f"{summary['transported']} taken to hospital)")
+    print(f"response min      mean {summary['response_mean']:.1f}, p50 {summary['response_p50']:.1f}, "
+          f"p90 {summary['response_p90']:.1f}, p95 {summary['response_p95']:.1f}, "
+          f"max {summary['response_max']:.1f}")
+    print(f"waited for unit   {summary['waited_share']:.1%} of calls")
+    print(f"utilisation       {summary['utilisation']:.1%}")
+
+    # Nobody gets there faster than the nearest station can drive
+    nearest = simulator.travel.from_station[:, call_nodes].min(axis=0)
+    served = ~np.isnan(report.response_minutes)
+    too_fast = int((report.response_minutes[served] < nearest[served] - 1e-4).sum())
+    unserved = int((np.isfinite(nearest) & ~served).sum())
+    print(f"violations        {too_fast} too fast, {unserved} reachable calls unserved")
+    if too_fast or unserved or run_s > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
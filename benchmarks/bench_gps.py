@@ -0,0 +1,130 @@
+"""
+Streaming GPS ingestion: replayed fixes from a fleet through the map
+matcher and deviation tracker, against wall-clock real time.
+
+    python -m benchmarks.bench_gps --nodes 40000 --units 300 --deviate 0.2 --noise 8
+
+Every unit is dispatched to one of ``--destinations`` hospitals and reports
+once a second with Gaussian noise. A ``--deviate`` share of units ignore
+their route and drive through a detour point instead. The script reports
+fixes matched per second, matching latency per fix, the error of the
+matched positions against the noise-free track, how soon deviations were
+caught and how many searches re-routing needed. It exits with status 1 if
+matching falls behind real time, the p95 position error exceeds three
+times the noise, a unit that kept to its route was re-routed, a deviating
+unit was not, or re-routing searched more than once per destination.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from routing import RoutingEngine
+from routing.gps import GpsTracker, replay_fixes
+from routing.graph import haversine_distance
+from routing.trajectory import segment_seconds
+
+from .common import grid_graph, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=40_000)
+    parser.add_argument("--units", type=int, default=300)
+    parser.add_argument("--destinations", type=int, default=10)
+    parser.add_argument("--deviate", type=float, default=0.2, help="share of units that leave their route")
+    parser.add_argument("--noise", type=float, default=8.0, help="GPS noise in metres")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between fixes")
+    args = parser.parse_args()
+
+    engine = RoutingEngine()
+    engine.set_graph(grid_graph(args.nodes, seed=2))
+    graph = engine.graph
+    side = int(round(graph.num_nodes ** 0.5))
+    rng = np.random.default_rng(7)
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges")
+
+    def near(node, low, high):
+        row, col = divmod(node, side)
+        offset = rng.integers(low, high + 1, 2) * rng.choice([-1, 1], 2)
+        return int(np.clip(row + offset[0], 0, side - 1) * side + np.clip(col + offset[1], 0, side - 1))
+
+    # Dispatch each unit from a few blocks out; deviating units drive via a detour point
+    destinations = rng.choice(graph.num_nodes, args.destinations, replace=False).tolist()
+    planned, trips, left_at = {}, {}, {}
+    started = time.perf_counter()
+    for i in range(args.units):
+        unit = f"unit {i}"
+        target = destinations[i % len(destinations)]
+        route = engine.route(near(target, 8, 15), target, "astar")
+        if route.path is None or len(route.path) < 5:
+            continue
+        planned[unit] = route
+        driven = route.path
+        if rng.random() < args.deviate:
+            via = near(route.path[len(route.path) // 2], 3, 6)
+            first, second = engine.route(route.path[0], via, "astar"), engine.route(via, target, "astar")
+            if first.path is not None and second.path is not None:
+                driven = first.path + second.path[1:]
+        roads = set(zip(route.path, route.path[1:]))
+        off = [k for k, road in enumerate(zip(driven, driven[1:])) if road not in roads and road[::-1] not in roads]
+        minutes = graph.path_length(driven) / engine.speed_kmh * 60
+        if off:
+            left_at[unit] = float(np.sum(segment_seconds(graph, driven, minutes)[:off[0]]))
+        trips[unit] = (driven, minutes)
+    print(f"dispatch          {len(trips)} units, {len(left_at)} deviating, "
+          f"routes in {time.perf_counter() - started:.1f} s")
+
+    fixes = list(replay_fixes(graph, trips, args.interval, args.noise, seed=1))
+    truth = list(replay_fixes(graph, trips, args.interval, 0.0, seed=1))
+    first_fix = {}
+    for fix in fixes:
+        first_fix.setdefault(fix.unit, fix.timestamp)
+    duration = fixes[-1].timestamp - fixes[0].timestamp
+    print(f"replay            {len(fixes)} fixes over {duration:.0f} s "
+          f"({len(fixes) / duration:.0f} fixes/s arriving)")
+
+    tracker = GpsTracker(engine)
+    for unit, route in planned.items():
+        tracker.assign(unit, route)
+    misses = engine.route_cache.misses
+
+    latencies, errors, caught = [], [], {}
+    started = time.perf_counter()
+    for fix, true in zip(fixes, truth):
+        begun = time.perf_counter()
+        update = tracker.ingest(fix)
+        latencies.append(time.perf_counter() - begun)
+        if update.match.coords is not None:
+            errors.append(haversine_distance(update.match.coords, (true.lat, true.lon)) * 1000)
+        if update.route is not None:
+            caught.setdefault(fix.unit, fix.timestamp - first_fix[fix.unit])
+    elapsed = time.perf_counter() - started
+    searches = engine.route_cache.misses - misses
+
+    rate = len(fixes) / elapsed
+    mean, p50, p99 = summarize(latencies)
+    error_p50, error_p95 = np.percentile(errors, [50, 95])
+    false_alarms = sorted(set(caught) - set(left_at))
+    missed = sorted(set(left_at) - set(caught))
+    delays = [caught[unit] - left_at[unit] for unit in left_at if unit in caught]
+    print(f"throughput        {rate:.0f} fixes/s ({rate / (len(fixes) / duration):.1f}x real time)")
+    print(f"latency           mean {mean:.2f} ms, p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+          f"max {max(latencies) * 1000:.0f} ms")
+    print(f"position error    p50 {error_p50:.1f} m, p95 {error_p95:.1f} m (noise {args.noise:g} m)")
+    if delays:
+        print(f"deviation caught  {len(delays)}/{len(left_at)} units, after "
+              f"p50 {np.median(delays):.1f} s, max {max(delays):.1f} s")
+    print(f"re-routes         {tracker.reroutes}, {searches} searches "
+          f"({len(set(destinations))} destinations)")
+    print(f"false re-routes   {len(false_alarms)} units")
+
+    if (rate * duration < len(fixes) or error_p95 > 3 * args.noise or false_alarms or missed
+            or searches > len(set(destinations))):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+UI responsiveness under continuous querying: a 60 fps event loop with the
+searches and overlay writes on the GUI's worker pool, against running them
+on the loop itself as the GUI used to.
+
+    python -m benchmarks.bench_gui --nodes 100000 --seconds 10 --interval 0.2
+
+No window is opened: the loop stands in for Tk's, running posted callbacks
+and then sleeping until the next frame, while a new route request replaces
+the previous one every ``--interval`` seconds. It reports frame intervals,
+how many requests completed, were cancelled or came back stale, and checks
+that no result was ever shown after a newer request had been made. The
+script exits with status 1 if one was, or if the p99 frame interval goes
+past two frames.
+"""
+import argparse
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from routing import RoutingEngine
+from routing.mapview import MapView
+from routing.tasks import TaskRunner
+
+from .common import random_geometric_graph, summarize
+
+
+FRAME_SECONDS = 1 / 60
+
+
+def route_work(engine, lock, view, source, target, task):
+    """The GUI's route request: search, then write the overlay unless superseded"""
+    task.progress(0.1, "searching")
+    with lock:
+        result = engine.route(source, target, "astar")
+    task.progress(0.6, "drawing")
+    if result.path:
+        view.show(lines=[{"coords": engine.graph.coords[result.path].tolist()}], fit=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between new requests")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    engine = RoutingEngine()
+    engine.set_graph(random_geometric_graph(args.nodes, seed=11))
+    rng = random.Random(0)
+    print(f"graph             {engine.graph.num_nodes} nodes, {engine.graph.num_edges} edges")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        view = MapView(tmp)
+        lock = threading.Lock()
+
+        # Before: each request blocks the loop for its whole search
+        blocked = []
+        for _ in range(5):
+            source, target = rng.randrange(args.nodes), rng.randrange(args.nodes)
+            started = time.perf_counter()
+            engine.route(source, target, "astar")
+            blocked.append(time.perf_counter() - started)
+        print(f"blocking loop     each request freezes the window for up to {max(blocked) * 1000:.0f} ms")
+
+        posted = queue.SimpleQueue()
+        progress = []
+        runner = TaskRunner(posted.put, workers=args.workers,
+                            on_progress=lambda task, fraction, message: progress.append(fraction))
+        latest = {"serial": 0}
+        shown = []
+
+        def done(holder):
+            # Runs on the loop: record which request this was and the newest one made
+            return lambda result: shown.append((holder["task"].serial, latest["serial"]))
+
+        frames = []
+        started = last_frame = next_request = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if now - started > args.seconds:
+                break
+            if now >= next_request:
+                source, target = rng.randrange(args.nodes), rng.randrange(args.nodes)
+                holder = {}
+                holder["task"] = runner.submit(
+                    "route", lambda t, s=source, d=target: route_work(engine, lock, view, s, d, t),
+                    on_done=done(holder))
+                latest["serial"] = holder["task"].serial
+                next_request = now + args.interval
+
+            # Run everything the workers posted, then wait for the next frame
+            while True:
+                try:
+                    posted.get_nowait()()
+                except queue.Empty:
+                    break
+            frames.append(now - last_frame)
+            last_frame = now
+            time.sleep(max(0.0, last_frame + FRAME_SECONDS - time.perf_counter()))
+
+        # Let the last request finish
+        while runner.busy("route"):
+            try:
+                posted.get(timeout=0.1)()
+            except queue.Empty:
+                pass
+        runner.shutdown()
+
+    mean, p50, p99 = summarize(frames[1:])
+    worst = max(frames[1:]) * 1000
+    violations = sum(1 for serial, newest in shown if serial != newest)
+    print(f"frames            {len(frames)} in {args.seconds:g} s ({len(frames) / args.seconds:.1f} fps)")
+    print(f"frame interval    mean {mean:.1f} ms, p50 {p50:.1f} ms, p99 {p99:.1f} ms, max {worst:.1f} ms")
+    print(f"requests          {latest['serial']} submitted, {runner.completed} shown, "
+          f"{runner.cancelled} cancelled, {runner.stale} stale results dropped")
+    print(f"progress reports  {len(progress)}")
+    print(f"stale shown       {violations}")
+    if violations or p99 > 2 * FRAME_SECONDS * 1000:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
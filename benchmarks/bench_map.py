@@ -0,0 +1,135 @@
+"""
+Map output before and after the cached base map: HTML size and render time
+for the base map and for each route shown.
+
+    python -m benchmarks.bench_map --sizes 1000 10000 --pois 200
+
+"Before" rebuilds a folium map per call with a polyline per road and a
+marker per location, as the GUI used to. "After" renders the base map once
+into a cache (a second call is a cache hit) and writes each route as a
+GeoJSON overlay with zoom-level simplifications.
+
+The simulation rows compare saving a whole map at every node of the route
+(without the old one-second sleeps) with writing one time-stamped track.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import folium
+import numpy as np
+
+from routing import shortest_path
+from routing.mapview import MapView
+from routing.trajectory import route_track, segment_seconds, timestamped_feature
+
+from .common import random_geometric_graph
+
+
+def legacy_map(graph, locations, path, route_coords=None):
+    """The previous approach: a fresh folium map per call, saved whole"""
+    m = folium.Map(location=(20.7937, 76.6994), zoom_start=15, tiles="cartodbpositron")
+    for name, coords in locations:
+        folium.Marker(location=list(coords), popup=f"<b>{name}</b>", tooltip=name,
+                      icon=folium.Icon(icon="map-marker", prefix="fa", color="blue")).add_to(m)
+    if route_coords is None:
+        added = set()
+        sources, targets, _ = graph.edges()
+        for u, v in zip(sources.tolist(), targets.tolist()):
+            road = (min(u, v), max(u, v))
+            if road not in added:
+                folium.PolyLine([graph.coords[u].tolist(), graph.coords[v].tolist()],
+                                color="gray", weight=2, opacity=0.7).add_to(m)
+                added.add(road)
+    else:
+        folium.PolyLine(route_coords, color="#FF5722", weight=5, opacity=0.8,
+                        tooltip="Emergency Route").add_to(m)
+    m.save(path)
+    return os.path.getsize(path)
+
+
+def legacy_simulation(graph, route, path):
+    """The previous simulation: move a marker node by node, saving the map at every step"""
+    m = folium.Map(location=(20.7937, 76.6994), zoom_start=15, tiles="cartodbpositron")
+    folium.PolyLine(graph.coords[route].tolist(), color="#FF5722", weight=5, opacity=0.8).add_to(m)
+    group = folium.FeatureGroup(name="Ambulance")
+    m.add_child(group)
+    written = 0
+    for node in route:
+        marker = folium.Marker(location=graph.coords[node].tolist(), tooltip="Ambulance",
+                               icon=folium.Icon(icon="ambulance", prefix="fa", color="green"))
+        group.add_child(marker)
+        m.save(path)
+        written += os.path.getsize(path)
+        del group._children[marker.get_name()]
+    return written
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--pois", type=int, default=200, help="location markers on the map")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>7} {'map':<24} {'before KB':>10} {'before ms':>10} {'after KB':>10} {'after ms':>10}")
+    for size in args.sizes:
+        graph = random_geometric_graph(size, seed=7)
+        rng = random.Random(0)
+        locations = [(f"POI {i}", tuple(graph.coords[node].tolist()))
+                     for i, node in enumerate(rng.sample(range(size), min(args.pois, size)))]
+
+        # A long route across the network
+        source = int(np.argmin(graph.coords.sum(axis=1)))
+        target = int(np.argmax(graph.coords.sum(axis=1)))
+        route = shortest_path(graph, source, target, mode="astar").path
+        route_coords = graph.coords[route].tolist()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy = os.path.join(tmp, "legacy.html")
+            before_base, before_base_s = timed(legacy_map, graph, locations, legacy)
+            before_route, before_route_s = timed(legacy_map, graph, locations, legacy, route_coords)
+
+            view = MapView(os.path.join(tmp, "map_cache"))
+            base_path, after_base_s = timed(view.base, graph, locations)
+            after_base = os.path.getsize(base_path)
+            _, cached_s = timed(view.base, graph, locations)
+
+            def show_route():
+                view.base(graph, locations)
+                return view.show(lines=[{"coords": route_coords}], markers=[
+                    {"location": route_coords[0], "icon": "ambulance", "color": "green"},
+                    {"location": route_coords[-1], "icon": "plus", "color": "red"}])
+
+            after_route, after_route_s = timed(show_route)
+
+            before_sim, before_sim_s = timed(legacy_simulation, graph, route, legacy)
+
+            def simulate():
+                seconds = segment_seconds(graph, route, graph.path_length(route) / 40 * 60)
+                times, positions = route_track(route_coords, seconds, tick_seconds=1.0)
+                track = timestamped_feature(times, positions, int(time.time() * 1000),
+                                            icon="ambulance", color="green", playback=10.0)
+                return view.show(lines=[{"coords": route_coords}], track=track), len(times)
+
+            (after_sim, ticks), after_sim_s = timed(simulate)
+
+        rows = [("base map (first)", before_base, before_base_s, after_base, after_base_s),
+                ("base map (next launch)", before_base, before_base_s, after_base, cached_s),
+                (f"route ({len(route)} points)", before_route, before_route_s, after_route, after_route_s),
+                (f"simulation ({ticks} ticks)", before_sim, before_sim_s, after_sim, after_sim_s)]
+        for label, b_size, b_s, a_size, a_s in rows:
+            print(f"{graph.num_nodes:>7} {label:<24} {b_size / 1024:>10.1f} {b_s * 1000:>10.1f} "
+                  f"{a_size / 1024:>10.1f} {a_s * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
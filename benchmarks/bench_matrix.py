@@ -0,0 +1,84 @@
+"""
+Compare batch travel-time queries against one shortest-path search per
+pair: a station x hospital matrix, a large matrix on a process pool, and
+"which of 40 ambulances reaches this incident first".
+
+    python -m benchmarks.bench_matrix --nodes 100000 --processes 4
+
+Batch results are checked against the per-pair searches; the script exits
+with status 1 on a mismatch.
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from routing import nearest_source, shortest_path, travel_time_matrix
+
+from .common import random_geometric_graph
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def pairwise(graph, sources, targets):
+    return np.array([[shortest_path(graph, s, t).distance for t in targets] for s in sources])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--stations", type=int, default=20)
+    parser.add_argument("--hospitals", type=int, default=5)
+    parser.add_argument("--units", type=int, default=40)
+    parser.add_argument("--incidents", type=int, default=20)
+    parser.add_argument("--large", type=int, default=200, help="side of the square pooled matrix")
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    graph = random_geometric_graph(args.nodes, seed=2)
+    rng = random.Random(0)
+
+    def nodes(count):
+        return rng.sample(range(graph.num_nodes), count)
+
+    stations, hospitals = nodes(args.stations), nodes(args.hospitals)
+    units, incidents = nodes(args.units), nodes(args.incidents)
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges")
+    mismatches = 0
+
+    # Station x hospital matrix: one reverse search per hospital
+    reference, per_pair = timed(pairwise, graph, stations, hospitals)
+    matrix, batch = timed(travel_time_matrix, graph, stations, hospitals)
+    mismatches += int((~np.isclose(matrix, reference)).sum())
+    print(f"{args.stations}x{args.hospitals} matrix     per-pair {per_pair * 1000:9.1f} ms   "
+          f"batch {batch * 1000:9.1f} ms   ({per_pair / batch:.1f}x)")
+
+    # Nearest of many units for each incident: one multi-source search per batch
+    reference, per_pair = timed(pairwise, graph, units, incidents)
+    (nearest, costs), batch = timed(nearest_source, graph, units, incidents)
+    mismatches += int((~np.isclose(costs, reference.min(axis=0))).sum())
+    print(f"nearest of {args.units:<4}   per-pair {per_pair * 1000:9.1f} ms   "
+          f"batch {batch * 1000:9.1f} ms   ({per_pair / batch:.1f}x) for {args.incidents} incidents")
+
+    # Large square matrix, serial vs. process pool
+    sources, targets = nodes(args.large), nodes(args.large)
+    serial, serial_time = timed(travel_time_matrix, graph, sources, targets)
+    pooled, pooled_time = timed(travel_time_matrix, graph, sources, targets, processes=args.processes)
+    mismatches += int((~np.isclose(serial, pooled)).sum())
+    print(f"{args.large}x{args.large} matrix   serial   {serial_time * 1000:9.1f} ms   "
+          f"{args.processes} procs {pooled_time * 1000:9.1f} ms   ({serial_time / pooled_time:.1f}x)")
+
+    print(f"mismatches        {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
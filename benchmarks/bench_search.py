@@ -0,0 +1,37 @@
+"""
+Compare search modes by latency and settled nodes.
+
+That every mode returns a path as short as plain Dijkstra's is checked by
+``tests/test_search.py``.
+
+    python -m benchmarks.bench_search --sizes 10000 100000
+"""
+import argparse
+
+from routing import SEARCH_MODES, shortest_path
+
+from .common import grid_graph, random_queries, summarize, time_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>9} {'mode':>11} {'mean ms':>10} {'p99 ms':>10} {'settled':>10}")
+    for size in args.sizes:
+        graph = grid_graph(size)
+        queries = random_queries(graph, args.queries)
+        for mode in SEARCH_MODES:
+            settled = []
+            timings = time_queries(
+                lambda s, t: settled.append(shortest_path(graph, s, t, mode=mode).settled), queries)
+            mean, _, p99 = summarize(timings)
+            print(f"{graph.num_nodes:>9} {mode:>11} {mean:>10.2f} {p99:>10.2f} "
+                  f"{sum(settled) / len(settled):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
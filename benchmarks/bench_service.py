@@ -0,0 +1,143 @@
+"""
+Load generator for the local route-query service: keeps ``--concurrency``
+keep-alive connections busy with route requests and reports latency
+percentiles and throughput.
+
+    python -m benchmarks.bench_service --nodes 100000 --concurrency 32 --requests 2000
+    python -m benchmarks.bench_service --url http://127.0.0.1:8080 --concurrency 8
+
+Without ``--url`` a service is started on a synthetic graph for the run.
+Requests are drawn from ``--distinct`` start/end pairs, so concurrent
+duplicates exercise request coalescing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+from routing.engine import RoutingEngine
+
+from .common import random_geometric_graph, summarize
+
+
+async def _request(reader, writer, host, target):
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def run_load(url, targets, concurrency):
+    """Send every target over ``concurrency`` connections; return (latencies, statuses, seconds)"""
+    parts = urlsplit(url)
+    queue = list(reversed(targets))
+    latencies, statuses = [], Counter()
+
+    async def client():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        try:
+            while queue:
+                target = queue.pop()
+                started = time.perf_counter()
+                status, _ = await _request(reader, writer, parts.hostname, target)
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def fetch(url, target):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    try:
+        return (await _request(reader, writer, parts.hostname, target))[1]
+    finally:
+        writer.close()
+
+
+def start_service(nodes, workers, tmp):
+    """Start ``python -m routing.service`` on a synthetic graph; return (process, url, graph)"""
+    graph = random_geometric_graph(nodes, seed=4)
+    engine = RoutingEngine(locations=[], snapshot_file=os.path.join(tmp, "network.snapshot"))
+    engine.set_graph(graph)
+    engine.save_snapshot()
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "routing.service", "--port", "0", "--workers", str(workers),
+         "--snapshot", engine.snapshot_file, "--use-snapshot"],
+        stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().split()[-1]
+    return process, url, graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="existing service to load instead of starting one")
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--distinct", type=int, default=200, help="distinct start/end pairs")
+    parser.add_argument("--mode", default="astar")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        if args.url:
+            url = args.url
+            nodes = asyncio.run(fetch(url, "/stats"))["nodes"]
+            coords = None
+        else:
+            process, url, graph = start_service(args.nodes, args.workers, tmp)
+            nodes = graph.num_nodes
+            coords = graph.coords.tolist()
+
+        try:
+            rng = random.Random(0)
+            pairs = []
+            for _ in range(args.distinct):
+                start, end = rng.randrange(nodes), rng.randrange(nodes)
+                if coords is not None:
+                    start, end = ",".join(map(str, coords[start])), ",".join(map(str, coords[end]))
+                pairs.append(urlencode({"start": start, "end": end, "mode": args.mode}))
+            targets = [f"/route?{rng.choice(pairs)}" for _ in range(args.requests)]
+
+            latencies, statuses, elapsed = asyncio.run(run_load(url, targets, args.concurrency))
+            stats = asyncio.run(fetch(url, "/stats"))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    mean, p50, p99 = summarize(latencies)
+    print(f"service           {url}  ({stats['nodes']} nodes, {stats['workers']} workers)")
+    print(f"load              {len(latencies)} requests, concurrency {args.concurrency}, "
+          f"{args.distinct} distinct pairs")
+    print(f"latency           p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   mean {mean:8.2f} ms")
+    print(f"throughput        {len(latencies) / elapsed:8.1f} requests/s")
+    print(f"coalesced         {stats['coalesced']} requests shared an in-flight search")
+    print(f"responses         {dict(sorted(statuses.items()))} by HTTP status (404: unreachable)")
+
+
+if __name__ == "__main__":
+    main()
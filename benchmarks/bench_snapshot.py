@@ -0,0 +1,69 @@
+"""
+Compare startup cost: rebuilding the road graph from scratch against
+memory-mapping a saved snapshot.
+
+    python -m benchmarks.bench_snapshot --nodes 1000000
+    python -m benchmarks.bench_snapshot --road-file district.osm.pbf
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from routing import knn_graph, load_road_file, load_snapshot, save_snapshot, shortest_path
+
+from .bench_build import random_points
+from .common import random_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=1_000_000,
+                        help="size of the synthetic kNN graph when no road file is given")
+    parser.add_argument("--road-file", help="time parsing this .osm/.pbf/.graphml file instead")
+    args = parser.parse_args()
+
+    if args.road_file:
+        label = os.path.basename(args.road_file)
+
+        def rebuild():
+            return load_road_file(args.road_file)
+    else:
+        points = random_points(args.nodes)
+        label = f"knn_graph({args.nodes})"
+
+        def rebuild():
+            return knn_graph(points, k=(3, 5), seed=0, bidirectional=True)
+
+    started = time.perf_counter()
+    graph = rebuild()
+    cold = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "network.snapshot")
+        started = time.perf_counter()
+        save_snapshot(path, graph, source={"benchmark": label})
+        saved = time.perf_counter() - started
+
+        started = time.perf_counter()
+        snapshot = load_snapshot(path, source={"benchmark": label})
+        loaded = time.perf_counter() - started
+
+        # The first query pays for touching the mapped pages
+        source, target = random_queries(snapshot.graph, 1)[0]
+        started = time.perf_counter()
+        shortest_path(snapshot.graph, source, target)
+        first_query = time.perf_counter() - started
+        size = os.path.getsize(path)
+        del snapshot
+
+    print(f"source            {label}: {graph.num_nodes} nodes, {graph.num_edges} edges")
+    print(f"cold rebuild      {cold * 1000:10.1f} ms")
+    print(f"snapshot write    {saved * 1000:10.1f} ms  ({size / 1e6:.1f} MB)")
+    print(f"snapshot load     {loaded * 1000:10.3f} ms")
+    print(f"first query       {first_query * 1000:10.1f} ms after load")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Time-dependent routing: profile storage, FIFO check, exactness and query
+latency at several departure times.
+
+    python -m benchmarks.bench_timedep --nodes 100000 --queries 20
+
+Per-edge profiles drawn from a few road classes and zones are deduplicated
+into shared rows. Every edge's travel-time function is checked to be FIFO,
+guided (A*) earliest-arrival searches are checked against unguided ones,
+and free-flow profiles must reproduce static Dijkstra. The script exits
+with status 1 on any violation.
+"""
+import argparse
+import random
+import sys
+
+import numpy as np
+
+from routing import dijkstra
+from routing.timedep import (
+    BUCKETS,
+    SpeedProfiles,
+    daily_profile,
+    earliest_arrival,
+    format_clock,
+    parse_departure,
+    travel_minutes,
+)
+
+from .common import random_geometric_graph, random_queries, summarize, time_queries
+
+
+SPEED_KMH = 40
+
+
+def class_profiles(graph, seed=0):
+    """One profile per edge: a zone around the centre times one of four road-class slowdowns"""
+    rng = np.random.default_rng(seed)
+    zones = SpeedProfiles.by_zone(graph, (20.7937, 76.6994), [
+        (0.5, daily_profile([(12.5, 1.5), (18.5, 1.0)], slowest=0.3)),
+        (1.5, daily_profile([(9.5, 1.0), (12.5, 1.5), (18.5, 1.0)], slowest=0.6)),
+        (float("inf"), daily_profile([(9.0, 1.0), (18.5, 1.0)], slowest=0.85)),
+    ])
+    road_class = np.array([1.0, 0.9, 0.8, 0.7], dtype=np.float32)[rng.integers(0, 4, graph.num_edges)]
+    return zones.profiles[zones.edge_profile] * road_class[:, None]
+
+
+def fifo_violations(graph, profiles, edges, minutes_per_unit):
+    """Count edges where leaving a minute later arrives earlier, over a day and a half"""
+    rows, edge_profile = profiles.profile_lists()
+    starts = np.arange(0, 36 * 60, 1.0).tolist()
+    violations = 0
+    for edge in edges:
+        factors = rows[edge_profile[edge]]
+        free_flow = graph.weights[edge] * minutes_per_unit
+        arrivals = [start + travel_minutes(factors, start, free_flow) for start in starts]
+        if any(later < earlier - 1e-9 for earlier, later in zip(arrivals, arrivals[1:])):
+            violations += 1
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--departures", nargs="+", default=["03:00", "12:30", "18:30"])
+    args = parser.parse_args()
+
+    graph = random_geometric_graph(args.nodes, seed=6)
+    minutes_per_unit = 60 / SPEED_KMH
+    per_edge = class_profiles(graph)
+    profiles = SpeedProfiles.from_edges(per_edge)
+    print(f"graph             {graph.num_nodes} nodes, {graph.num_edges} edges")
+    print(f"profiles          {len(profiles.profiles)} shared rows of {BUCKETS} buckets; "
+          f"{profiles.nbytes / 1e6:.2f} MB vs {per_edge.nbytes / 1e6:.2f} MB per edge")
+
+    rng = random.Random(0)
+    violations = fifo_violations(graph, profiles, rng.sample(range(graph.num_edges), 200),
+                                 minutes_per_unit)
+    print(f"FIFO check        {violations} violations on 200 edges")
+
+    mismatches = 0
+    free_flow = SpeedProfiles.free_flow(graph)
+    for source, target in random_queries(graph, 10, seed=1):
+        expected = dijkstra(graph, source, target)[0][target] * minutes_per_unit
+        result = earliest_arrival(graph, free_flow, source, target, 0.0, minutes_per_unit)
+        if not np.isclose(result.arrival, expected):
+            mismatches += 1
+
+    queries = random_queries(graph, args.queries, seed=2)
+    print(f"{'departure':>9} {'search':>9} {'mean ms':>10} {'p99 ms':>10} {'settled':>9} {'travel min':>11}")
+
+    def run(departure, label, guided):
+        results = []
+        timings = time_queries(lambda s, t: results.append(earliest_arrival(
+            graph, profiles, s, t, departure, minutes_per_unit, guided=guided)), queries)
+        mean, _, p99 = summarize(timings)
+        travel = [r.arrival - r.departure for r in results if r.path is not None]
+        print(f"{format_clock(departure):>9} {label:>9} {mean:>10.2f} {p99:>10.2f} "
+              f"{sum(r.settled for r in results) / len(results):>9.0f} "
+              f"{sum(travel) / max(len(travel), 1):>11.2f}")
+        return results
+
+    for departure in map(parse_departure, args.departures):
+        # The unguided search is the baseline the A* arrivals must match
+        unguided = run(departure, "dijkstra", False)
+        guided = run(departure, "astar", True)
+        mismatches += sum(not np.isclose(a.arrival, b.arrival) for a, b in zip(guided, unguided))
+
+    print(f"mismatches        {mismatches}")
+    if violations or mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import random
+import time
+
+import numpy as np
+
+from routing import RoadGraph, knn_graph
+
+
+def grid_graph(num_nodes, seed=0, spacing_km=0.1):
+    """
+    Build a bidirectional square grid road graph with roughly ``num_nodes`` nodes.
+
+    Edge weights are the grid spacing scaled by a random detour factor in
+    [1, 1.5) so shortest paths are unique-ish but still city-like.
+    """
+    side = max(2, int(round(num_nodes ** 0.5)))
+    rng = np.random.default_rng(seed)
+
+    # Lay the grid out around Shegaon, spacing_km apart
+    rows, cols = np.divmod(np.arange(side * side), side)
+    deg = spacing_km / 111.0
+    coords = np.column_stack([20.7937 + rows * deg, 76.6994 + cols * deg])
+
+    ids = np.arange(side * side).reshape(side, side)
+    horizontal = np.column_stack([ids[:, :-1].ravel(), ids[:, 1:].ravel()])
+    vertical = np.column_stack([ids[:-1, :].ravel(), ids[1:, :].ravel()])
+    pairs = np.vstack([horizontal, vertical])
+
+    weights = spacing_km * rng.uniform(1.0, 1.5, len(pairs))
+    sources = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    targets = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    weights = np.concatenate([weights, weights])
+
+    return RoadGraph.from_edges(coords, sources, targets, weights)
+
+
+def random_geometric_graph(num_nodes, k=4, seed=0, radius_km=3.0):
+    """
+    Build a directed k-nearest-neighbour graph over random points near Shegaon.
+
+    Each edge weight is the straight-line length times a detour factor in
+    [1, 1.3), so haversine remains an admissible lower bound.
+    """
+    rng = np.random.default_rng(seed)
+    deg = radius_km / 111.0
+    coords = np.column_stack([20.7937 + rng.uniform(-deg, deg, num_nodes),
+                              76.6994 + rng.uniform(-deg, deg, num_nodes)])
+
+    graph = knn_graph(coords, k=k, seed=seed)
+    graph.weights *= rng.uniform(1.0, 1.3, graph.num_edges)
+    graph.invalidate()
+    return graph
+
+
+def random_queries(graph, count, seed=0):
+    """Return ``count`` random (source, target) node ID pairs"""
+    rng = random.Random(seed)
+    n = graph.num_nodes
+    return [(rng.randrange(n), rng.randrange(n)) for _ in range(count)]
+
+
+def time_queries(fn, queries):
+    """Run ``fn(source, target)`` for each query, returning per-query seconds"""
+    timings = []
+    for source, target in queries:
+        started = time.perf_counter()
+        fn(source, target)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarize(timings):
+    """Return (mean, p50, p99) of a list of timings in milliseconds"""
+    ms = sorted(t * 1000 for t in timings)
+    p50 = ms[len(ms) // 2]
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    return sum(ms) / len(ms), p50, p99
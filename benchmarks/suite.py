@@ -0,0 +1,197 @@
+"""
+Reproducible benchmark suite with stored baselines.
+
+    python -m benchmarks.suite                       # compare with benchmarks/baselines.json
+    python -m benchmarks.suite --sizes 1000 1000000  # pick graph sizes (1k-1M nodes)
+    python -m benchmarks.suite --update              # record new baselines
+
+Every case is a seeded synthetic graph, a grid or a random geometric
+(k-nearest-neighbour) network, run in its own process so that peak memory
+belongs to that case alone. A case reports the build time (generation plus
+the adjacency lists and reverse graph every search needs), p50 and p99
+query latency per search mode, the nodes settled and heap pushes per query
+taken from ``routing.metrics``, and peak resident memory. Each query is
+timed ``--repeat`` times and the fastest run counts.
+
+Every case also times a fixed pure-Python heap workload. Times are scaled
+by how much slower that calibration ran than in the baseline run, so a
+loaded or slower machine does not pass for a regression. Times and memory
+may then exceed their baseline by ``--tolerance``, a share that is ignored
+under a small absolute floor. Settled nodes and heap pushes are
+deterministic for a seeded graph and may only grow by 5%. The script exits
+with status 1 if any measure regresses past its baseline. Cases without a
+baseline are reported as new. Baselines from a very different machine or
+Python version are best recorded afresh with ``--update``.
+"""
+import argparse
+import heapq
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from routing import shortest_path
+from routing.metrics import metrics
+
+from .common import grid_graph, random_geometric_graph, random_queries, summarize, time_queries
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+FAMILIES = {"grid": grid_graph, "rgg": random_geometric_graph}
+MODES = ["dijkstra", "astar", "bidijkstra"]
+
+# Deterministic counters may only grow this much; below each floor, differences are noise
+COUNTER_TOLERANCE = 0.05
+FLOORS = {"_s": 0.05, "_ms": 0.5, "_mb": 10.0}
+
+
+def query_count(nodes):
+    """Queries per mode for a graph of ``nodes`` nodes: fewer on bigger graphs"""
+    return max(5, min(200, 2_000_000 // nodes))
+
+
+def calibrate(repeat=5):
+    """Fastest of ``repeat`` runs of a fixed heap workload, in ms"""
+    values = [(i * 7919) % 100_003 for i in range(100_000)]
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        heap = []
+        for value in values:
+            heapq.heappush(heap, value)
+        while heap:
+            heapq.heappop(heap)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run_case(family, nodes, queries, repeat):
+    """Build one graph and time every search mode on it; return flat measures"""
+    calibration = calibrate()
+    started = time.perf_counter()
+    graph = FAMILIES[family](nodes, seed=1)
+    graph.adjacency_lists()
+    graph.reverse().adjacency_lists()
+    results = {"build_s": time.perf_counter() - started}
+
+    pairs = random_queries(graph, queries, seed=2)
+    metrics.enable()
+    for mode in MODES:
+        # One untimed query first so lazily built structures are not charged to the first
+        shortest_path(graph, *pairs[0], mode=mode)
+        metrics.reset()
+        timings = time_queries(lambda source, target: shortest_path(graph, source, target, mode=mode), pairs)
+        counters = metrics.snapshot()["counters"]
+        for _ in range(repeat - 1):
+            again = time_queries(lambda source, target: shortest_path(graph, source, target, mode=mode), pairs)
+            timings = [min(pair) for pair in zip(timings, again)]
+        _, p50, p99 = summarize(timings)
+        results[f"{mode}.p50_ms"] = p50
+        results[f"{mode}.p99_ms"] = p99
+        results[f"{mode}.settled"] = sum(value for key, value in counters.items()
+                                         if key.endswith(".settled")) / len(pairs)
+        results[f"{mode}.heap_pushes"] = sum(value for key, value in counters.items()
+                                             if key.endswith(".heap_pushes")) / len(pairs)
+    # Calibrate again after the queries and keep the faster, as for the query timings
+    results["calibration_ms"] = min(calibration, calibrate())
+    results["peak_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def measure(case, queries=None, repeat=3):
+    """Run ``case`` ("grid:10000") in a fresh interpreter and return its measures"""
+    command = [sys.executable, "-m", "benchmarks.suite", "--case", case, "--repeat", str(repeat)]
+    if queries:
+        command += ["--queries", str(queries)]
+    output = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def regressions(results, baseline, tolerance):
+    """
+    Return (measure, value, baseline) for every measure worse than its baseline allows.
+
+    Times are divided by the calibration slowdown first; a faster machine is
+    not given extra credit.
+    """
+    slowdown = max(1.0, results["calibration_ms"] / baseline.get("calibration_ms", results["calibration_ms"]))
+    worse = []
+    for key, value in results.items():
+        base = baseline.get(key)
+        if base is None or key == "calibration_ms":
+            continue
+        if key.endswith(("_s", "_ms")):
+            value /= slowdown
+        floor = next((f for suffix, f in FLOORS.items() if key.endswith(suffix)), None)
+        if floor is None:
+            allowed = base * (1 + COUNTER_TOLERANCE)
+        else:
+            allowed = max(base * (1 + tolerance), base + floor)
+        if value > allowed:
+            worse.append((key, value, base))
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--families", nargs="+", choices=sorted(FAMILIES), default=["grid", "rgg"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, help="queries per mode (default scales with size)")
+    parser.add_argument("--repeat", type=int, default=3, help="timings per query; the fastest counts")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed share over baseline for times and memory")
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--update", action="store_true", help="store these results as the baselines")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        family, nodes = args.case.split(":")
+        nodes = int(nodes)
+        print(json.dumps(run_case(family, nodes, args.queries or query_count(nodes), args.repeat)))
+        return
+
+    stored = {"cases": {}}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, encoding="utf-8") as f:
+            stored = json.load(f)
+
+    failed = []
+    for family in args.families:
+        for nodes in args.sizes:
+            case = f"{family}:{nodes}"
+            results = measure(case, args.queries, args.repeat)
+            baseline = stored["cases"].get(case)
+            print(f"{case:<18}build {results['build_s']:.2f} s, peak {results['peak_mb']:.0f} MB, "
+                  f"calibration {results['calibration_ms']:.1f} ms")
+            for mode in MODES:
+                print(f"  {mode:<16}p50 {results[f'{mode}.p50_ms']:.2f} ms, "
+                      f"p99 {results[f'{mode}.p99_ms']:.2f} ms, "
+                      f"{results[f'{mode}.settled']:.0f} settled, "
+                      f"{results[f'{mode}.heap_pushes']:.0f} heap pushes")
+            if baseline is None:
+                print("  baseline        none (new case)")
+            else:
+                worse = regressions(results, baseline, args.tolerance)
+                for key, value, base in worse:
+                    print(f"  REGRESSION      {key} {value:.2f} vs baseline {base:.2f}")
+                failed += [(case, key) for key, _, _ in worse]
+            if args.update:
+                stored["cases"][case] = results
+
+    if args.update:
+        stored["machine"] = f"{platform.machine()} {platform.processor()} Python {platform.python_version()}".strip()
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines         written to {args.baselines}")
+    print(f"regressions       {len(failed)}")
+    if failed and not args.update:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,86 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+import argparse
+import itertools
 import threading
 import time
 import os
 import webbrowser
-import folium
-import random
-import math
 from functools import partial
 
+from routing.coverage import isochrones
+from routing.engine import AMBULANCE_UNITS, SHEGAON_CENTER, SHEGAON_HOSPITALS, SHEGAON_LOCATIONS, RoutingEngine
+from routing.mapview import MapView
+from routing.metrics import metrics
+from routing.tasks import TaskRunner
+from routing.timedep import format_clock, parse_departure
+from routing.trajectory import route_track, segment_seconds, timestamped_feature
+
 class AmbulanceRouteFinder:
-    def __init__(self, root):
+    def __init__(self, root, road_file=None):
         self.root = root
         self.root.title("🚑 Shegaon Ambulance Route Finder")
-        self.root.geometry("500x600")
+        self.root.geometry("500x820")
         self.root.configure(bg="#f0f0f0")
         
         # Center coordinates for Shegaon
-        self.shegaon_coords = (20.7937, 76.6994)
+        self.shegaon_coords = SHEGAON_CENTER
         self.current_route = None
-        self.map_file = "shegaon_map.html"
-        
-        # Define important locations in Shegaon
-        self.locations = [
-            ("Dr. Hedgewar Hospital", (20.7930, 76.6985)),
-            ("Shree Gajanan Maharaj Mandir", (20.7937, 76.6994)),
-            ("Bus Stand", (20.7940, 76.7010)),
-            ("Shegaon Railway Station", (20.7970, 76.7000)),
-            ("Main Bazaar", (20.7935, 76.7002)),
-            ("Subhash Nagar", (20.7915, 76.6980)),
-            ("Civil Hospital", (20.7945, 76.6970)),
-            ("Shivaji Nagar", (20.7925, 76.7015)),
-            ("Akot Road", (20.7960, 76.7020)),
-            ("Gandhi Chowk", (20.7933, 76.6990))
-        ]
-        
-        # Virtual road network (simplified)
-        self.road_network = self._create_dummy_road_network()
+        self.current_eta_minutes = None
+        
+        # Simulations sample the ambulance position every sim_tick_seconds of
+        # travel and play back sim_playback times faster than real time
+        self.sim_tick_seconds = 1.0
+        self.sim_playback = 10.0
+        
+        # The base map is rendered once per graph version into map_cache/;
+        # routes and markers go out as GeoJSON overlays the open page swaps in
+        self.map_view = MapView("map_cache", centre=self.shegaon_coords)
+        self.base_map_file = None
+        self.opened_map_file = None
+        
+        # Search modes offered in the UI, mapped to routing engine mode names
+        self.search_modes = {
+            "Dijkstra": "dijkstra",
+            "A* (straight-line)": "astar",
+            "Bidirectional Dijkstra": "bidijkstra",
+            "Bidirectional A*": "biastar",
+            "Contraction Hierarchy": "ch",
+            "Time-dependent (departure time)": "td",
+        }
+        
+        # Important locations and the ambulance units stationed at them
+        self.locations = SHEGAON_LOCATIONS
+        self.ambulance_units = AMBULANCE_UNITS
+        self.busy_units = set()
+        self.dispatched_unit = None
+        
+        # Coverage analysis: minutes from the nearest hospital to shade on the
+        # map (the largest is the response target) and the raster cell size
+        self.hospitals = SHEGAON_HOSPITALS
+        self.coverage_minutes = (4, 8)
+        self.coverage_cell_m = 100
+        
+        # Routes offered per query, counting the fastest, so the crew has a
+        # fallback ready if a road turns out to be blocked
+        self.route_alternatives = 3
+        self.alternative_colours = ["#1976D2", "#7B1FA2", "#00897B"]
+        
+        # All routing runs in the headless engine. The virtual road network is
+        # seeded so it stays identical across launches; a real road file, if
+        # given, is parsed in the background instead.
+        self.engine = RoutingEngine(self.locations, road_file=road_file,
+                                    snapshot_file="shegaon_network.snapshot", seed=42)
+        
+        # Searches, map rendering and browser launches run on a small worker
+        # pool and report back through root.after, so the window never
+        # freezes. The engine and the map files are used by one worker at a
+        # time; a new request cancels the one it replaces.
+        self.tasks = TaskRunner(lambda fn: self.root.after(0, fn), workers=2,
+                                on_progress=self._task_progress)
+        self.engine_lock = threading.RLock()
+        self.map_lock = threading.RLock()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
         # Create a style
         style = ttk.Style()
@@ -47,8 +91,8 @@ class AmbulanceRouteFinder:
         
         self.create_widgets()
         
-        # Load dummy map data (much faster)
-        self.load_dummy_map_data()
+        # Load the road network and base map in the background
+        self.load_map_data()
     
     def create_widgets(self):
         # Main frame
@@ -70,9 +114,10 @@ class AmbulanceRouteFinder:
         self.status_label.pack(pady=(0, 10))
         
         # Progress bar for map loading
-        self.progress = ttk.Progressbar(main_frame, orient=tk.HORIZONTAL, length=300, mode='indeterminate')
+        self.progress_var = tk.DoubleVar(value=0.0)
+        self.progress = ttk.Progressbar(main_frame, orient=tk.HORIZONTAL, length=300, mode='determinate',
+                                        maximum=100, variable=self.progress_var)
         self.progress.pack(pady=(0, 15))
-        self.progress.start(10)
         
         # Location selection frame
         select_frame = ttk.LabelFrame(main_frame, text="Select Locations", padding=10)
@@ -82,7 +127,7 @@ class AmbulanceRouteFinder:
         ttk.Label(select_frame, text="Emergency Start Point:").grid(row=0, column=0, sticky=tk.W, pady=5)
         self.start_var = tk.StringVar()
         self.start_combo = ttk.Combobox(select_frame, textvariable=self.start_var, 
-                                      values=[loc[0] for loc in self.locations], state='readonly', width=25)
+                                      values=[loc[0] for loc in self.locations], width=25)
         self.start_combo.grid(row=0, column=1, padx=5, pady=5)
         self.start_combo.current(0)
         
@@ -90,10 +135,34 @@ class AmbulanceRouteFinder:
         ttk.Label(select_frame, text="Emergency Destination:").grid(row=1, column=0, sticky=tk.W, pady=5)
         self.dest_var = tk.StringVar()
         self.dest_combo = ttk.Combobox(select_frame, textvariable=self.dest_var, 
-                                     values=[loc[0] for loc in self.locations], state='readonly', width=25)
+                                     values=[loc[0] for loc in self.locations], width=25)
         self.dest_combo.grid(row=1, column=1, padx=5, pady=5)
         self.dest_combo.current(1)
         
+        # Search mode
+        ttk.Label(select_frame, text="Search Mode:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.mode_var = tk.StringVar()
+        self.mode_combo = ttk.Combobox(select_frame, textvariable=self.mode_var, 
+                                     values=list(self.search_modes), state='readonly', width=25)
+        self.mode_combo.grid(row=2, column=1, padx=5, pady=5)
+        self.mode_combo.current(0)
+        
+        # Departure time for time-dependent ETAs, defaulting to now
+        ttk.Label(select_frame, text="Departure (HH:MM):").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.departure_var = tk.StringVar(value=time.strftime("%H:%M"))
+        ttk.Entry(select_frame, textvariable=self.departure_var, width=8).grid(row=3, column=1, padx=5,
+                                                                               pady=5, sticky=tk.W)
+        
+        # Dispatch the closest free ambulance to the destination
+        self.unit_btn = ttk.Button(select_frame, text="Nearest Available Unit", command=self.nearest_unit,
+                                   state=tk.DISABLED)
+        self.unit_btn.grid(row=4, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        # Shade what the hospitals reach in time and suggest a standby point
+        self.coverage_btn = ttk.Button(select_frame, text="Hospital Coverage", command=self.show_coverage,
+                                       state=tk.DISABLED)
+        self.coverage_btn.grid(row=4, column=0, pady=5, sticky=tk.W)
+        
         # Action buttons
         btn_frame = ttk.Frame(main_frame)
         btn_frame.pack(fill=tk.X, pady=15)
@@ -110,6 +179,16 @@ class AmbulanceRouteFinder:
         self.map_btn = ttk.Button(btn_frame, text="View Full Map", command=self.view_map, state=tk.DISABLED)
         self.map_btn.pack(side=tk.LEFT, padx=5)
         
+        # Progress of the current background request
+        self.task_progress_var = tk.DoubleVar(value=0.0)
+        self.task_progress = ttk.Progressbar(main_frame, orient=tk.HORIZONTAL, length=300, mode='determinate',
+                                             maximum=100, variable=self.task_progress_var)
+        self.task_progress.pack(pady=(0, 5))
+        
+        # A changed selection makes any in-flight route request stale
+        for var in (self.start_var, self.dest_var, self.mode_var, self.departure_var):
+            var.trace_add("write", self._selection_changed)
+        
         # Results frame
         result_frame = ttk.LabelFrame(main_frame, text="Route Information", padding=10)
         result_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -121,6 +200,19 @@ class AmbulanceRouteFinder:
         self.info_text.insert(tk.END, "Map data loading... Please wait.")
         self.info_text.config(state=tk.DISABLED)
         
+        # Debug section: stage timings and counters, switched on at runtime
+        debug_frame = ttk.Frame(result_frame)
+        debug_frame.pack(fill=tk.X, pady=(5, 0))
+        self.debug_var = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(debug_frame, text="Debug metrics", variable=self.debug_var,
+                        command=self.toggle_debug).pack(side=tk.LEFT)
+        ttk.Button(debug_frame, text="Export JSON", command=self.export_metrics).pack(side=tk.RIGHT)
+        self.debug_text = tk.Text(result_frame, height=7, width=50, wrap=tk.NONE,
+                                  font=('Courier New', 8), bg='#f8f8f8')
+        if metrics.enabled:
+            self.debug_text.pack(fill=tk.X, pady=(5, 0))
+        self.debug_text.config(state=tk.DISABLED)
+        
         # Ambulance status
         status_frame = ttk.Frame(main_frame)
         status_frame.pack(fill=tk.X, pady=10)
@@ -130,198 +222,113 @@ class AmbulanceRouteFinder:
                               font=('Arial', 12, 'bold'), foreground="#4CAF50")
         status_label.pack()
     
-    def _create_dummy_road_network(self):
-        """Create a simplified dummy road network based on known locations"""
-        road_network = {}
-        
-        # For each location, create connections to 3-5 nearest locations
-        for name1, coords1 in self.locations:
-            # Find distances to all other locations
-            distances = []
-            for name2, coords2 in self.locations:
-                if name1 != name2:
-                    # Calculate distance between locations
-                    dist = self._haversine_distance(coords1, coords2)
-                    distances.append((name2, dist))
-            
-            # Sort by distance
-            distances.sort(key=lambda x: x[1])
-            
-            # Connect to 3-5 nearest locations
-            num_connections = random.randint(3, min(5, len(distances)))
-            road_network[name1] = [(name2, dist) for name2, dist in distances[:num_connections]]
-            
-        return road_network
+    def load_map_data(self):
+        """Load the road network and base map on a worker"""
+        self.tasks.submit("load", self._load_map, on_done=lambda _: self._map_loaded(),
+                          on_error=lambda e: self._show_error(f"Error loading map data: {str(e)}"))
     
-    def _haversine_distance(self, coord1, coord2):
-        """Calculate the distance between two coordinates in km"""
-        # Radius of the Earth in km
-        R = 6371.0
-        
-        # Convert coordinates to radians
-        lat1, lon1 = math.radians(coord1[0]), math.radians(coord1[1])
-        lat2, lon2 = math.radians(coord2[0]), math.radians(coord2[1])
-        
-        # Differences
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        # Haversine formula
-        a = math.sin(dlat / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        # Distance in km
-        distance = R * c
-        
-        return distance
+    def _load_map(self, task):
+        """Build or parse the road network, snap locations onto it and draw the base map"""
+        with self.engine_lock:
+            self.engine.load(progress=self._report_progress,
+                             status=lambda message: self.root.after(0, partial(self.status_var.set, message)))
+        self._report_progress(1.0)
+        task.progress(1.0, "Rendering base map...")
+        self._create_base_map()
     
-    def load_dummy_map_data(self):
-        """Simulate loading map data with a short delay"""
-        self.loading_thread = threading.Thread(target=self._simulate_loading)
-        self.loading_thread.daemon = True
-        self.loading_thread.start()
+    def _report_progress(self, fraction):
+        """Forward loader progress (0-1) to the progress bar on the main thread"""
+        self.root.after(0, partial(self.progress_var.set, fraction * 100))
     
-    def _simulate_loading(self):
-        """Simulate loading process with a short delay"""
+    def _task_progress(self, task, fraction, message):
+        """Show the progress of the current background request (main thread)"""
+        self.task_progress_var.set(fraction * 100)
+        if message:
+            self.status_var.set(message)
+    
+    def _task_done(self, message):
+        """Fill the request progress bar and show what finished"""
+        self.task_progress_var.set(100)
+        self.status_var.set(message)
+        self._refresh_debug()
+    
+    def toggle_debug(self):
+        """Switch the routing and rendering instrumentation on or off"""
+        if self.debug_var.get():
+            metrics.reset()
+            metrics.enable()
+            self.debug_text.pack(fill=tk.X, pady=(5, 0))
+        else:
+            metrics.disable()
+            self.debug_text.pack_forget()
+        self._refresh_debug()
+    
+    def _refresh_debug(self):
+        """Show the stage timings and counters recorded since debugging was switched on"""
+        if not metrics.enabled:
+            return
+        lines = metrics.report()
+        self.debug_text.config(state=tk.NORMAL)
+        self.debug_text.delete(1.0, tk.END)
+        self.debug_text.insert(tk.END, f"Since {time.strftime('%H:%M:%S', time.localtime(metrics.since))}:\n")
+        self.debug_text.insert(tk.END, "\n".join(lines) if lines else "Nothing recorded yet.")
+        self.debug_text.config(state=tk.DISABLED)
+    
+    def export_metrics(self):
+        """Save the recorded stage timings and counters as JSON"""
+        path = filedialog.asksaveasfilename(title="Export metrics", defaultextension=".json",
+                                            initialfile="routing-metrics.json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
         try:
-            # Create the road network (already done in init)
-            self._create_base_map()
-            
-            # Artificial delay to simulate loading (much shorter)
-            time.sleep(1.0)
-            
-            # Update UI from the main thread
-            self.root.after(0, self._map_loaded)
-        except Exception as e:
-            error_msg = f"Error loading map data: {str(e)}"
-            self.root.after(0, lambda msg=error_msg: self._show_error(msg))
+            metrics.to_json(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not export metrics: {str(e)}")
+            return
+        self.status_var.set(f"Metrics exported to {os.path.basename(path)}")
+    
+    def _selection_changed(self, *args):
+        """Drop any in-flight route request once the dispatcher changes the inputs"""
+        if self.tasks.busy("route"):
+            self.tasks.cancel("route")
+            self.task_progress_var.set(0)
+            self.status_var.set("Route request cancelled")
     
     def _map_loaded(self):
         """Called when map is successfully loaded"""
-        self.progress.stop()
         self.progress.pack_forget()
         self.status_var.set("Map data loaded successfully!")
         self.status_label.config(foreground="#4CAF50")
         
         # Enable buttons
         self.route_btn.config(state=tk.NORMAL)
+        self.unit_btn.config(state=tk.NORMAL)
+        self.coverage_btn.config(state=tk.NORMAL)
         self.map_btn.config(state=tk.NORMAL)
         
         # Update info text
         self.info_text.config(state=tk.NORMAL)
         self.info_text.delete(1.0, tk.END)
-        self.info_text.insert(tk.END, "Map loaded successfully. Select start and destination points to find a route.")
+        self.info_text.insert(tk.END, "Map loaded successfully. Select start and destination points to find a route, "
+                                      "or type coordinates as 'lat, lon'.")
         self.info_text.config(state=tk.DISABLED)
     
     def _show_error(self, message):
         """Show error message on UI"""
-        self.progress.stop()
         self.status_var.set("Error loading map")
         self.status_label.config(foreground="red")
         messagebox.showerror("Error", message)
     
     def _create_base_map(self):
-        """Create and save the base map with location markers"""
-        m = folium.Map(location=self.shegaon_coords, zoom_start=15, 
-                     tiles="cartodbpositron")
-        
-        # Add all location markers
-        for name, coords in self.locations:
-            popup_text = f"<b>{name}</b>"
-            folium.Marker(
-                location=[coords[0], coords[1]],
-                popup=popup_text,
-                tooltip=name,
-                icon=folium.Icon(icon="map-marker", prefix="fa", color="blue")
-            ).add_to(m)
-        
-        # Add roads (simplified)
-        added_roads = set()  # Keep track of roads we've already added
-        
-        for name1, connections in self.road_network.items():
-            coords1 = next((loc[1] for loc in self.locations if loc[0] == name1), None)
-            
-            for name2, _ in connections:
-                # Create a unique road identifier
-                road_id = tuple(sorted([name1, name2]))
-                
-                # Skip if we've already added this road
-                if road_id in added_roads:
-                    continue
-                    
-                coords2 = next((loc[1] for loc in self.locations if loc[0] == name2), None)
-                
-                # Add the road line
-                if coords1 and coords2:
-                    folium.PolyLine(
-                        [coords1, coords2],
-                        color="gray",
-                        weight=2,
-                        opacity=0.7
-                    ).add_to(m)
-                    
-                    # Mark as added
-                    added_roads.add(road_id)
-        
-        # Save the map
-        m.save(self.map_file)
-    
-    def _dijkstra(self, start, end):
-        """
-        Find shortest path using Dijkstra's algorithm.
-        This is a simplified version for our dummy network.
-        """
-        # Initialize distances with infinity for all nodes except start
-        distances = {loc[0]: float('infinity') for loc in self.locations}
-        distances[start] = 0
-        
-        # Track previous nodes for path reconstruction
-        previous = {loc[0]: None for loc in self.locations}
-        
-        # Unvisited nodes
-        unvisited = set(loc[0] for loc in self.locations)
-        
-        while unvisited:
-            # Find unvisited node with minimum distance
-            current = min(unvisited, key=lambda x: distances[x])
-            
-            # If we reached the end or no path exists
-            if current == end or distances[current] == float('infinity'):
-                break
-                
-            # Remove current from unvisited
-            unvisited.remove(current)
-            
-            # Check all neighbors of current
-            if current in self.road_network:
-                for neighbor, distance in self.road_network[current]:
-                    # Calculate potential new distance
-                    new_distance = distances[current] + distance
-                    
-                    # Update if shorter path found
-                    if new_distance < distances[neighbor]:
-                        distances[neighbor] = new_distance
-                        previous[neighbor] = current
-        
-        # Reconstruct path
-        path = []
-        current = end
-        
-        while current:
-            path.append(current)
-            current = previous[current]
-            
-        # Reverse to get path from start to end
-        path.reverse()
-        
-        # Check if path exists
-        if path[0] != start:
-            return None, float('infinity')
-            
-        return path, distances[end]
+        """Render the base map (roads and location markers) unless this graph version is cached"""
+        with metrics.stage("gui.base_map"), self.map_lock:
+            self.base_map_file = self.map_view.base(self.engine.graph, self.locations)
+            self.map_view.clear()
     
     def find_route(self):
-        """Find the fastest route between selected points"""
+        """Find the fastest route between selected points on a worker"""
+        self.dispatched_unit = None
         start_name = self.start_var.get()
         dest_name = self.dest_var.get()
         
@@ -329,214 +336,393 @@ class AmbulanceRouteFinder:
             messagebox.showwarning("Warning", "Start and destination cannot be the same.")
             return
         
-        try:
-            # Find route using our simplified Dijkstra
-            route, distance = self._dijkstra(start_name, dest_name)
-            
-            if not route:
-                messagebox.showerror("Error", "No route found between these locations.")
-                return
-                
-            self.current_route = route
-            
-            # Get route coordinates
-            route_coords = [next((loc[1] for loc in self.locations if loc[0] == name), None) for name in route]
-            
-            # Calculate estimated travel time (assuming ambulance speed of 40 km/h average in town)
-            ambulance_speed_kmh = 40
-            travel_time_hours = distance / ambulance_speed_kmh
-            travel_time_mins = travel_time_hours * 60
+        self.task_progress_var.set(0)
+        self.tasks.submit("route", partial(self._route_work, start_name, dest_name, self.mode_var.get(),
+                                           self.departure_var.get()),
+                          on_done=self._route_found,
+                          on_error=lambda e: messagebox.showerror("Error", f"Error finding route: {str(e)}"))
+    
+    def _route_work(self, start_name, dest_name, mode_label, departure_text, task):
+        """Search and draw one route (worker thread); returns what the info panel shows"""
+        task.progress(0.1, f"Finding route to {dest_name}...")
+        with self.engine_lock:
+            start_place = self.engine.parse_place(start_name)
+            dest_place = self.engine.parse_place(dest_name)
             
-            # Update info text
-            self.info_text.config(state=tk.NORMAL)
-            self.info_text.delete(1.0, tk.END)
-            self.info_text.insert(tk.END, f"Route from {start_name} to {dest_name}:\n\n")
-            self.info_text.insert(tk.END, f"Path: {' → '.join(route)}\n\n")
-            self.info_text.insert(tk.END, f"Distance: {distance:.2f} km\n")
-            self.info_text.insert(tk.END, f"Estimated travel time: {travel_time_mins:.1f} minutes\n")
-            self.info_text.insert(tk.END, f"Number of stops: {len(route) - 2}\n\n")
-            self.info_text.insert(tk.END, "Route created successfully. Click 'Simulate Ambulance' to visualize.")
-            self.info_text.config(state=tk.DISABLED)
+            # Find route with the selected search mode
+            mode = self.search_modes[mode_label]
+            departure = parse_departure(departure_text) if mode == "td" else None
+            hits = self.engine.route_cache.hits
+            result = self.engine.route(start_place, dest_place, mode, departure=departure)
+            cached = self.engine.route_cache.hits > hits
+            route = result.path
             
-            # Create and display the route map
-            self._create_route_map(route_coords, start_name, dest_name)
+            found = {"start_name": start_name, "dest_name": dest_name, "mode_label": mode_label,
+                     "departure": departure, "result": result, "cached": cached}
+            if not route or len(route) < 2:
+                return found
             
-            # Enable simulation button
-            self.sim_btn.config(state=tk.NORMAL)
+            # Get route coordinates and the named places along it
+            route_coords = self.engine.graph.coords[route].tolist()
+            found["stops"] = self.engine.stops(route, start_name, dest_name)
             
-            # Update ambulance status
-            self.ambulance_status.set("Route calculated, ready for dispatch 🚑")
+            # Different fallback routes from the cached trees of both endpoints
+            found["alternatives"] = []
+            if mode != "td" and self.route_alternatives > 1:
+                task.progress(0.4, "Finding alternative routes...")
+                # The first is the shortest route, which the search above already found
+                found["alternatives"] = self.engine.alternatives(
+                    start_place, dest_place, self.route_alternatives)[1:]
+            alternatives = [(self.engine.graph.coords[alternative.path].tolist(),
+                             f"Alternative {i} (+{alternative.eta_minutes - result.eta_minutes:.1f} min)")
+                            for i, alternative in enumerate(found["alternatives"], start=2)]
+        
+        # Create and display the route map, unless a newer request replaced this one
+        task.progress(0.6, "Drawing route...")
+        self._create_route_map(route, route_coords, start_place, dest_place, task, alternatives)
+        return found
+    
+    def _route_found(self, found):
+        """Show a finished route request in the info panel (main thread)"""
+        result = found["result"]
+        route = result.path
+        if not route:
+            self._task_done("No route found")
+            messagebox.showerror("Error", "No route found between these locations.")
+            return
+        if len(route) < 2:
+            self._task_done("Start and destination coincide")
+            messagebox.showwarning("Warning", "Start and destination are at the same road junction.")
+            return
+        
+        self.current_route = route
+        self.current_eta_minutes = result.eta_minutes
+        
+        stops = found["stops"]
+        departure = found["departure"]
+        distance = result.distance_km
+        travel_time_mins = result.eta_minutes
+        search_info = "served from route cache" if found["cached"] else f"{result.settled} nodes settled"
+        cache = self.engine.route_cache
+        
+        # Update info text
+        self.info_text.config(state=tk.NORMAL)
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(tk.END, f"Route from {found['start_name']} to {found['dest_name']}:\n\n")
+        self.info_text.insert(tk.END, f"Path: {' → '.join(stops)}\n\n")
+        self.info_text.insert(tk.END, f"Distance: {distance:.2f} km\n")
+        self.info_text.insert(tk.END, f"Estimated travel time: {travel_time_mins:.1f} minutes\n")
+        if departure is None:
+            self.info_text.insert(tk.END, "Departure: any time (free-flow speeds)\n")
+        else:
+            self.info_text.insert(tk.END, f"Departure: {format_clock(departure)}, arriving "
+                                          f"{format_clock(departure + travel_time_mins)} "
+                                          f"(time-of-day traffic)\n")
+        self.info_text.insert(tk.END, f"Number of stops: {len(stops) - 2}\n")
+        self.info_text.insert(tk.END, f"Search: {found['mode_label']} ({search_info})\n")
+        self.info_text.insert(tk.END, f"Route cache: {cache.hits} hits, {cache.misses} misses, "
+                                      f"{cache.evictions} evictions\n\n")
+        if found["alternatives"]:
+            # How much of each fallback avoids the roads of the main route
+            roads = set(zip(route, route[1:]))
+            self.info_text.insert(tk.END, "Alternatives if a road is blocked:\n")
+            for i, alternative in enumerate(found["alternatives"], start=2):
+                own = list(zip(alternative.path, alternative.path[1:]))
+                shared = sum(road in roads for road in own) / len(own)
+                self.info_text.insert(tk.END, f"  Route {i}: {alternative.distance_km:.2f} km, "
+                                              f"{alternative.eta_minutes:.1f} min "
+                                              f"(+{alternative.eta_minutes - travel_time_mins:.1f}), "
+                                              f"{shared:.0%} of roads shared\n")
+            self.info_text.insert(tk.END, "\n")
+        self.info_text.insert(tk.END, "Route created successfully. Click 'Simulate Ambulance' to visualize.")
+        self.info_text.config(state=tk.DISABLED)
+        
+        # Enable simulation button
+        self.sim_btn.config(state=tk.NORMAL)
+        
+        # Update ambulance status
+        self._task_done("Route ready")
+        self.ambulance_status.set("Route calculated, ready for dispatch 🚑")
+    
+    def nearest_unit(self):
+        """Route the nearest available ambulance unit to the selected destination"""
+        available = [(unit, station) for unit, station in self.ambulance_units if unit not in self.busy_units]
+        if not available:
+            messagebox.showwarning("Warning", "All ambulance units are busy.")
+            return
+        
+        self.dispatched_unit = None
+        self.task_progress_var.set(0)
+        self.tasks.submit("route", partial(self._nearest_unit_work, available, self.dest_var.get(),
+                                           self.mode_var.get(), self.departure_var.get()),
+                          on_done=self._unit_found,
+                          on_error=lambda e: messagebox.showerror("Error", f"Error finding nearest unit: {str(e)}"))
+    
+    def _nearest_unit_work(self, available, dest_name, mode_label, departure_text, task):
+        """Rank the units and route the closest one (worker thread)"""
+        task.progress(0.05, "Ranking available units...")
+        with self.engine_lock:
+            # One reverse search from the destination reaches every station
+            target = self.engine.resolve(dest_name)
+            ranking = self.engine.rank_units(available, target)
+        
+        best_cost, (unit, station) = ranking[0]
+        if best_cost == float('infinity'):
+            raise ValueError("No available unit can reach this destination.")
+        found = {"unit": unit, "station": station, "ranking": ranking}
+        if self.engine.registry.node(station) == target:
+            return found
+        found.update(self._route_work(station, dest_name, mode_label, departure_text, task))
+        return found
+    
+    def _unit_found(self, found):
+        """Show the routed unit and every available unit's ETA (main thread)"""
+        unit, station = found["unit"], found["station"]
+        if "result" not in found:
+            self._task_done("Unit already on scene")
+            messagebox.showinfo("Nearest Unit", f"{unit} is already at the destination ({station}).")
+            return
+        
+        self.start_var.set(station)
+        self._route_found(found)
+        if not found["result"].path or len(found["result"].path) < 2:
+            return
+        self.dispatched_unit = unit
+        
+        # List every available unit's ETA under the route details
+        self.info_text.config(state=tk.NORMAL)
+        self.info_text.insert(tk.END, f"\n\nNearest available unit: {unit} at {station}\n")
+        for cost, (other, other_station) in found["ranking"]:
+            eta = f"{self.engine.cost_minutes(cost):.1f} min" if cost != float('infinity') else "unreachable"
+            self.info_text.insert(tk.END, f"  {other} ({other_station}): {eta}\n")
+        self.info_text.config(state=tk.DISABLED)
+        self.ambulance_status.set(f"{unit} selected, ready for dispatch 🚑")
+    
+    def show_coverage(self):
+        """Shade the areas within reach of the hospitals and suggest the best new standby point"""
+        self.task_progress_var.set(0)
+        self.tasks.submit("coverage", self._coverage_work, on_done=self._coverage_ready,
+                          on_error=lambda e: messagebox.showerror("Error", f"Error computing coverage: {str(e)}"))
+    
+    def _coverage_work(self, task):
+        """Coverage search, isochrones and the standby suggestion, drawn on the map (worker thread)"""
+        task.progress(0.1, "Computing hospital coverage...")
+        with self.engine_lock:
+            # One multi-source search from both hospitals covers every junction
+            planner = self.engine.coverage_planner(self.hospitals)
+            minutes = planner.coverage.minutes
+            target = max(self.coverage_minutes)
+            shares = [(limit, planner.share(limit)) for limit in self.coverage_minutes]
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Error finding route: {str(e)}")
+            # What-if: which known location would add the most coverage as a standby point
+            task.progress(0.4, "Scoring standby points...")
+            candidates = {self.engine.registry.node(name): name for name, _ in self.locations
+                          if name not in self.hospitals}
+            picks = planner.greedy(list(candidates), 1, target)
+        
+        task.progress(0.7, "Drawing coverage areas...")
+        bands = isochrones(self.engine.graph, minutes, sorted(self.coverage_minutes, reverse=True),
+                           self.engine.minutes_per_unit, cell_m=self.coverage_cell_m)
+        
+        # Lighter shading for the wider band, hospitals and the suggestion on top
+        colours = ["#A5D6A7", "#2E7D32", "#1B5E20"]
+        areas = [{"rings": rings, "color": colours[min(i, len(colours) - 1)], "opacity": 0.3,
+                  "tolerance": self.coverage_cell_m / 2, "tooltip": f"Within {limit:g} min of a hospital"}
+                 for i, (limit, rings) in enumerate(bands)]
+        markers = [{"location": list(self.engine.registry.location_coords(name)), "popup": f"<b>{name}</b>",
+                    "tooltip": name, "icon": "plus", "color": "red"} for name in self.hospitals]
+        for pick in picks:
+            name = candidates[pick.candidate]
+            markers.append({"location": list(self.engine.registry.location_coords(name)),
+                            "popup": f"<b>{name}</b> (suggested standby point)", "tooltip": name,
+                            "icon": "star", "color": "purple"})
+        with self.map_lock:
+            task.check()
+            self.base_map_file = self.map_view.base(self.engine.graph, self.locations)
+            self.map_view.show(areas=areas, markers=markers)
+            if self.opened_map_file != self.base_map_file:
+                self._open_map()
+        return {"minutes": minutes, "target": target, "shares": shares,
+                "picks": [(candidates[pick.candidate], pick) for pick in picks]}
+    
+    def _coverage_ready(self, coverage):
+        """Show the coverage summary in the info panel (main thread)"""
+        target, shares = coverage["target"], coverage["shares"]
+        self.info_text.config(state=tk.NORMAL)
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(tk.END, f"Coverage from {' and '.join(self.hospitals)}:\n\n")
+        for limit, share in shares:
+            self.info_text.insert(tk.END, f"Within {limit:g} min: {share:.1%} of road junctions\n")
+        self.info_text.insert(tk.END, f"Beyond {target:g} min: {int((coverage['minutes'] > target).sum())} "
+                                      f"junctions\n\n")
+        if coverage["picks"]:
+            name, pick = coverage["picks"][0]
+            self.info_text.insert(tk.END, f"Best new standby point: {name} "
+                                          f"(+{pick.gain:.0f} junctions, {target:g}-min coverage "
+                                          f"{shares[-1][1]:.1%} → {pick.share:.1%})")
+        else:
+            self.info_text.insert(tk.END, f"No other location would improve {target:g}-minute coverage.")
+        self.info_text.config(state=tk.DISABLED)
+        self._task_done("Coverage ready")
+        self.ambulance_status.set(f"Coverage within {target:g} min: {shares[-1][1]:.0%}")
     
-    def _create_route_map(self, route_coords, start_name, dest_name):
-        """Create a map with the calculated route"""
-        m = folium.Map(location=self.shegaon_coords, zoom_start=15, tiles="cartodbpositron")
+    def _create_route_map(self, route, route_coords, start_place, dest_place, task=None, alternatives=()):
+        """
+        Show a calculated route between two location names or (lat, lon)
+        tuples as an overlay, with any ``(coords, tooltip)`` alternatives
+        drawn underneath in their own colours; skipped if ``task`` was
+        cancelled meanwhile.
+        """
+        route_nodes = set(route)
+        markers = []
+        
+        # Mark the endpoints, whether typed coordinates or named locations
+        for place, label, icon_color, icon_type in ((start_place, "START", "green", "ambulance"),
+                                                    (dest_place, "DESTINATION", "red", "plus")):
+            if isinstance(place, str):
+                coords = self.engine.registry.location_coords(place)
+                popup_text = f"<b>{place}</b> ({label})"
+                tooltip = place
+            else:
+                coords = place
+                popup_text = f"<b>{place[0]:.5f}, {place[1]:.5f}</b> ({label})"
+                tooltip = label.title()
+            markers.append({"location": list(coords), "popup": popup_text, "tooltip": tooltip,
+                            "icon": icon_type, "color": icon_color})
         
-        # Add all location markers
+        # Highlight the named locations the route passes through
         for name, coords in self.locations:
-            is_start = name == start_name
-            is_dest = name == dest_name
-            is_route = name in self.current_route and not (is_start or is_dest)
+            if name in (start_place, dest_place):
+                continue
+            if self.engine.registry.node(name) in route_nodes:
+                markers.append({"location": list(coords), "popup": f"<b>{name}</b>", "tooltip": name,
+                                "icon": "map-pin", "color": "orange"})
+        
+        with metrics.stage("gui.route_map"), self.map_lock:
+            if task is not None:
+                task.check()
+            self.base_map_file = self.map_view.base(self.engine.graph, self.locations)
             
-            if is_start:
-                icon_color = "green"
-                icon_type = "ambulance"
-            elif is_dest:
-                icon_color = "red"
-                icon_type = "plus"
-            elif is_route:
-                icon_color = "orange"
-                icon_type = "map-pin"
-            else:
-                icon_color = "blue"
-                icon_type = "map-marker"
-                
-            popup_text = f"<b>{name}</b>"
-            if is_start:
-                popup_text += " (START)"
-            elif is_dest:
-                popup_text += " (DESTINATION)"
-                
-            folium.Marker(
-                location=[coords[0], coords[1]],
-                popup=popup_text,
-                tooltip=name,
-                icon=folium.Icon(icon=icon_type, prefix="fa", color=icon_color)
-            ).add_to(m)
-        
-        # Add the route as a line
-        folium.PolyLine(
-            route_coords,
-            color="#FF5722",
-            weight=5,
-            opacity=0.8,
-            tooltip="Emergency Route"
-        ).add_to(m)
-        
-        # Save the map with route
-        m.save(self.map_file)
-        
-        # Automatically open the map
-        webbrowser.open('file://' + os.path.realpath(self.map_file))
+            # Add the routes as lines, simplified per zoom level, the main route on top
+            lines = [{"coords": coords, "color": self.alternative_colours[i % len(self.alternative_colours)],
+                      "weight": 4, "opacity": 0.6, "tooltip": tooltip}
+                     for i, (coords, tooltip) in enumerate(alternatives)]
+            lines.append({"coords": route_coords, "color": "#FF5722", "weight": 5,
+                          "opacity": 0.8, "tooltip": "Emergency Route"})
+            self.map_view.show(lines=lines, markers=markers, fit=True)
+            
+            # The open page picks the overlay up by itself; only open a page not yet shown
+            if self.opened_map_file != self.base_map_file:
+                self._open_map()
     
     def simulate_ambulance(self):
         """Simulate ambulance movement along the route"""
         if not self.current_route:
             messagebox.showwarning("Warning", "Calculate a route first.")
             return
-            
-        # Update ambulance status
-        self.ambulance_status.set("🚑 Ambulance dispatched!")
+        
+        # Update ambulance status; a dispatched unit is busy until it arrives
+        unit = self.dispatched_unit or "Ambulance"
+        if self.dispatched_unit:
+            self.busy_units.add(self.dispatched_unit)
+        self.ambulance_status.set(f"🚑 {unit} dispatched!")
         
         # Disable buttons during simulation
         self.route_btn.config(state=tk.DISABLED)
         self.sim_btn.config(state=tk.DISABLED)
         
-        # Start simulation in a separate thread
-        sim_thread = threading.Thread(target=self._run_simulation)
-        sim_thread.daemon = True
-        sim_thread.start()
+        self.tasks.submit("sim", partial(self._run_simulation, unit, self.current_route,
+                                         self.current_eta_minutes, self.dest_var.get()),
+                          on_done=self._schedule_simulation,
+                          on_error=partial(self._simulation_failed, unit))
     
-    def _run_simulation(self):
-        """Run the ambulance movement simulation"""
-        try:
-            # Get route coordinates
-            route_coords = [next((loc[1] for loc in self.locations if loc[0] == name), None) for name in self.current_route]
-            
-            # Create a map for the simulation
-            m = folium.Map(location=self.shegaon_coords, zoom_start=15, tiles="cartodbpositron")
-            
-            # Add route points
-            for name in self.current_route[1:-1]:  # Skip start and end
-                coords = next((loc[1] for loc in self.locations if loc[0] == name), None)
-                folium.Marker(
-                    location=coords,
-                    popup=f"<b>{name}</b>",
-                    tooltip=name,
-                    icon=folium.Icon(icon="map-pin", prefix="fa", color="orange")
-                ).add_to(m)
-            
-            # Add the route line
-            folium.PolyLine(
-                route_coords,
-                color="#FF5722",
-                weight=5,
-                opacity=0.8
-            ).add_to(m)
-            
-            # Add destination marker
-            dest_name = self.dest_var.get()
-            dest_coords = next((loc[1] for loc in self.locations if loc[0] == dest_name), None)
-            
-            folium.Marker(
-                location=dest_coords,
-                popup=f"<b>{dest_name}</b> (DESTINATION)",
-                tooltip=dest_name,
-                icon=folium.Icon(icon="plus", prefix="fa", color="red")
-            ).add_to(m)
-            
-            # Create a feature group for the ambulance marker
-            ambulance_group = folium.FeatureGroup(name="Ambulance")
-            m.add_child(ambulance_group)
-            
-            # Simulate movement
-            for i, location_name in enumerate(self.current_route):
-                # Get coordinates for current location
-                coords = next((loc[1] for loc in self.locations if loc[0] == location_name), None)
-                
-                # Update status message
-                progress = int((i + 1) / len(self.current_route) * 100)
-                status_msg = f"🚑 Ambulance en route: {progress}% complete - {location_name}"
-                
-                # Update UI from the main thread - use partial to avoid scope issues
-                self.root.after(0, partial(self.ambulance_status.set, status_msg))
-                
-                # Add the ambulance marker at the current position
-                ambulance_group.add_child(
-                    folium.Marker(
-                        location=coords,
-                        tooltip="Ambulance",
-                        icon=folium.Icon(icon="ambulance", prefix="fa", color="green")
-                    )
-                )
-                
-                # Save and refresh the map
-                m.save(self.map_file)
-                
-                # Make sure to not sleep after the last step
-                if i < len(self.current_route) - 1:
-                    time.sleep(1)
-                    
-                # Clear the ambulance marker for the next step
-                if i < len(self.current_route) - 1:  # Don't clear on the last step
-                    for child in list(ambulance_group._children.values()):
-                        ambulance_group._children.pop(child._name)
-            
-            # Final status update
-            self.root.after(0, partial(self.ambulance_status.set, "🎯 Ambulance arrived at destination!"))
-            
-            # Re-enable buttons
-            self.root.after(0, partial(self.route_btn.config, state=tk.NORMAL))
-            self.root.after(0, partial(self.sim_btn.config, state=tk.NORMAL))
-            
-        except Exception as e:
-            error_msg = f"Simulation error: {str(e)}"
-            self.root.after(0, lambda msg=error_msg: messagebox.showerror("Error", msg))
-            self.root.after(0, partial(self.route_btn.config, state=tk.NORMAL))
-            self.root.after(0, partial(self.sim_btn.config, state=tk.NORMAL))
+    def _run_simulation(self, unit, route, eta_minutes, dest_name, task):
+        """
+        Generate the whole ambulance trajectory in one pass and write it as a
+        single time-stamped overlay that the map page animates (worker
+        thread). Returns what :meth:`_schedule_simulation` needs.
+        """
+        task.progress(0.2, f"Preparing {unit} trajectory...")
+        started = time.perf_counter()
+        route_coords = self.engine.graph.coords[route].tolist()
+        seconds = segment_seconds(self.engine.graph, route, eta_minutes)
+        times, positions = route_track(route_coords, seconds, self.sim_tick_seconds)
+        departure_ms = int(time.time() * 1000)
+        track = timestamped_feature(times, positions, departure_ms, icon="ambulance", color="green",
+                                    tooltip=unit, playback=self.sim_playback)
+        
+        # Mark the junctions along the way and the destination
+        markers = [{"location": coords, "popup": f"<b>{self.engine.node_label(node)}</b>",
+                    "tooltip": self.engine.node_label(node), "icon": "map-pin", "color": "orange"}
+                   for node, coords in zip(route[1:-1], route_coords[1:-1])]
+        markers.append({"location": route_coords[-1], "popup": f"<b>{dest_name}</b> (DESTINATION)",
+                        "tooltip": dest_name, "icon": "plus", "color": "red"})
+        
+        # One overlay write for the whole simulation
+        with self.map_lock:
+            task.check()
+            self.base_map_file = self.map_view.base(self.engine.graph, self.locations)
+            self.map_view.show(lines=[{"coords": route_coords, "color": "#FF5722", "weight": 5,
+                                       "opacity": 0.8}],
+                               markers=markers, track=track)
+            if self.opened_map_file != self.base_map_file:
+                self._open_map()
+        metrics.record("gui.simulation", time.perf_counter() - started, samples=len(times))
+        return unit, route, seconds
+    
+    def _schedule_simulation(self, simulation):
+        """Status updates when the ambulance reaches each junction, in playback time (main thread)"""
+        unit, route, seconds = simulation
+        self._task_done(f"{unit} trajectory sent to the map")
+        arrivals = [0.0] + list(itertools.accumulate(seconds.tolist()))
+        for i, (node, arrival) in enumerate(zip(route, arrivals)):
+            progress = int((i + 1) / len(route) * 100)
+            status_msg = f"🚑 {unit} en route: {progress}% complete - {self.engine.node_label(node)}"
+            self.root.after(int(arrival / self.sim_playback * 1000),
+                            partial(self.ambulance_status.set, status_msg))
+        self.root.after(int(arrivals[-1] / self.sim_playback * 1000) + 1,
+                        partial(self._simulation_finished, unit))
+    
+    def _simulation_failed(self, unit, error):
+        messagebox.showerror("Error", f"Simulation error: {str(error)}")
+        self._simulation_finished(unit, arrived=False)
+    
+    def _simulation_finished(self, unit, arrived=True):
+        """Report the arrival, free the unit and re-enable the buttons"""
+        if arrived:
+            self.ambulance_status.set(f"🎯 {unit} arrived at destination!")
+        self.busy_units.discard(unit)
+        self.route_btn.config(state=tk.NORMAL)
+        self.sim_btn.config(state=tk.NORMAL)
     
     def view_map(self):
-        """Open the current map in web browser"""
-        # Ensure the map file exists
-        if not os.path.exists(self.map_file):
-            self._create_base_map()
-        
-        # Open in browser
-        webbrowser.open('file://' + os.path.realpath(self.map_file))
+        """Open the current map in web browser, rendering it on a worker if needed"""
+        self.tasks.submit("map", lambda task: self._open_map(),
+                          on_done=lambda _: self._task_done("Map opened in browser"),
+                          on_error=lambda e: messagebox.showerror("Error", f"Error opening map: {str(e)}"))
+    
+    def _open_map(self):
+        """Render the base map if needed and open it in the browser (worker thread)"""
+        with self.map_lock:
+            # Ensure the base map for this graph version exists
+            self.base_map_file = self.map_view.base(self.engine.graph, self.locations)
+            
+            # Open in browser
+            with metrics.stage("gui.browser"):
+                webbrowser.open('file://' + os.path.realpath(self.base_map_file))
+            self.opened_map_file = self.base_map_file
+    
+    def close(self):
+        """Cancel outstanding work and close the window"""
+        self.tasks.shutdown()
+        self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shegaon Ambulance Route Finder")
+    parser.add_argument("road_file", nargs="?",
+                        help="optional local .osm, .osm.pbf or .graphml road network to load")
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = AmbulanceRouteFinder(root)
+    app = AmbulanceRouteFinder(root, road_file=args.road_file)
     root.mainloop()
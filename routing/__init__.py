@@ -0,0 +1,94 @@
+"""Routing engine for the Shegaon Ambulance Route Finder"""
+
+from .alternatives import alternative_routes
+from .builders import knn_graph
+from .cache import RouteCache, RouteResult, ShortestPathTree, route_result
+from .contraction import ContractionHierarchy
+from .coverage import Coverage, CoveragePlanner, coverage, isochrones
+from .dynamic import UpdateReport, affected_routes, repair_tree
+from .engine import RoutingEngine
+from .fleet import FleetReport, FleetSimulator, fleet_summary
+from .gps import Fix, GpsTracker, MapMatcher
+from .graph import (
+    RoadGraph,
+    haversine_distance,
+    haversine_many_to_many,
+    haversine_one_to_many,
+    haversine_pairwise,
+)
+from .matrix import (
+    many_to_one,
+    multi_source_dijkstra,
+    nearest_source,
+    one_to_many,
+    travel_time_matrix,
+)
+from .metrics import Metrics
+from .osm import load_road_file
+from .registry import EdgeSnap, LocationRegistry
+from .search import (
+    SEARCH_MODES,
+    SearchResult,
+    astar,
+    bidirectional_astar,
+    bidirectional_dijkstra,
+    dijkstra,
+    shortest_path,
+)
+from .snapshot import StaleSnapshotError, load_snapshot, save_snapshot
+from .spatial import GridIndex
+from .tasks import TaskRunner
+from .timedep import ArrivalResult, SpeedProfiles, earliest_arrival
+
+__all__ = [
+    "ArrivalResult",
+    "ContractionHierarchy",
+    "Coverage",
+    "CoveragePlanner",
+    "EdgeSnap",
+    "FleetReport",
+    "FleetSimulator",
+    "Fix",
+    "GpsTracker",
+    "GridIndex",
+    "LocationRegistry",
+    "MapMatcher",
+    "Metrics",
+    "RoadGraph",
+    "RouteCache",
+    "RouteResult",
+    "RoutingEngine",
+    "SEARCH_MODES",
+    "SearchResult",
+    "ShortestPathTree",
+    "SpeedProfiles",
+    "StaleSnapshotError",
+    "TaskRunner",
+    "UpdateReport",
+    "affected_routes",
+    "alternative_routes",
+    "astar",
+    "bidirectional_astar",
+    "bidirectional_dijkstra",
+    "coverage",
+    "dijkstra",
+    "earliest_arrival",
+    "fleet_summary",
+    "haversine_distance",
+    "haversine_many_to_many",
+    "haversine_one_to_many",
+    "haversine_pairwise",
+    "isochrones",
+    "knn_graph",
+    "load_road_file",
+    "load_snapshot",
+    "many_to_one",
+    "multi_source_dijkstra",
+    "nearest_source",
+    "one_to_many",
+    "repair_tree",
+    "route_result",
+    "save_snapshot",
+    "shortest_path",
+    "travel_time_matrix",
+]
@@ -0,0 +1,110 @@
+"""
+Alternative routes by the plateau method.
+
+Given a forward shortest-path tree from the source and a reverse tree into
+the target, any node ``v`` defines a via route: the tree path to ``v``
+followed by the tree path from ``v``. Where both trees use the same edges
+they form a *plateau*; a via route through a long plateau is locally a
+shortest path, so it is a route a driver would accept rather than a detour
+around a single block. Candidates are ranked by cost minus plateau length
+(choice routing) and kept if they are within ``stretch`` of the shortest
+route and share at most ``overlap`` of their cost with the routes already
+chosen.
+
+Both trees come from the route cache, so alternatives for a pair cost two
+searches however large ``k`` is, and nothing when a hospital or an
+incident has been searched from before.
+"""
+import numpy as np
+
+from .search import INF, SearchResult, _unwind
+
+
+def plateaus(forward, backward):
+    """
+    Return ``[(start, end)]`` of every plateau: maximal chains of edges that
+    both the ``forward`` tree (from the source) and the ``backward`` tree
+    (into the target, ``previous`` holding each node's next hop) use.
+    """
+    previous = forward.previous
+    following = backward.previous
+    prev_f = np.asarray(previous, dtype=np.int64)
+    next_b = np.asarray(following, dtype=np.int64)
+
+    # Edge u -> v is on a plateau when v's forward parent is u and u's next hop is v
+    heads = np.nonzero(prev_f >= 0)[0]
+    tails = prev_f[heads]
+    shared = next_b[tails] == heads
+    heads, tails = heads[shared], tails[shared]
+    entered = np.zeros(len(prev_f), dtype=bool)
+    entered[heads] = True
+    starts = np.unique(tails[~entered[tails]])
+
+    result = []
+    for start in starts.tolist():
+        end = start
+        while True:
+            step = following[end]
+            if step < 0 or previous[step] != end:
+                break
+            end = step
+        result.append((start, end))
+    return result
+
+
+def alternative_routes(forward, backward, k=3, stretch=0.25, overlap=0.7, min_plateau=0.1):
+    """
+    Up to ``k`` sufficiently different routes between the source of the
+    ``forward`` tree and the source (the target) of the ``backward`` tree,
+    as a list of :class:`SearchResult`, shortest first.
+
+    The shortest route, the ``forward`` tree path, always comes first. Another
+    route is kept if its cost is within ``1 + stretch`` of the shortest,
+    its plateau covers at least ``min_plateau`` of its cost, it visits no
+    node twice and at most ``overlap`` of its cost runs over roads of the
+    routes already kept.
+    """
+    source, target = forward.source, backward.source
+    best = forward.distances[target]
+    if best == INF:
+        return []
+    if source == target:
+        return [SearchResult([source], 0.0, 0)]
+    dist_f, dist_b = forward.distances, backward.distances
+    limit = best * (1 + stretch) + 1e-9
+
+    candidates = []
+    for start, end in plateaus(forward, backward):
+        cost = dist_f[start] + dist_b[start]
+        length = dist_f[end] - dist_f[start]
+        if cost <= limit and length >= min_plateau * cost:
+            candidates.append((cost - length, cost, start))
+    candidates.sort()
+
+    # With equal-cost ties the two trees can split the shortest route over
+    # several short plateaus, so it is not left to compete with the candidates
+    shortest = _unwind(forward.previous, source, target)
+    routes = [SearchResult(shortest, best, 0)]
+    chosen = set(zip(shortest, shortest[1:]))
+    for _, cost, via in candidates:
+        path = _unwind(forward.previous, source, via)
+        node = via
+        while node != target:
+            node = backward.previous[node]
+            path.append(node)
+        if len(set(path)) != len(path):
+            continue
+
+        # Edge costs from the trees: forward distances up to the via node, reverse after it
+        cumulative = [dist_f[node] for node in path[:path.index(via) + 1]]
+        cumulative += [dist_f[via] + dist_b[via] - dist_b[node] for node in path[len(cumulative):]]
+        edges = list(zip(path, path[1:]))
+        shared = sum(cumulative[i + 1] - cumulative[i] for i, edge in enumerate(edges) if edge in chosen)
+        if shared > overlap * cost:
+            continue
+
+        routes.append(SearchResult(path, cost, 0))
+        chosen.update(edges)
+        if len(routes) == k:
+            break
+    return routes[:1] + sorted(routes[1:], key=lambda route: route.distance)
@@ -0,0 +1,190 @@
+"""
+Streaming batch route queries from the command line.
+
+    python -m routing.batch queries.csv -o routes.jsonl --processes 4
+    python -m routing.batch queries.jsonl --road-file district.osm.pbf --mode astar
+
+Queries come from a CSV file with ``start`` and ``end`` columns (``id``,
+``mode`` and ``departure`` are optional) or from JSON Lines objects with
+the same keys; ``-`` reads standard input. A place is a location name, a
+``"lat, lon"`` string, a ``[lat, lon]`` pair or an integer node ID. One
+JSON object is written per query, in input order. ``--mode td`` finds
+earliest arrivals under the time-of-day speed profiles for each query's
+``departure`` (``"HH:MM"``, default now).
+
+Queries are read, answered and written in chunks, so memory stays flat no
+matter how long the input is. With ``--processes`` > 1 the chunks run on a
+process pool; each worker memory-maps the same graph snapshot, so the graph
+is loaded once into the page cache rather than once per worker.
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import sys
+from collections import deque
+
+from .engine import ROUTE_MODES, RoutingEngine, engine_pool, worker_engine
+
+
+def read_queries(lines, fmt):
+    """
+    Yield query dicts from an iterable of CSV or JSONL text lines.
+
+    A JSONL line that is not a JSON object yields ``{"error": ...}`` in its
+    place, so one bad line is reported without stopping the run.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+    else:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+            except json.JSONDecodeError as e:
+                query = {"error": f"Line {number}: invalid JSON ({e.msg})"}
+            if not isinstance(query, dict):
+                query = {"error": f"Line {number}: expected a JSON object"}
+            yield query
+
+
+def _place(value):
+    """CSV fields and query parameters are strings; an all-digit place is a node ID"""
+    return int(value) if isinstance(value, str) and value.isdigit() else value
+
+
+def answer(engine, query, mode="dijkstra", include_path=False):
+    """Answer one query dict with a JSON-serialisable result dict"""
+    result = {"id": query.get("id"), "start": query.get("start"), "end": query.get("end"),
+              "mode": query.get("mode") or mode}
+    if query.get("error"):
+        # Already rejected while reading
+        result["error"] = query["error"]
+        return result
+    if result["start"] in (None, "") or result["end"] in (None, ""):
+        result["error"] = "Query needs a start and an end"
+        return result
+    if not isinstance(result["mode"], str):
+        result["error"] = "Query mode must be a string"
+        return result
+    departure = query.get("departure") or None
+    if departure is not None and (isinstance(departure, bool) or not isinstance(departure, (str, int, float))):
+        result["error"] = "Query departure must be an \"HH:MM\" string or minutes"
+        return result
+    try:
+        route = engine.route(_place(result["start"]), _place(result["end"]), result["mode"],
+                             departure=departure)
+    except (KeyError, TypeError, ValueError) as e:
+        # A place of the wrong JSON type, say, fails this one query only
+        result["error"] = str(e.args[0]) if e.args else str(e)
+        return result
+
+    if route.path is None:
+        result["error"] = "No route found"
+        return result
+    result.update(cost=route.cost, distance_km=route.distance_km, eta_minutes=route.eta_minutes,
+                  settled=route.settled)
+    if include_path:
+        result["path"] = route.path
+    return result
+
+
+def _answer_chunk(queries, mode, include_path):
+    return [answer(worker_engine(), query, mode, include_path) for query in queries]
+
+
+def _chunks(queries, size):
+    queries = iter(queries)
+    while True:
+        chunk = list(itertools.islice(queries, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(engine, queries, mode="dijkstra", processes=1, chunk_size=64, include_path=False):
+    """
+    Answer an iterable of query dicts, yielding result dicts in input order.
+
+    With ``processes`` > 1, chunks of ``chunk_size`` queries are answered on
+    a process pool. Only a few chunks per worker are in flight at a time,
+    so neither the input nor the output is ever held in memory as a whole.
+    """
+    if mode not in ROUTE_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    if mode == "ch":
+        # Preprocess once here (and in the snapshot) instead of once per worker
+        engine.contraction_hierarchy()
+
+    if not processes or processes <= 1:
+        for query in queries:
+            yield answer(engine, query, mode, include_path)
+        return
+
+    with engine_pool(engine, processes) as pool:
+        pending = deque()
+        for chunk in _chunks(queries, chunk_size):
+            pending.append(pool.submit(_answer_chunk, chunk, mode, include_path))
+            if len(pending) >= processes * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def json_safe(result):
+    """Replace non-finite numbers (unreachable costs) in a result dict with None"""
+    for key, value in result.items():
+        if isinstance(value, float) and not math.isfinite(value):
+            result[key] = None
+    return result
+
+
+def write_results(results, out):
+    """Write result dicts as JSON Lines; returns the count"""
+    count = 0
+    for result in results:
+        out.write(json.dumps(json_safe(result)))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m routing.batch", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", help="CSV or JSONL query file, or - for standard input")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: standard output)")
+    parser.add_argument("--format", choices=("csv", "jsonl"),
+                        help="input format (default: from the file extension, JSONL for stdin)")
+    parser.add_argument("--mode", default="dijkstra", choices=sorted(ROUTE_MODES),
+                        help="search mode for queries without a mode of their own")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=64, help="queries per worker task")
+    parser.add_argument("--paths", action="store_true", help="include node-ID paths in the output")
+    parser.add_argument("--road-file", help="local .osm, .osm.pbf or .graphml road network")
+    parser.add_argument("--snapshot", default="shegaon_network.snapshot",
+                        help="graph snapshot to reuse or create")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.queries.lower().endswith(".csv") else "jsonl")
+    engine = RoutingEngine(road_file=args.road_file, snapshot_file=args.snapshot).load()
+
+    source = sys.stdin if args.queries == "-" else open(args.queries, newline="", encoding="utf-8")
+    out = sys.stdout if not args.output else open(args.output, "w", encoding="utf-8")
+    try:
+        results = run_batch(engine, read_queries(source, fmt), mode=args.mode,
+                            processes=args.processes, chunk_size=args.chunk_size,
+                            include_path=args.paths)
+        count = write_results(results, out)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{count} queries answered", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
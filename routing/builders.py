@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+
+from .graph import RoadGraph, haversine_pairwise
+from .metrics import metrics
+from .spatial import GridIndex
+
+
+def knn_graph(coords, k=(3, 5), seed=0, names=None, bidirectional=False):
+    """
+    Connect every point to its nearest neighbours with straight-line roads.
+
+    ``k`` is either a fixed neighbour count or a ``(min, max)`` range from
+    which each node draws its own count using ``seed``, so the same inputs
+    always produce the same network. Edge weights are haversine km. With
+    ``bidirectional`` every road is added in both directions.
+    """
+    started = time.perf_counter()
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    k_min, k_max = (k, k) if np.isscalar(k) else k
+    k_max = min(k_max, n - 1)
+    k_min = min(k_min, k_max)
+
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(k_min, k_max + 1, n)
+    neighbours = GridIndex(coords).knn_all(k_max)
+
+    keep = np.arange(k_max)[None, :] < counts[:, None]
+    sources = np.repeat(np.arange(n), k_max).reshape(n, k_max)[keep]
+    targets = neighbours[keep]
+
+    if bidirectional:
+        # Add reverse roads, dropping duplicates of existing ones
+        pairs = np.unique(np.concatenate([np.column_stack([sources, targets]),
+                                          np.column_stack([targets, sources])]), axis=0)
+        sources, targets = pairs[:, 0], pairs[:, 1]
+
+    weights = haversine_pairwise(coords[sources], coords[targets])
+    graph = RoadGraph.from_edges(coords, sources, targets, weights, names=names)
+    metrics.record("build.knn", time.perf_counter() - started, nodes=graph.num_nodes, edges=graph.num_edges)
+    return graph
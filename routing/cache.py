@@ -0,0 +1,189 @@
+from collections import OrderedDict, namedtuple
+
+from .dynamic import _shortcut_bounds, repair_tree, route_affected, split_changes
+from .metrics import metrics
+from .search import INF, SearchResult, _unwind, dijkstra
+
+
+# A cached answer to one query: the node-ID path, its cost in graph weight
+# units, its road length in km, the estimated travel time in minutes and the
+# nodes settled by the search that produced it (0 if answered from a tree)
+RouteResult = namedtuple("RouteResult", ["path", "cost", "distance_km", "eta_minutes", "settled"])
+
+# Full single-source Dijkstra output, able to answer a query to any target
+ShortestPathTree = namedtuple("ShortestPathTree", ["source", "distances", "previous"])
+
+
+def route_result(graph, search, speed_kmh=40):
+    """
+    Turn a :class:`SearchResult` into a :class:`RouteResult`.
+
+    Time graphs already hold travel times in minutes; on distance graphs
+    the ETA assumes an average speed of ``speed_kmh``.
+    """
+    if search.path is None:
+        return RouteResult(None, INF, INF, INF, search.settled)
+    distance = graph.path_length(search.path)
+    eta = search.distance if graph.metric == "time" else distance / speed_kmh * 60
+    return RouteResult(search.path, search.distance, distance, eta, search.settled)
+
+
+class RouteCache:
+    """
+    Bounded LRU cache of route results and shortest-path trees.
+
+    Routes are keyed by ``(source, target, mode, graph.version)`` and trees
+    by ``(source, graph.version)`` (reverse trees, towards a target, by
+    ``(target, graph.version)``), so any weight change makes older entries
+    unreachable. :meth:`weights_changed` repairs trees incrementally, carries
+    over the routes a change provably cannot affect and drops the rest.
+    ``hits``, ``misses``, ``evictions``, ``invalidations`` and ``repairs``
+    count cache activity.
+    """
+
+    def __init__(self, maxsize=256, speed_kmh=40):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.speed_kmh = speed_kmh
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.repairs = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def route(self, graph, source, target, mode, search):
+        """
+        Return the :class:`RouteResult` for a query, calling ``search()`` for
+        a :class:`SearchResult` only when neither a cached route nor a cached
+        tree from ``source`` can answer it.
+        """
+        key = (source, target, mode, graph.version)
+        result = self._get(key)
+        if result is not None:
+            self.hits += 1
+            metrics.count("cache.hits")
+            return result
+
+        tree = self._get(("tree", source, graph.version))
+        if tree is not None:
+            self.hits += 1
+            metrics.count("cache.hits")
+            result = self._from_tree(graph, tree, target)
+        else:
+            self.misses += 1
+            metrics.count("cache.misses")
+            result = route_result(graph, search(), self.speed_kmh)
+        self._put(key, result)
+        return result
+
+    def tree(self, graph, source):
+        """Return the :class:`ShortestPathTree` from ``source``, searching once per graph version"""
+        key = ("tree", source, graph.version)
+        tree = self._get(key)
+        if tree is not None:
+            self.hits += 1
+            metrics.count("cache.tree_hits")
+            return tree
+
+        self.misses += 1
+        metrics.count("cache.tree_misses")
+        distances, previous, _ = dijkstra(graph, source)
+        tree = ShortestPathTree(source, distances, previous)
+        self._put(key, tree)
+        return tree
+
+    def reverse_tree(self, graph, target):
+        """
+        Return the :class:`ShortestPathTree` of the reversed graph from
+        ``target``: costs from every node to ``target``, and in ``previous``
+        each node's next hop towards it. Searched once per graph version.
+        """
+        key = ("rtree", target, graph.version)
+        tree = self._get(key)
+        if tree is not None:
+            self.hits += 1
+            metrics.count("cache.tree_hits")
+            return tree
+
+        self.misses += 1
+        metrics.count("cache.tree_misses")
+        distances, previous, _ = dijkstra(graph.reverse(), target)
+        tree = ShortestPathTree(target, distances, previous)
+        self._put(key, tree)
+        return tree
+
+    def _from_tree(self, graph, tree, target):
+        if tree.distances[target] == INF:
+            return RouteResult(None, INF, INF, INF, 0)
+        path = _unwind(tree.previous, tree.source, target)
+        return route_result(graph, SearchResult(path, tree.distances[target], 0), self.speed_kmh)
+
+    def weights_changed(self, graph, edges, previous_weights):
+        """
+        Update the cache after ``graph.set_weights(edges, ...)`` returned
+        ``previous_weights``.
+
+        Trees from the previous version are repaired in place with
+        :func:`repair_tree`. A cached route moves to the new version unless
+        it uses an edge that got more expensive or a cheaper edge could beat
+        it; every other entry from an older version is dropped. Returns the
+        number of nodes the tree repairs settled.
+        """
+        increased, decreased = split_changes(graph, edges, previous_weights)
+        bounds = _shortcut_bounds(graph, decreased) if decreased else None
+        settled = 0
+
+        kept = OrderedDict()
+        for key, value in self._entries.items():
+            version = key[-1]
+            if version == graph.version:
+                kept[key] = value
+            elif version != graph.version - 1:
+                self.invalidations += 1
+            elif key[0] == "rtree":
+                # The reverse graph holds the same edges at other positions
+                settled += repair_tree(graph.reverse(), value, graph.reverse_positions(edges),
+                                       previous_weights)
+                self.repairs += 1
+                kept[key[:-1] + (graph.version,)] = value
+            elif isinstance(value, ShortestPathTree):
+                settled += repair_tree(graph, value, edges, previous_weights)
+                self.repairs += 1
+                kept[key[:-1] + (graph.version,)] = value
+            elif (not decreased or bounds is not None) and not route_affected(
+                    graph, value, increased, decreased, bounds):
+                kept[key[:-1] + (graph.version,)] = value
+            else:
+                self.invalidations += 1
+        self._entries = kept
+        return settled
+
+    def clear(self):
+        """Drop every entry, keeping the counters"""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self):
+        """Return the counters and current size as a dict"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "invalidations": self.invalidations, "repairs": self.repairs, "size": len(self._entries),
+                "maxsize": self.maxsize}
+
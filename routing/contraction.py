@@ -0,0 +1,301 @@
+import heapq
+
+import numpy as np
+
+from .search import INF, SearchResult
+
+
+def _csr(num_nodes, edges):
+    """Pack ``[(u, v, weight, middle)]`` into CSR arrays grouped by ``u``"""
+    edges = np.asarray(edges, dtype=np.float64).reshape(-1, 4)
+    sources = edges[:, 0].astype(np.int64)
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+    return (offsets,
+            edges[order, 1].astype(np.int32),
+            edges[order, 2],
+            edges[order, 3].astype(np.int32))
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over a :class:`RoadGraph`.
+
+    Nodes are contracted one at a time in order of increasing importance;
+    whenever removing a node would break a shortest path between two of its
+    neighbours, a shortcut edge remembering the bypassed ``middle`` node is
+    added. The result is stored as two upward CSR graphs:
+
+    * ``up``: original or shortcut edges ``u -> v`` with ``rank[v] > rank[u]``
+    * ``down``: edges ``v -> u`` of the original direction with
+      ``rank[v] > rank[u]``, stored at ``u`` so the backward search also
+      only climbs in rank.
+
+    Queries run a bidirectional Dijkstra that only ever moves upward and
+    then unpack shortcuts into the original node path.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, rank, up, down, fingerprint=""):
+        self.rank = np.asarray(rank, dtype=np.int32)
+        self.up = up
+        self.down = down
+        self.fingerprint = fingerprint
+        self._lists = None
+
+    @classmethod
+    def build(cls, graph, witness_limit=500, simulation_limit=50, progress=None):
+        """
+        Contract every node of ``graph``.
+
+        ``witness_limit`` caps the nodes settled by each witness search while
+        contracting; ``simulation_limit`` does the same when estimating node
+        priorities. Stopping a witness search early only adds a superfluous
+        shortcut, never a wrong one. ``progress(done, total)`` is called
+        periodically if given.
+        """
+        n = graph.num_nodes
+        offsets, targets, weights = graph.adjacency_lists()
+
+        # Dynamic adjacency of the remaining graph: node -> {neighbour: (weight, middle)}
+        out_edges = [{} for _ in range(n)]
+        in_edges = [{} for _ in range(n)]
+        for u in range(n):
+            for i in range(offsets[u], offsets[u + 1]):
+                v, w = targets[i], weights[i]
+                if v != u and w < out_edges[u].get(v, (INF,))[0]:
+                    out_edges[u][v] = (w, -1)
+                    in_edges[v][u] = (w, -1)
+
+        def witness_distances(source, avoid, limit, max_settled):
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap:
+                d, x = heapq.heappop(heap)
+                if d > dist[x]:
+                    continue
+                if d > limit or settled >= max_settled:
+                    break
+                settled += 1
+                for y, (w, _) in out_edges[x].items():
+                    if y == avoid:
+                        continue
+                    nd = d + w
+                    if nd < dist.get(y, INF):
+                        dist[y] = nd
+                        heapq.heappush(heap, (nd, y))
+            return dist
+
+        def needed_shortcuts(u, max_settled):
+            shortcuts = []
+            outgoing = out_edges[u]
+            if not outgoing:
+                return shortcuts
+            longest = max(w for w, _ in outgoing.values())
+            for a, (w1, _) in in_edges[u].items():
+                dist = witness_distances(a, u, w1 + longest, max_settled)
+                for b, (w2, _) in outgoing.items():
+                    if b != a and dist.get(b, INF) > w1 + w2:
+                        shortcuts.append((a, b, w1 + w2))
+            return shortcuts
+
+        deleted_neighbours = [0] * n
+
+        def priority(u):
+            added = len(needed_shortcuts(u, simulation_limit))
+            removed = len(in_edges[u]) + len(out_edges[u])
+            return 2 * (added - removed) + deleted_neighbours[u]
+
+        current = [priority(u) for u in range(n)]
+        heap = [(p, u) for u, p in enumerate(current)]
+        heapq.heapify(heap)
+
+        rank = np.zeros(n, dtype=np.int32)
+        done = [False] * n
+        up_edges, down_edges = [], []
+        contracted = 0
+
+        while heap:
+            key, u = heapq.heappop(heap)
+            if done[u] or key != current[u]:
+                continue
+
+            # Lazy update: re-evaluate and requeue if no longer the minimum
+            current[u] = priority(u)
+            if heap and current[u] > heap[0][0]:
+                heapq.heappush(heap, (current[u], u))
+                continue
+
+            shortcuts = needed_shortcuts(u, witness_limit)
+            neighbours = set(out_edges[u]) | set(in_edges[u])
+
+            for v, (w, middle) in out_edges[u].items():
+                up_edges.append((u, v, w, middle))
+                del in_edges[v][u]
+            for a, (w, middle) in in_edges[u].items():
+                down_edges.append((u, a, w, middle))
+                del out_edges[a][u]
+
+            for a, b, w in shortcuts:
+                if w < out_edges[a].get(b, (INF,))[0]:
+                    out_edges[a][b] = (w, u)
+                    in_edges[b][a] = (w, u)
+
+            out_edges[u] = {}
+            in_edges[u] = {}
+            done[u] = True
+            rank[u] = contracted
+            contracted += 1
+
+            # Contracting u changes its neighbours' edge difference
+            for v in neighbours:
+                deleted_neighbours[v] += 1
+                current[v] = priority(v)
+                heapq.heappush(heap, (current[v], v))
+
+            if progress is not None and contracted % 1000 == 0:
+                progress(contracted, n)
+
+        return cls(rank, _csr(n, up_edges), _csr(n, down_edges), fingerprint=graph.fingerprint())
+
+    @property
+    def num_nodes(self):
+        return len(self.rank)
+
+    @property
+    def num_edges(self):
+        return len(self.up[1]) + len(self.down[1])
+
+    @property
+    def num_shortcuts(self):
+        return int((self.up[3] >= 0).sum() + (self.down[3] >= 0).sum())
+
+    @property
+    def nbytes(self):
+        """Memory held by the rank and both upward CSR graphs"""
+        return self.rank.nbytes + sum(a.nbytes for a in self.up + self.down)
+
+    def matches(self, graph):
+        """Return True if the hierarchy was built from this exact graph"""
+        return self.fingerprint == graph.fingerprint()
+
+    def _adjacency_lists(self):
+        if self._lists is None:
+            self._lists = (tuple(a.tolist() for a in self.up),
+                           tuple(a.tolist() for a in self.down),
+                           self.rank.tolist())
+        return self._lists
+
+    def _middle(self, x, y):
+        """Return the node bypassed by edge ``x -> y``, or -1 for an original edge"""
+        up, down, rank = self._adjacency_lists()
+        if rank[x] < rank[y]:
+            offsets, targets, _, middles = up
+            node, other = x, y
+        else:
+            offsets, targets, _, middles = down
+            node, other = y, x
+
+        for i in range(offsets[node], offsets[node + 1]):
+            if targets[i] == other:
+                return middles[i]
+        raise KeyError(f"No hierarchy edge {x} -> {y}")
+
+    def _unpack(self, path):
+        """Expand a path of hierarchy edges into original graph nodes"""
+        nodes = [path[0]]
+        for x, y in zip(path, path[1:]):
+            stack = [(x, y)]
+            while stack:
+                a, b = stack.pop()
+                middle = self._middle(a, b)
+                if middle < 0:
+                    nodes.append(b)
+                else:
+                    stack.append((middle, b))
+                    stack.append((a, middle))
+        return nodes
+
+    def shortest_path(self, source, target):
+        """Find the shortest path between two node IDs"""
+        if source == target:
+            return SearchResult([source], 0.0, 1)
+
+        graphs = self._adjacency_lists()[:2]
+        distances = ({source: 0.0}, {target: 0.0})
+        previous = ({source: -1}, {target: -1})
+        heaps = ([(0.0, source)], [(0.0, target)])
+
+        best = INF
+        meeting = -1
+        settled = 0
+        side = 0
+
+        while heaps[0] or heaps[1]:
+            if not heaps[side]:
+                side = 1 - side
+            dist, node = heapq.heappop(heaps[side])
+            own = distances[side]
+
+            if dist > own[node]:
+                continue
+            if dist >= best:
+                # Nothing left on this side can improve the best meeting point
+                heaps[side].clear()
+                side = 1 - side
+                continue
+
+            settled += 1
+            other = distances[1 - side].get(node)
+            if other is not None and dist + other < best:
+                best = dist + other
+                meeting = node
+
+            offsets, targets, weights, _ = graphs[side]
+            links = previous[side]
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[i]
+                new_distance = dist + weights[i]
+                if new_distance < own.get(neighbour, INF):
+                    own[neighbour] = new_distance
+                    links[neighbour] = node
+                    heapq.heappush(heaps[side], (new_distance, neighbour))
+
+            side = 1 - side
+
+        if meeting < 0:
+            return SearchResult(None, INF, settled)
+
+        path = [meeting]
+        while path[-1] != source:
+            path.append(previous[0][path[-1]])
+        path.reverse()
+        while path[-1] != target:
+            path.append(previous[1][path[-1]])
+
+        return SearchResult(self._unpack(path), best, settled)
+
+    def save(self, path):
+        """Write the hierarchy to an ``.npz`` file"""
+        arrays = {"format_version": np.array(self.FORMAT_VERSION),
+                  "fingerprint": np.array(self.fingerprint),
+                  "rank": self.rank}
+        for prefix, csr in (("up", self.up), ("down", self.down)):
+            for name, array in zip(("offsets", "targets", "weights", "middles"), csr):
+                arrays[f"{prefix}_{name}"] = array
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read a hierarchy written by :meth:`save`"""
+        with np.load(path) as data:
+            version = int(data["format_version"])
+            if version != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported hierarchy format version: {version}")
+            csr = {prefix: tuple(data[f"{prefix}_{name}"]
+                                 for name in ("offsets", "targets", "weights", "middles"))
+                   for prefix in ("up", "down")}
+            return cls(data["rank"], csr["up"], csr["down"], fingerprint=str(data["fingerprint"]))
@@ -0,0 +1,271 @@
+"""
+Coverage of the road network from a set of facilities (hospitals, stations,
+standby points).
+
+:func:`coverage` runs one multi-source search from every facility at once
+and returns, for each node, the travel time from the closest facility and
+which facility that is. :func:`isochrones` turns those times into polygons
+for given minute thresholds by rasterising the reachable roads, including
+the reachable part of roads that run past the threshold.
+
+:class:`CoveragePlanner` answers "what if we added a standby point here":
+candidates are scored by how many uncovered nodes they would bring within
+the threshold. Each candidate is searched once, bounded by the threshold,
+and the result is reused across rounds and calls; picking a candidate just
+takes the element-wise minimum with the current times.
+"""
+import heapq
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from .graph import EARTH_RADIUS_KM
+from .matrix import multi_source_dijkstra
+from .search import INF
+
+
+# Per-node travel time in minutes from the nearest facility (inf where none
+# reaches) and that facility's index in ``facilities`` (-1 where none does)
+Coverage = namedtuple("Coverage", ["facilities", "minutes", "nearest"])
+
+# One greedy pick: the candidate, the weight it newly covers and the
+# covered share after adding it
+CoveragePick = namedtuple("CoveragePick", ["candidate", "gain", "share"])
+
+
+def coverage(graph, facilities, minutes_per_unit=1.0):
+    """
+    Travel time from the nearest of ``facilities`` (node IDs) to every node,
+    in one search. Edge weights times ``minutes_per_unit`` are minutes; pass
+    ``60 / speed`` for distance graphs. Returns a :class:`Coverage`.
+    """
+    facilities = [int(node) for node in facilities]
+    if not facilities:
+        return Coverage(facilities, np.full(graph.num_nodes, INF), np.full(graph.num_nodes, -1))
+    distances, nearest = multi_source_dijkstra(graph, facilities)
+    return Coverage(facilities, distances * minutes_per_unit, nearest)
+
+
+def covered_share(minutes, threshold, weights=None):
+    """Share of nodes (or of node ``weights``, e.g. call counts) within ``threshold`` minutes"""
+    covered = np.asarray(minutes) <= threshold
+    if weights is None:
+        return float(covered.mean()) if len(covered) else 0.0
+    weights = np.asarray(weights, dtype=np.float64)
+    total = weights.sum()
+    return float(weights[covered].sum() / total) if total > 0 else 0.0
+
+
+def reach_within(graph, source, limit):
+    """
+    Dijkstra from ``source`` that stops past cost ``limit``. Returns
+    ``(nodes, costs)`` arrays of every node within the limit.
+    """
+    offsets, targets, weights = graph.adjacency_lists()
+    distances = {source: 0.0}
+    done = set()
+    heap = [(0.0, source)]
+
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        if dist > limit:
+            break
+        done.add(node)
+
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = targets[i]
+            new_distance = dist + weights[i]
+            if new_distance <= limit and new_distance < distances.get(neighbour, INF):
+                distances[neighbour] = new_distance
+                heapq.heappush(heap, (new_distance, neighbour))
+
+    nodes = np.fromiter(done, dtype=np.int64, count=len(done))
+    return nodes, np.array([distances[node] for node in nodes.tolist()], dtype=np.float64)
+
+
+class CoveragePlanner:
+    """
+    Greedy what-if placement of new facilities on top of existing ones.
+
+    ``coverage`` starts as the :func:`coverage` of ``facilities`` and is
+    updated as candidates are added. Node ``weights`` (call counts,
+    population) default to one per node. Candidate searches are kept per
+    graph version, so scoring again after a pick, or with a lower
+    threshold, runs no new searches.
+    """
+
+    def __init__(self, graph, facilities, minutes_per_unit=1.0, weights=None):
+        self.graph = graph
+        self.minutes_per_unit = minutes_per_unit
+        self.weights = (np.ones(graph.num_nodes) if weights is None
+                        else np.asarray(weights, dtype=np.float64))
+        self.coverage = coverage(graph, facilities, minutes_per_unit)
+        self.version = graph.version
+        self.searches = 1
+        self._reach = {}
+
+    def reach(self, candidate, threshold):
+        """Return ``(nodes, minutes)`` reachable from ``candidate`` within ``threshold`` minutes"""
+        if self.graph.version != self.version:
+            raise ValueError("The graph changed since the planner was built")
+        candidate = int(candidate)
+        cached = self._reach.get(candidate)
+        if cached is None or cached[0] < threshold:
+            nodes, costs = reach_within(self.graph, candidate, threshold / self.minutes_per_unit)
+            cached = (threshold, nodes, costs * self.minutes_per_unit)
+            self._reach[candidate] = cached
+            self.searches += 1
+        _, nodes, minutes = cached
+        keep = minutes <= threshold
+        return nodes[keep], minutes[keep]
+
+    def gain(self, candidate, threshold):
+        """Weight of currently uncovered nodes that ``candidate`` would cover"""
+        nodes, _ = self.reach(candidate, threshold)
+        uncovered = self.coverage.minutes[nodes] > threshold
+        return float(self.weights[nodes[uncovered]].sum())
+
+    def add(self, candidate):
+        """
+        Add ``candidate`` as a facility, updating :attr:`coverage` from its
+        cached search. Times are only lowered within the largest threshold
+        the candidate was scored at.
+        """
+        candidate = int(candidate)
+        if candidate not in self._reach:
+            raise KeyError(f"Candidate {candidate} has not been scored yet") from None
+        _, nodes, minutes = self._reach[candidate]
+        facilities = self.coverage.facilities + [candidate]
+        times, nearest = self.coverage.minutes.copy(), self.coverage.nearest.copy()
+        closer = minutes < times[nodes]
+        times[nodes[closer]] = minutes[closer]
+        nearest[nodes[closer]] = len(facilities) - 1
+        self.coverage = Coverage(facilities, times, nearest)
+
+    def share(self, threshold):
+        return covered_share(self.coverage.minutes, threshold, self.weights)
+
+    def greedy(self, candidates, count, threshold):
+        """
+        Add up to ``count`` of ``candidates`` (node IDs), each time the one
+        with the largest coverage gain. Gains only shrink as facilities are
+        added, so stale scores are re-checked lazily instead of re-scoring
+        every candidate per round. Returns a list of :class:`CoveragePick`.
+        """
+        heap = [(-self.gain(c, threshold), i, int(c)) for i, c in enumerate(candidates)]
+        heapq.heapify(heap)
+        picks = []
+        while heap and len(picks) < count:
+            _, i, candidate = heapq.heappop(heap)
+            gain = self.gain(candidate, threshold)
+            if heap and gain < -heap[0][0]:
+                heapq.heappush(heap, (-gain, i, candidate))
+                continue
+            if gain <= 0:
+                break
+            self.add(candidate)
+            picks.append(CoveragePick(candidate, gain, self.share(threshold)))
+        return picks
+
+
+def _outline(mask):
+    """
+    Boundary rings of the True cells of a 2-D mask, as lists of (row, col)
+    corner points. Outer rings run counter-clockwise and holes clockwise.
+    """
+    padded = np.pad(mask, 1)
+    cells = padded[1:-1, 1:-1]
+    rows, cols = np.nonzero(cells)
+    moves = []
+    # Each side of a covered cell facing an uncovered one, with the cell on its left
+    for dr, dc, start, end in (
+            (-1, 0, (0, 0), (0, 1)), (0, 1, (0, 1), (1, 1)),
+            (1, 0, (1, 1), (1, 0)), (0, -1, (1, 0), (0, 0))):
+        open_side = ~padded[rows + 1 + dr, cols + 1 + dc]
+        r, c = rows[open_side], cols[open_side]
+        moves.append(np.column_stack([r + start[0], c + start[1], r + end[0], c + end[1]]))
+    moves = np.vstack(moves).tolist()
+
+    following = {}
+    for r0, c0, r1, c1 in moves:
+        following.setdefault((r0, c0), []).append((r1, c1))
+
+    rings = []
+    while following:
+        start = next(iter(following))
+        ring = [start]
+        point = start
+        while True:
+            ends = following[point]
+            end = ends.pop()
+            if not ends:
+                del following[point]
+            if end == start:
+                break
+            ring.append(end)
+            point = end
+        # Keep only the corners
+        corners = [p for i, p in enumerate(ring)
+                   if (ring[i - 1][0] == p[0]) != (p[0] == ring[(i + 1) % len(ring)][0])]
+        rings.append(corners + corners[:1])
+    return rings
+
+
+def isochrones(graph, minutes, thresholds, minutes_per_unit=1.0, cell_m=100.0, buffer_cells=1):
+    """
+    Polygons of the area within each of ``thresholds`` minutes, given the
+    per-node ``minutes`` of a :class:`Coverage`.
+
+    Reachable roads (and the reachable stretch of roads that run past the
+    threshold) are rasterised onto ``cell_m`` cells, grown by
+    ``buffer_cells`` and outlined. Returns ``[(threshold, rings)]`` where
+    each ring is a closed list of (lat, lon) points; draw them with the
+    even-odd fill rule so holes stay open.
+    """
+    coords = graph.coords
+    minutes = np.asarray(minutes, dtype=np.float64)
+    sources, targets, weights = graph.edges()
+    lengths = graph.lengths
+    south, west = coords.min(axis=0)
+    north, east = coords.max(axis=0)
+    dlat = cell_m / 1000 / (EARTH_RADIUS_KM * math.pi / 180)
+    dlon = dlat / max(math.cos(math.radians((south + north) / 2)), 1e-6)
+    south, west = south - (buffer_cells + 1) * dlat, west - (buffer_cells + 1) * dlon
+    shape = (int((north - south) / dlat) + buffer_cells + 3, int((east - west) / dlon) + buffer_cells + 3)
+
+    result = []
+    for threshold in thresholds:
+        # How far along each edge from a reached tail the threshold allows
+        start = minutes[sources]
+        edge_minutes = weights * minutes_per_unit
+        reached = start <= threshold
+        fraction = np.ones(len(sources))
+        partial = reached & (edge_minutes > 0)
+        fraction[partial] = np.minimum((threshold - start[partial]) / edge_minutes[partial], 1.0)
+
+        # Sample every reached stretch at half a cell or finer
+        edges = np.nonzero(reached)[0]
+        samples = np.ceil(lengths[edges] * fraction[edges] * 1000 / (cell_m / 2)).astype(np.int64) + 1
+        edge = np.repeat(edges, samples)
+        offsets = np.arange(len(edge)) - np.repeat(np.cumsum(samples) - samples, samples)
+        t = offsets / np.repeat(np.maximum(samples - 1, 1), samples) * fraction[edge]
+        points = coords[sources[edge]] + t[:, None] * (coords[targets[edge]] - coords[sources[edge]])
+        points = np.vstack([points, coords[minutes <= threshold]])
+
+        mask = np.zeros(shape, dtype=bool)
+        mask[((points[:, 0] - south) / dlat).astype(np.int64),
+             ((points[:, 1] - west) / dlon).astype(np.int64)] = True
+        for _ in range(buffer_cells):
+            grown = mask.copy()
+            grown[1:] |= mask[:-1]
+            grown[:-1] |= mask[1:]
+            grown[:, 1:] |= mask[:, :-1]
+            grown[:, :-1] |= mask[:, 1:]
+            mask = grown
+
+        rings = [[(south + r * dlat, west + c * dlon) for r, c in ring] for ring in _outline(mask)]
+        result.append((threshold, rings))
+    return result
@@ -0,0 +1,175 @@
+"""
+Live edge-weight updates: road closures and congestion reports applied in
+batches without recomputing everything from scratch.
+
+:func:`repair_tree` brings a cached shortest-path tree up to date after
+:meth:`RoadGraph.set_weights`, re-settling only the nodes whose distance can
+have changed. :func:`affected_routes` says which active routes a batch of
+changes may have made suboptimal, so they can be re-routed.
+"""
+import heapq
+from collections import namedtuple
+
+import numpy as np
+
+from .graph import haversine_one_to_many, haversine_pairwise
+from .search import INF
+
+
+# Outcome of one batch of edge updates: the new graph version, the number of
+# edges changed, the cached trees repaired, the nodes those repairs settled
+# and the IDs of the active routes flagged for re-routing
+UpdateReport = namedtuple("UpdateReport", ["version", "edges", "trees_repaired", "settled", "rerouted"])
+
+
+def split_changes(graph, edges, previous_weights):
+    """
+    Sort changed CSR edges by direction. Returns ``(increased, decreased)``:
+    the set of ``(u, v)`` pairs that got more expensive and a list of
+    ``(u, v, weight)`` for the ones that got cheaper.
+    """
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1)
+    sources = (np.searchsorted(graph.offsets, edges, side="right") - 1).tolist()
+    targets = graph.targets[edges].tolist()
+    new_weights = graph.weights[edges].tolist()
+
+    increased, decreased = set(), []
+    for u, v, old, new in zip(sources, targets, np.asarray(previous_weights).tolist(), new_weights):
+        if new > old:
+            increased.add((u, v))
+        elif new < old:
+            decreased.append((u, v, new))
+    return increased, decreased
+
+
+def _subtree(graph, previous, roots):
+    """Every node whose tree path from the source runs through one of ``roots``"""
+    offsets, targets, _ = graph.adjacency_lists()
+    seen = set(roots)
+    stack = list(seen)
+    while stack:
+        node = stack.pop()
+        # A node's children are the out-neighbours that name it as predecessor
+        for i in range(offsets[node], offsets[node + 1]):
+            child = targets[i]
+            if previous[child] == node and child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return seen
+
+
+def repair_tree(graph, tree, edges, previous_weights):
+    """
+    Update a :class:`ShortestPathTree` that was optimal before
+    ``graph.set_weights(edges, ...)`` returned ``previous_weights``.
+
+    Follows the Ramalingam-Reps scheme for dynamic shortest paths. Nodes
+    hanging below a tree edge that got more expensive lose their distance
+    and are re-seeded from their unaffected in-neighbours; heads of edges
+    that got cheaper are re-seeded if the edge now offers a shorter path.
+    A Dijkstra pass over the seeded nodes then settles only what changed.
+
+    ``tree.distances`` and ``tree.previous`` are updated in place. Returns
+    the number of nodes settled.
+    """
+    increased, decreased = split_changes(graph, edges, previous_weights)
+    distances, previous = tree.distances, tree.previous
+    offsets, targets, weights = graph.adjacency_lists()
+    heap = []
+
+    roots = [v for u, v in increased if previous[v] == u]
+    if roots:
+        affected = _subtree(graph, previous, roots)
+        for node in affected:
+            distances[node] = INF
+            previous[node] = -1
+
+        # Seed each affected node from its cheapest unaffected in-neighbour
+        in_offsets, in_sources, in_weights = graph.reverse().adjacency_lists()
+        for node in affected:
+            best, parent = INF, -1
+            for i in range(in_offsets[node], in_offsets[node + 1]):
+                neighbour = in_sources[i]
+                if neighbour not in affected:
+                    candidate = distances[neighbour] + in_weights[i]
+                    if candidate < best:
+                        best, parent = candidate, neighbour
+            if parent >= 0:
+                distances[node] = best
+                previous[node] = parent
+                heap.append((best, node))
+
+    for u, v, weight in decreased:
+        candidate = distances[u] + weight
+        if candidate < distances[v]:
+            distances[v] = candidate
+            previous[v] = u
+            heap.append((candidate, v))
+
+    heapq.heapify(heap)
+    settled = 0
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if dist > distances[node]:
+            continue
+        settled += 1
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = targets[i]
+            new_distance = dist + weights[i]
+            if new_distance < distances[neighbour]:
+                distances[neighbour] = new_distance
+                previous[neighbour] = node
+                heapq.heappush(heap, (new_distance, neighbour))
+
+    return settled
+
+
+def _shortcut_bounds(graph, decreased):
+    """
+    Return (u nodes, v nodes, weights) for the cheaper edges, or None when a
+    new weight undercuts ``graph.cost_per_km`` and straight-line bounds no
+    longer hold.
+    """
+    us = np.array([u for u, _, _ in decreased], dtype=np.int64)
+    vs = np.array([v for _, v, _ in decreased], dtype=np.int64)
+    new_weights = np.array([w for _, _, w in decreased], dtype=np.float64)
+    floor = graph.cost_per_km * haversine_pairwise(graph.coords[us], graph.coords[vs])
+    if np.any(new_weights < floor * (1 - 1e-9)):
+        return None
+    return us, vs, new_weights
+
+
+def route_affected(graph, route, increased, decreased, bounds=None):
+    """
+    Whether a :class:`RouteResult` from before the change may no longer be
+    optimal: it uses an edge that got more expensive, or a cheaper edge
+    ``u -> v`` could beat it, judged by straight-line lower bounds on the
+    legs to ``u`` and from ``v``. ``bounds`` is ``_shortcut_bounds(graph,
+    decreased)``, passed in when checking many routes.
+    """
+    if route.path is None:
+        return bool(decreased)
+    if increased and any(pair in increased for pair in zip(route.path, route.path[1:])):
+        return True
+    if not decreased:
+        return False
+
+    if bounds is None:
+        bounds = _shortcut_bounds(graph, decreased)
+    if bounds is None:
+        return True
+    us, vs, new_weights = bounds
+    to_u = haversine_one_to_many(graph.coords[route.path[0]], graph.coords[us])
+    from_v = haversine_one_to_many(graph.coords[route.path[-1]], graph.coords[vs])
+    shortest_detour = graph.cost_per_km * (to_u + from_v) + new_weights
+    return bool(np.any(shortest_detour < route.cost))
+
+
+def affected_routes(graph, routes, edges, previous_weights):
+    """Return the keys of the ``{key: RouteResult}`` routes a weight change may have made suboptimal"""
+    increased, decreased = split_changes(graph, edges, previous_weights)
+    bounds = _shortcut_bounds(graph, decreased) if decreased else None
+    if decreased and bounds is None:
+        return list(routes)
+    return [key for key, route in routes.items()
+            if route_affected(graph, route, increased, decreased, bounds)]
@@ -0,0 +1,442 @@
+"""
+Headless routing engine: everything the ambulance route finder needs to
+answer queries, with no GUI dependency.
+
+:class:`RoutingEngine` loads the road network (memory-mapped snapshot, a
+local road file or the seeded virtual network), snaps named locations onto
+it and answers route, matrix and nearest-unit queries through the route
+cache. The Tk frontend, the batch CLI and any server process all drive the
+same engine.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .alternatives import alternative_routes
+from .builders import knn_graph
+from .cache import RouteCache, RouteResult, route_result
+from .contraction import ContractionHierarchy
+from .coverage import CoveragePlanner, coverage
+from .dynamic import UpdateReport, affected_routes
+from .matrix import many_to_one, travel_time_matrix
+from .metrics import metrics
+from .osm import load_road_file
+from .registry import LocationRegistry
+from .search import INF, SEARCH_MODES, SearchResult, shortest_path
+from .snapshot import load_snapshot, read_snapshot_header, save_snapshot
+from .timedep import SpeedProfiles, as_search_result, daily_profile, earliest_arrival, parse_departure
+
+
+# Center coordinates for Shegaon
+SHEGAON_CENTER = (20.7937, 76.6994)
+
+# Important locations in Shegaon
+SHEGAON_LOCATIONS = [
+    ("Dr. Hedgewar Hospital", (20.7930, 76.6985)),
+    ("Shree Gajanan Maharaj Mandir", (20.7937, 76.6994)),
+    ("Bus Stand", (20.7940, 76.7010)),
+    ("Shegaon Railway Station", (20.7970, 76.7000)),
+    ("Main Bazaar", (20.7935, 76.7002)),
+    ("Subhash Nagar", (20.7915, 76.6980)),
+    ("Civil Hospital", (20.7945, 76.6970)),
+    ("Shivaji Nagar", (20.7925, 76.7015)),
+    ("Akot Road", (20.7960, 76.7020)),
+    ("Gandhi Chowk", (20.7933, 76.6990)),
+]
+
+# Ambulance units and the locations they are stationed at
+AMBULANCE_UNITS = [
+    ("Ambulance 1", "Dr. Hedgewar Hospital"),
+    ("Ambulance 2", "Civil Hospital"),
+    ("Ambulance 3", "Bus Stand"),
+    ("Ambulance 4", "Akot Road"),
+]
+
+# Facilities patients are taken to, for coverage analysis
+SHEGAON_HOSPITALS = ["Dr. Hedgewar Hospital", "Civil Hospital"]
+
+# Time-of-day traffic by distance from Main Bazaar, as (radius km, speed
+# factors): the bazaar lanes crawl around noon and the evening market, the
+# streets around them slow down at the school and market peaks, and the
+# outskirts only feel the morning and evening rush
+SHEGAON_TRAFFIC_CENTER = (20.7935, 76.7002)
+SHEGAON_TRAFFIC_ZONES = [
+    (0.25, daily_profile([(12.5, 1.5), (18.5, 1.0)], slowest=0.3)),
+    (0.6, daily_profile([(9.5, 1.0), (12.5, 1.5), (18.5, 1.0)], slowest=0.6)),
+    (float("inf"), daily_profile([(9.0, 1.0), (18.5, 1.0)], slowest=0.85)),
+]
+
+# Engine query modes: the graph search modes, the contraction hierarchy and
+# time-dependent earliest arrival ("td")
+ROUTE_MODES = set(SEARCH_MODES) | {"ch", "td"}
+
+
+def parse_place(text):
+    """
+    Turn user input into a place: a ``[lat, lon]`` pair or ``"lat, lon"``
+    string becomes a (lat, lon) tuple, anything else is a location name.
+    """
+    if isinstance(text, (list, tuple)):
+        lat, lon = text
+        return (float(lat), float(lon))
+    text = str(text).strip()
+    parts = text.split(",")
+    if len(parts) == 2:
+        try:
+            return (float(parts[0]), float(parts[1]))
+        except ValueError:
+            pass
+    return text
+
+
+class RoutingEngine:
+    """
+    Road network, location registry, route cache and contraction hierarchy
+    behind one query interface.
+
+    ``snapshot_file`` (optional) is where the graph and any hierarchy are
+    cached between runs. ETAs on distance graphs assume ``speed_kmh``.
+
+    Live closures and congestion go through :meth:`update_edges`; routes
+    registered with :meth:`track` are checked against every update.
+    """
+
+    def __init__(self, locations=SHEGAON_LOCATIONS, road_file=None, snapshot_file=None, seed=42,
+                 speed_kmh=40, cache_size=256):
+        self.locations = list(locations)
+        self.road_file = road_file
+        self.snapshot_file = snapshot_file
+        self.seed = seed
+        self.snapshot_source = None
+        self.read_only = False
+        self.graph = None
+        self.hierarchy = None
+        self.registry = None
+        self.route_cache = RouteCache(maxsize=cache_size, speed_kmh=speed_kmh)
+        self.active_routes = {}
+        self.speed_profiles = None
+        self._base_weights = None
+
+    @classmethod
+    def from_snapshot(cls, path, locations=SHEGAON_LOCATIONS, **kwargs):
+        """
+        Open an engine on an existing snapshot without checking its source.
+
+        The engine keeps the snapshot's source and never writes the file
+        back: several workers may share it, and a hierarchy built later
+        stays in memory.
+        """
+        engine = cls(locations, snapshot_file=path, **kwargs)
+        snapshot = load_snapshot(path)
+        engine.set_graph(snapshot.graph, snapshot.hierarchy)
+        engine.snapshot_source = snapshot.source
+        engine.read_only = True
+        return engine
+
+    @property
+    def speed_kmh(self):
+        return self.route_cache.speed_kmh
+
+    @property
+    def minutes_per_unit(self):
+        """Minutes of travel per unit of edge cost"""
+        return 1.0 if self.graph.metric == "time" else 60 / self.speed_kmh
+
+    @property
+    def live_weights(self):
+        """Whether :meth:`update_edges` has changed the graph since it was loaded"""
+        return self._base_weights is not None
+
+    def load(self, progress=None, status=None):
+        """
+        Memory-map the snapshot if it was built from the same source, or
+        else parse the road file / build the virtual network and save a new
+        snapshot. ``progress(fraction)`` and ``status(message)`` report on
+        slow rebuilds. Returns the engine.
+        """
+        with metrics.stage("build.load") as counts:
+            try:
+                if not self.snapshot_file:
+                    raise OSError("No snapshot file configured")
+                snapshot = load_snapshot(self.snapshot_file, source=self.network_source())
+                self.set_graph(snapshot.graph, snapshot.hierarchy)
+                counts["snapshot_hits"] = 1
+            except (OSError, ValueError):
+                if self.road_file:
+                    if status is not None:
+                        status(f"Parsing {os.path.basename(self.road_file)}...")
+                    graph = load_road_file(self.road_file, progress=progress)
+                else:
+                    graph = self.build_virtual_network()
+                self.set_graph(graph)
+                self.save_snapshot()
+                counts["rebuilds"] = 1
+            counts["nodes"] = self.graph.num_nodes
+        return self
+
+    def set_graph(self, graph, hierarchy=None):
+        """Route on ``graph`` from now on, re-snapping locations and clearing the cache"""
+        self.graph = graph
+        self.hierarchy = hierarchy
+        self.registry = LocationRegistry(graph, self.locations)
+        self.route_cache.clear()
+        self.active_routes.clear()
+        self.speed_profiles = None
+        self._base_weights = None
+
+    def build_virtual_network(self):
+        """Create a simplified virtual road network based on the known locations"""
+        # Connect each location to its 3-5 nearest neighbours with two-way roads
+        return knn_graph([coords for _, coords in self.locations], k=(3, 5), seed=self.seed,
+                         names=[name for name, _ in self.locations], bidirectional=True)
+
+    def network_source(self):
+        """Describe where the road network comes from, to detect stale snapshots"""
+        if self.snapshot_source is not None:
+            return self.snapshot_source
+        if self.road_file:
+            stat = os.stat(self.road_file)
+            return {"road_file": os.path.realpath(self.road_file),
+                    "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return {"dummy_seed": self.seed,
+                "locations": [[name, coords[0], coords[1]] for name, coords in self.locations]}
+
+    def save_snapshot(self):
+        """Persist the graph and any routing preprocessing for the next run"""
+        if not self.snapshot_file or self.live_weights or self.read_only:
+            # Live closures and congestion are not part of the network source
+            return
+        try:
+            save_snapshot(self.snapshot_file, self.graph, source=self.network_source(),
+                          hierarchy=self.hierarchy)
+        except OSError:
+            # A read-only working directory just means no fast start next time
+            pass
+
+    def contraction_hierarchy(self):
+        """Return the preprocessed hierarchy, building it and updating the snapshot if missing"""
+        if self.hierarchy is None:
+            self.hierarchy = ContractionHierarchy.build(self.graph)
+            self.save_snapshot()
+        return self.hierarchy
+
+    def parse_place(self, text):
+        """Return a known location name or a (lat, lon) tuple, or raise ValueError"""
+        place = parse_place(text)
+        if isinstance(place, str) and place not in self.registry:
+            raise ValueError(f"Unknown location '{place}'. Pick a location or type 'lat, lon'.")
+        return place
+
+    def resolve(self, place):
+        """Return the graph node for a node ID, location name, (lat, lon) or ``"lat, lon"`` string"""
+        if isinstance(place, (int, np.integer)):
+            if not 0 <= place < self.graph.num_nodes:
+                raise ValueError(f"Node {place} is not in the road network")
+            return int(place)
+        return self.registry.resolve(self.parse_place(place))
+
+    def node_label(self, node):
+        """Return the location name for a node, or a generic junction label"""
+        return self.registry.name_at(node, f"Junction {node}")
+
+    def place_coords(self, place):
+        """Return the (lat, lon) of a location name or coordinate tuple"""
+        return self.registry.location_coords(place) if isinstance(place, str) else place
+
+    def traffic_profiles(self):
+        """Return the time-of-day speed profiles, zoned around the town centre unless set"""
+        if self.speed_profiles is None:
+            self.speed_profiles = SpeedProfiles.by_zone(self.graph, SHEGAON_TRAFFIC_CENTER,
+                                                        SHEGAON_TRAFFIC_ZONES)
+        return self.speed_profiles
+
+    def route(self, start, end, mode="dijkstra", departure=None):
+        """
+        Find the shortest path between two places (location names or (lat, lon)
+        tuples). Repeated queries on an unchanged graph are answered from the
+        route cache.
+
+        Mode ``"td"`` finds the earliest arrival for a ``departure`` time
+        (minutes since midnight or ``"HH:MM"``, default now) under the
+        time-of-day speed profiles; its cost is the travel time in minutes.
+        Returns a RouteResult (node ID path, cost, distance, ETA, nodes settled).
+        """
+        if mode not in ROUTE_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        with metrics.stage(f"route.{mode}") as counts:
+            source, target = self.resolve(start), self.resolve(end)
+
+            if mode == "td":
+                # Answers depend on the departure time, so they bypass the cache
+                arrival = earliest_arrival(self.graph, self.traffic_profiles(), source, target,
+                                           parse_departure(departure), self.minutes_per_unit)
+                result = route_result(self.graph, as_search_result(arrival), self.speed_kmh)._replace(
+                    eta_minutes=arrival.arrival - arrival.departure)
+            else:
+                def search():
+                    if mode == "ch":
+                        return self.contraction_hierarchy().shortest_path(source, target)
+                    return shortest_path(self.graph, source, target, mode=mode)
+
+                result = self.route_cache.route(self.graph, source, target, mode, search)
+            counts["settled"] = result.settled
+        return result
+
+    def alternatives(self, start, end, k=3, stretch=0.25, overlap=0.7):
+        """
+        Up to ``k`` sufficiently different routes between two places,
+        shortest first, as RouteResults (see :func:`alternative_routes`).
+        Uses the cached forward tree of ``start`` and reverse tree of ``end``.
+        """
+        with metrics.stage("route.alternatives") as counts:
+            source, target = self.resolve(start), self.resolve(end)
+            forward = self.route_cache.tree(self.graph, source)
+            backward = self.route_cache.reverse_tree(self.graph, target)
+            routes = [route_result(self.graph, search, self.speed_kmh)
+                      for search in alternative_routes(forward, backward, k, stretch, overlap)]
+            counts["routes"] = len(routes)
+        return routes
+
+    def reroute(self, node, end):
+        """
+        Route from graph node ``node`` to ``end`` by walking the cached
+        reverse tree into ``end``. Every unit re-routed towards the same
+        destination shares that tree, so only the first one runs a search.
+        """
+        target = self.resolve(end)
+        tree = self.route_cache.reverse_tree(self.graph, target)
+        if tree.distances[node] == INF:
+            return RouteResult(None, INF, INF, INF, 0)
+        path = [node]
+        while path[-1] != target:
+            path.append(tree.previous[path[-1]])
+        return route_result(self.graph, SearchResult(path, tree.distances[node], 0), self.speed_kmh)
+
+    def track(self, route_id, route):
+        """Watch an active :class:`RouteResult`; :meth:`update_edges` reports it if a change affects it"""
+        self.active_routes[route_id] = route
+
+    def untrack(self, route_id):
+        """Stop watching a route (e.g. the unit arrived)"""
+        self.active_routes.pop(route_id, None)
+
+    def update_edges(self, updates):
+        """
+        Apply a batch of ``(u, v, factor)`` updates to the road ``u -> v``
+        between two places: its free-flow travel cost is multiplied by
+        ``factor``, so 1.0 restores it, 2.5 is heavy congestion and ``inf``
+        closes the road. Factors below 1 are rejected, as they would break
+        the straight-line bounds the searches rely on.
+
+        Cached shortest-path trees are repaired incrementally and cached
+        routes a change cannot affect stay valid. Returns an
+        :class:`UpdateReport` whose ``rerouted`` lists the tracked routes
+        that need re-routing.
+        """
+        edges, factors = [], []
+        for u, v, factor in updates:
+            factor = float(factor)
+            if not factor >= 1.0:
+                raise ValueError(f"Congestion factor must be at least 1, got {factor}")
+            edges.append(self.graph.edge_index(self.resolve(u), self.resolve(v)))
+            factors.append(factor)
+        if not edges:
+            return UpdateReport(self.graph.version, 0, 0, 0, [])
+
+        if self._base_weights is None:
+            # Free-flow weights, so factors never compound across updates
+            self._base_weights = self.graph.weights.copy()
+        edges = np.array(edges, dtype=np.int64)
+        previous = self.graph.set_weights(edges, self._base_weights[edges] * np.array(factors))
+        # Hierarchy shortcuts bake in the old weights
+        self.hierarchy = None
+
+        repairs = self.route_cache.repairs
+        settled = self.route_cache.weights_changed(self.graph, edges, previous)
+        rerouted = affected_routes(self.graph, self.active_routes, edges, previous)
+        return UpdateReport(self.graph.version, len(edges), self.route_cache.repairs - repairs,
+                            settled, rerouted)
+
+    def stops(self, route, start_label, end_label):
+        """Return the named places along a route, with the given endpoint labels"""
+        return ([start_label]
+                + [self.registry.name_at(node) for node in route[1:-1] if self.registry.name_at(node)]
+                + [end_label])
+
+    def cost_minutes(self, cost):
+        """Convert a path cost into minutes of travel"""
+        return cost if self.graph.metric == "time" else cost / self.speed_kmh * 60
+
+    def matrix(self, sources, targets, processes=None):
+        """Travel-cost matrix between two lists of places, as a NumPy array"""
+        return travel_time_matrix(self.graph, [self.resolve(p) for p in sources],
+                                  [self.resolve(p) for p in targets], processes=processes)
+
+    def coverage(self, facilities=SHEGAON_HOSPITALS):
+        """Travel minutes from the nearest of ``facilities`` (places) to every node, as a Coverage"""
+        return coverage(self.graph, [self.resolve(p) for p in facilities], self.minutes_per_unit)
+
+    def coverage_planner(self, facilities=SHEGAON_HOSPITALS, weights=None):
+        """Return a :class:`CoveragePlanner` for adding standby points to ``facilities``"""
+        return CoveragePlanner(self.graph, [self.resolve(p) for p in facilities], self.minutes_per_unit,
+                               weights)
+
+    def rank_units(self, units, destination):
+        """
+        Order ``[(unit, station)]`` by travel cost to ``destination`` with one
+        reverse search. Returns ``[(cost, (unit, station))]``, nearest first.
+        """
+        if not units:
+            return []
+        costs = many_to_one(self.graph, [self.registry.node(station) for _, station in units],
+                            self.resolve(destination))
+        return sorted(zip(costs.tolist(), units))
+
+
+_worker_engine = None
+
+
+def _init_worker(snapshot_file, graph, hierarchy, locations, speed_kmh, cache_size):
+    global _worker_engine
+    if graph is None:
+        _worker_engine = RoutingEngine.from_snapshot(snapshot_file, locations, speed_kmh=speed_kmh,
+                                                     cache_size=cache_size)
+        if _worker_engine.hierarchy is None:
+            _worker_engine.hierarchy = hierarchy
+    else:
+        _worker_engine = RoutingEngine(locations, speed_kmh=speed_kmh, cache_size=cache_size)
+        _worker_engine.set_graph(graph)
+
+
+def worker_engine():
+    """Return the engine of the current :func:`engine_pool` worker"""
+    return _worker_engine
+
+
+def engine_pool(engine, processes):
+    """
+    Return an executor whose workers each hold a copy of ``engine``; tasks
+    reach it through :func:`worker_engine`.
+
+    Worker processes memory-map the engine's snapshot when there is one, so
+    the graph is loaded once into the page cache rather than once per
+    worker; otherwise (or once live updates have changed the weights) they
+    get a pickled copy of the graph. A hierarchy the snapshot lacks is
+    pickled to them too. With ``processes`` < 1 a single thread shares
+    ``engine`` itself.
+    """
+    global _worker_engine
+    if processes < 1:
+        _worker_engine = engine
+        return ThreadPoolExecutor(max_workers=1)
+
+    shared = (engine.snapshot_file if engine.snapshot_file and os.path.exists(engine.snapshot_file)
+              and not engine.live_weights else None)
+    hierarchy = None
+    if shared and engine.hierarchy is not None and "ch_rank" not in read_snapshot_header(shared)["arrays"]:
+        # Built after a read-only engine loaded the snapshot: copy it rather than rebuild it per worker
+        hierarchy = engine.hierarchy
+    initargs = (shared, None if shared else engine.graph, hierarchy, engine.locations, engine.speed_kmh,
+                engine.route_cache.maxsize)
+    return ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=initargs)
@@ -0,0 +1,253 @@
+"""
+Discrete-event simulation of a whole ambulance fleet, for capacity planning.
+
+A day of incidents is replayed against the fleet faster than real time.
+Events sit in one binary heap ordered by simulated time: an incident call,
+a unit reaching the scene, leaving it, reaching the hospital, finishing the
+handover and getting back to its station. Each call goes to the idle unit
+with the shortest drive to it; when every unit is busy the call waits, and
+a unit that gets back to its station takes the oldest waiting call.
+
+Travel times never run a search per event. :class:`TravelTimes` builds
+every table up front from the engine: one cached shortest-path tree per
+station and per hospital (shared with the route cache), one reverse search
+per station for the drive home and one multi-source reverse search for the
+nearest hospital to every node. Unit state lives in small NumPy arrays
+indexed by unit.
+"""
+import heapq
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .matrix import multi_source_dijkstra
+from .search import dijkstra
+
+
+# Unit states
+IDLE, TO_SCENE, ON_SCENE, TO_HOSPITAL, HANDOVER, RETURNING = range(6)
+
+# Event kinds, in the order they happen to one unit
+CALL, AT_SCENE, LEFT_SCENE, AT_HOSPITAL, HANDED_OVER, AT_STATION = range(6)
+
+# Outcome of a run. Per-call arrays are indexed like the calls passed to
+# :meth:`FleetSimulator.run` and hold minutes (NaN for calls never reached);
+# ``unit`` is the unit sent (-1 if none) and ``busy_minutes`` the time each
+# unit spent away from idle
+FleetReport = namedtuple("FleetReport", [
+    "call_minutes", "response_minutes", "wait_minutes", "unit", "transported",
+    "busy_minutes", "end_minutes", "events",
+])
+
+
+class TravelTimes:
+    """
+    Travel-time tables in minutes for one fleet layout on the engine's graph.
+
+    ``from_station`` and ``to_station`` are ``(stations, nodes)`` float32
+    arrays, ``to_hospital``/``hospital`` give the nearest hospital from each
+    node and ``hospital_to_station`` is ``(hospitals, stations)``.
+    Unreachable entries are infinite.
+    """
+
+    def __init__(self, engine, stations, hospitals):
+        graph = engine.graph
+        reverse = graph.reverse()
+        self.stations = [int(node) for node in stations]
+        self.hospitals = [int(node) for node in hospitals]
+        if not self.stations or not self.hospitals:
+            raise ValueError("A fleet needs at least one station and one hospital")
+
+        self.from_station = np.empty((len(self.stations), graph.num_nodes), dtype=np.float32)
+        self.to_station = np.empty_like(self.from_station)
+        for i, station in enumerate(self.stations):
+            self.from_station[i] = engine.route_cache.tree(graph, station).distances
+            self.to_station[i] = dijkstra(reverse, station)[0]
+
+        distances, nearest = multi_source_dijkstra(reverse, self.hospitals)
+        self.to_hospital = distances.astype(np.float32)
+        self.hospital = nearest.astype(np.int32)
+        self.hospital_to_station = np.array(
+            [np.asarray(engine.route_cache.tree(graph, hospital).distances)[self.stations]
+             for hospital in self.hospitals], dtype=np.float32)
+
+        # Graph costs to minutes
+        for table in (self.from_station, self.to_station, self.to_hospital, self.hospital_to_station):
+            table[:] = engine.cost_minutes(table)
+
+    @property
+    def nbytes(self):
+        return (self.from_station.nbytes + self.to_station.nbytes + self.to_hospital.nbytes
+                + self.hospital.nbytes + self.hospital_to_station.nbytes)
+
+
+def poisson_calls(num_nodes, count, hours=24, seed=0):
+    """
+    Return ``(call_minutes, call_nodes)`` for ``count`` incidents arriving
+    at random over ``hours`` at uniformly random nodes, sorted by time.
+    """
+    rng = np.random.default_rng(seed)
+    return (np.sort(rng.uniform(0, hours * 60, count)),
+            rng.integers(0, num_nodes, count).astype(np.int64))
+
+
+class FleetSimulator:
+    """
+    Replay incidents against a fleet.
+
+    ``unit_stations`` gives each unit's home station (any place the engine
+    resolves) and ``hospitals`` the places patients can be taken. On-scene
+    and handover times are drawn from gamma distributions with the given
+    means, and a ``transport_rate`` share of patients go to hospital; the
+    rest are treated on scene. Pass ``travel`` to reuse the tables of an
+    earlier simulator with the same stations and hospitals.
+    """
+
+    def __init__(self, engine, unit_stations, hospitals, on_scene_minutes=12.0,
+                 handover_minutes=15.0, transport_rate=0.6, seed=0, travel=None):
+        station_nodes = [engine.resolve(place) for place in unit_stations]
+        stations = sorted(set(station_nodes))
+        self.travel = travel or TravelTimes(engine, stations, [engine.resolve(p) for p in hospitals])
+        self.unit_station = np.array([self.travel.stations.index(node) for node in station_nodes],
+                                     dtype=np.int32)
+        self.on_scene_minutes = on_scene_minutes
+        self.handover_minutes = handover_minutes
+        self.transport_rate = transport_rate
+        self.seed = seed
+
+    @property
+    def num_units(self):
+        return len(self.unit_station)
+
+    def run(self, call_minutes, call_nodes):
+        """Simulate the calls (minutes from the start, node IDs) and return a :class:`FleetReport`"""
+        call_minutes = np.asarray(call_minutes, dtype=np.float64)
+        call_nodes = np.asarray(call_nodes, dtype=np.int64)
+        calls = len(call_minutes)
+        travel = self.travel
+        rng = np.random.default_rng(self.seed)
+        on_scene = rng.gamma(4.0, self.on_scene_minutes / 4, calls).tolist()
+        handover = rng.gamma(4.0, self.handover_minutes / 4, calls).tolist()
+        transport = (rng.random(calls) < self.transport_rate).tolist()
+
+        # Unit state
+        units = self.num_units
+        status = np.full(units, IDLE, dtype=np.int8)
+        job = np.full(units, -1, dtype=np.int32)
+        busy_since = np.zeros(units)
+        busy = np.zeros(units)
+
+        response = np.full(calls, np.nan)
+        wait = np.full(calls, np.nan)
+        sent = np.full(calls, -1, dtype=np.int32)
+        transported = np.zeros(calls, dtype=bool)
+
+        # A unit may only take a call it can reach and drive home from
+        reach = travel.from_station[:, call_nodes]
+        reach[~np.isfinite(travel.to_station[:, call_nodes])] = np.inf
+        # One contiguous row of drive times per call
+        reach = np.ascontiguousarray(reach[self.unit_station].T)
+        reachable = np.isfinite(reach).any(axis=1)
+
+        heap = [(float(t), i, CALL, i) for i, t in enumerate(call_minutes.tolist())]
+        heapq.heapify(heap)
+        sequence = calls
+        waiting = deque()
+        events = 0
+        now = 0.0
+
+        def push(time, kind, unit):
+            nonlocal sequence
+            heapq.heappush(heap, (time, sequence, kind, unit))
+            sequence += 1
+
+        def dispatch(unit, call, drive):
+            status[unit] = TO_SCENE
+            job[unit] = call
+            busy_since[unit] = now
+            sent[call] = unit
+            wait[call] = now - call_minutes[call]
+            push(now + drive, AT_SCENE, unit)
+
+        while heap:
+            now, _, kind, index = heapq.heappop(heap)
+            events += 1
+
+            if kind == CALL:
+                if not reachable[index]:
+                    continue
+                costs = np.where(status == IDLE, reach[index], np.inf)
+                unit = int(np.argmin(costs))
+                if costs[unit] == np.inf:
+                    waiting.append(index)
+                else:
+                    dispatch(unit, index, float(costs[unit]))
+                continue
+
+            unit = index
+            call = int(job[unit])
+            if kind == AT_SCENE:
+                status[unit] = ON_SCENE
+                response[call] = now - call_minutes[call]
+                push(now + on_scene[call], LEFT_SCENE, unit)
+            elif kind == LEFT_SCENE:
+                node = call_nodes[call]
+                hospital = travel.hospital[node]
+                home = self.unit_station[unit]
+                if (transport[call] and hospital >= 0
+                        and np.isfinite(travel.hospital_to_station[hospital, home])):
+                    status[unit] = TO_HOSPITAL
+                    transported[call] = True
+                    push(now + float(travel.to_hospital[node]), AT_HOSPITAL, unit)
+                else:
+                    status[unit] = RETURNING
+                    push(now + float(travel.to_station[home, node]), AT_STATION, unit)
+            elif kind == AT_HOSPITAL:
+                status[unit] = HANDOVER
+                push(now + handover[call], HANDED_OVER, unit)
+            elif kind == HANDED_OVER:
+                status[unit] = RETURNING
+                hospital = travel.hospital[call_nodes[call]]
+                push(now + float(travel.hospital_to_station[hospital, self.unit_station[unit]]),
+                     AT_STATION, unit)
+            elif kind == AT_STATION:
+                status[unit] = IDLE
+                job[unit] = -1
+                busy[unit] += now - busy_since[unit]
+                # Take the oldest waiting call this unit can reach, keeping the rest in order
+                for position, call in enumerate(waiting):
+                    if np.isfinite(reach[call, unit]):
+                        del waiting[position]
+                        dispatch(unit, call, float(reach[call, unit]))
+                        break
+
+        return FleetReport(call_minutes, response, wait, sent, transported, busy, now, events)
+
+
+def fleet_summary(report):
+    """
+    Summary statistics of a :class:`FleetReport` as a dict: calls served
+    and unreached, response-time mean and percentiles, the share of calls
+    that waited for a unit and unit utilisation over the run.
+    """
+    served = report.response_minutes[~np.isnan(report.response_minutes)]
+    waited = report.wait_minutes[~np.isnan(report.wait_minutes)]
+    span = max(report.end_minutes, float(report.call_minutes.max()) if len(report.call_minutes) else 0.0)
+    if len(served):
+        p50, p90, p95 = np.percentile(served, [50, 90, 95]).tolist()
+        mean, worst = float(served.mean()), float(served.max())
+    else:
+        mean = p50 = p90 = p95 = worst = float("nan")
+    return {
+        "calls": len(report.call_minutes),
+        "served": len(served),
+        "unreached": len(report.call_minutes) - len(served),
+        "transported": int(report.transported.sum()),
+        "response_mean": mean,
+        "response_p50": p50,
+        "response_p90": p90,
+        "response_p95": p95,
+        "response_max": worst,
+        "waited_share": float((waited > 1e-9).mean()) if len(waited) else 0.0,
+        "utilisation": float(report.busy_minutes.mean() / span) if span > 0 else 0.0,
+    }
@@ -0,0 +1,480 @@
+"""
+Streaming GPS ingestion: map matching and re-routing on deviation.
+
+    python -m routing.gps fixes.csv --destination "Ambulance 1=Civil Hospital"
+    python -m routing.gps --listen 0.0.0.0:9000 -o matches.jsonl
+
+Fixes are ``(unit, timestamp, lat, lon)`` records, one per line, as CSV
+(``unit,timestamp,lat,lon``) or JSON objects with those keys. They come
+from a file, standard input (``-``), TCP clients (``--listen``; any number
+of trackers or gateways, one line per fix) or :func:`replay_fixes`, which
+drives simulated units along routes for testing.
+
+:class:`MapMatcher` snaps each unit's fixes onto directed roads with a
+hidden Markov model decoded incrementally by Viterbi (Newson and Krumm):
+candidates are the roads within ``radius_m`` of a fix, scored by their
+distance from it, and a transition between consecutive candidates is
+likely when the driving distance between them is close to the straight
+line between the fixes. Only the last ``window`` steps of back-pointers are
+kept per unit, so memory and time per fix are constant however long a unit
+reports. :class:`GpsTracker` follows the units assigned a route: when the
+decoded path has been off the route for ``patience`` fixes it routes the
+unit from where it is heading to the same destination along the cached
+reverse tree into that destination, so re-routes need no search.
+"""
+import argparse
+import csv
+import heapq
+import json
+import selectors
+import socket
+import sys
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .graph import haversine_distance
+from .search import INF
+from .trajectory import route_track, segment_seconds
+
+
+# One position report from a unit: seconds since the epoch and degrees
+Fix = namedtuple("Fix", ["unit", "timestamp", "lat", "lon"])
+
+# A fix matched to the directed road ``source -> target`` at ``fraction``
+# along it; ``coords`` is the matched (lat, lon) and ``error_m`` its distance
+# from the fix. All but the first two are None when no road is in range.
+Match = namedtuple("Match", ["unit", "timestamp", "source", "target", "fraction", "coords", "error_m"])
+
+# What :meth:`GpsTracker.ingest` learnt from one fix: the match, whether it
+# is on the unit's route (None for units without one) and the new
+# RouteResult if the unit was re-routed
+TrackUpdate = namedtuple("TrackUpdate", ["match", "on_route", "route"])
+
+
+def parse_fix(line):
+    """
+    Parse one CSV (``unit,timestamp,lat,lon``) or JSON line into a
+    :class:`Fix`. Returns None for blank lines and the CSV header and raises
+    ValueError for anything else that is not a fix.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        if line.startswith("{"):
+            record = json.loads(line)
+            fields = [record["unit"], record["timestamp"], record["lat"], record["lon"]]
+        else:
+            fields = next(csv.reader([line]))
+            if fields[:2] == ["unit", "timestamp"]:
+                return None
+        unit, timestamp, lat, lon = fields
+        return Fix(str(unit), float(timestamp), float(lat), float(lon))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Not a GPS fix: {line!r}") from e
+
+
+def read_fixes(lines, on_error=None):
+    """
+    Yield the :class:`Fix` on each text line. Lines that are not fixes are
+    passed to ``on_error(line, exception)`` if given and skipped.
+    """
+    for line in lines:
+        try:
+            fix = parse_fix(line)
+        except ValueError as e:
+            if on_error is not None:
+                on_error(line, e)
+            continue
+        if fix is not None:
+            yield fix
+
+
+def socket_fixes(host="127.0.0.1", port=9000, on_error=None):
+    """
+    Yield fixes sent as text lines by any number of TCP clients until the
+    generator is closed. One thread serves every connection; a client whose
+    connection fails is dropped, with its unfinished line, and the others
+    carry on.
+    """
+    selector = selectors.DefaultSelector()
+    server = socket.create_server((host, port))
+    server.setblocking(False)
+    selector.register(server, selectors.EVENT_READ)
+    pending = {}
+    try:
+        while True:
+            for key, _ in selector.select():
+                conn = key.fileobj
+                if conn is server:
+                    client, _ = server.accept()
+                    client.setblocking(False)
+                    selector.register(client, selectors.EVENT_READ)
+                    pending[client] = b""
+                    continue
+                try:
+                    data = conn.recv(65536)
+                except OSError:
+                    selector.unregister(conn)
+                    conn.close()
+                    pending.pop(conn)
+                    continue
+                if not data:
+                    selector.unregister(conn)
+                    conn.close()
+                    lines = [pending.pop(conn)]
+                else:
+                    *lines, pending[conn] = (pending[conn] + data).split(b"\n")
+                yield from read_fixes((line.decode("utf-8", "replace") for line in lines), on_error)
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+
+def replay_fixes(graph, trips, interval_s=1.0, noise_m=0.0, start=0.0, seed=0):
+    """
+    Simulated fixes for ``trips``, a dict of unit -> (node path, minutes):
+    each unit drives its path in the given time, reporting every
+    ``interval_s`` seconds from a random offset with Gaussian noise of
+    ``noise_m`` metres. Fixes of all units are yielded in timestamp order.
+    """
+    rng = np.random.default_rng(seed)
+    offsets = rng.uniform(0, interval_s, len(trips)).tolist()
+    streams = []
+    for offset, (unit, (path, minutes)) in zip(offsets, trips.items()):
+        times, positions = route_track(graph.coords[path], segment_seconds(graph, path, minutes), interval_s)
+        reports = np.append(np.arange(0.0, times[-1], interval_s), times[-1])
+        lat = np.interp(reports, times, positions[:, 0])
+        lon = np.interp(reports, times, positions[:, 1])
+        if noise_m > 0:
+            metres = rng.normal(0, noise_m, (2, len(reports)))
+            lat = lat + metres[0] / 111_320
+            lon = lon + metres[1] / (111_320 * np.cos(np.radians(lat)))
+        streams.append([Fix(unit, start + offset + t, a, b)
+                        for t, a, b in zip(reports.tolist(), lat.tolist(), lon.tolist())])
+    return heapq.merge(*streams, key=lambda fix: fix.timestamp)
+
+
+class MapMatcher:
+    """
+    Incremental HMM map matcher for many units at once.
+
+    A state is a directed road near the fix as ``(edge, source, target,
+    fraction, distance_km)``, ``edge`` being its CSR index. Emissions are
+    Gaussian in the distance from the fix (``sigma_m``); transitions decay
+    exponentially (``beta_m``) with the difference between the driving
+    distance and the straight-line distance between fixes, and are
+    impossible past twice that distance plus ``slack_m``. Driving distances
+    come from short searches over road lengths, bounded by that limit.
+    """
+
+    def __init__(self, graph, registry, sigma_m=10.0, beta_m=10.0, radius_m=50.0, slack_m=50.0,
+                 max_roads=4, window=10):
+        self.graph = graph
+        self.registry = registry
+        self.sigma_km = sigma_m / 1000
+        self.beta_km = beta_m / 1000
+        self.radius_km = radius_m / 1000
+        self.slack_km = slack_m / 1000
+        self.max_roads = max_roads
+        self.window = window
+        self.units = {}
+
+        offsets, targets, _ = graph.adjacency_lists()
+        self._offsets, self._targets = offsets, targets
+        self._lengths = graph.lengths.tolist()
+        sources, targets, _ = graph.edges()
+        keys = sources.astype(np.int64) * graph.num_nodes + targets
+        self._edge_order = np.argsort(keys, kind="stable")
+        self._edge_keys = keys[self._edge_order]
+
+    def _edge_ids(self, sources, targets):
+        """CSR indexes of the edges ``sources -> targets``, -1 where there is none"""
+        keys = sources.astype(np.int64) * self.graph.num_nodes + targets
+        positions = np.minimum(np.searchsorted(self._edge_keys, keys), len(self._edge_keys) - 1)
+        return np.where(self._edge_keys[positions] == keys, self._edge_order[positions], -1)
+
+    def candidates(self, coord):
+        """Return the directed road states within ``radius_m`` of ``coord``, nearest first"""
+        sources, targets, fractions, distances = self.registry.road_candidates(coord)
+        near = distances <= self.radius_km
+        sources, targets = sources[near][:self.max_roads], targets[near][:self.max_roads]
+        fractions, distances = fractions[near][:self.max_roads], distances[near][:self.max_roads]
+        forward = self._edge_ids(sources, targets).tolist()
+        backward = self._edge_ids(targets, sources).tolist()
+
+        states = []
+        for u, v, f, d, ahead, back in zip(sources.tolist(), targets.tolist(), fractions.tolist(),
+                                            distances.tolist(), forward, backward):
+            if ahead >= 0:
+                states.append((ahead, u, v, f, d))
+            if back >= 0:
+                states.append((back, v, u, 1 - f, d))
+        return states
+
+    def _lengths_from(self, source, goals, limit):
+        """Road km from ``source`` to each node of ``goals`` reachable within ``limit``"""
+        offsets, targets, lengths = self._offsets, self._targets, self._lengths
+        distances = {source: 0.0}
+        found = {}
+        done = set()
+        heap = [(0.0, source)]
+        while heap and len(found) < len(goals):
+            dist, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            if node in goals:
+                found[node] = dist
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[i]
+                new_distance = dist + lengths[i]
+                if new_distance <= limit and new_distance < distances.get(neighbour, INF):
+                    distances[neighbour] = new_distance
+                    heapq.heappush(heap, (new_distance, neighbour))
+        return found
+
+    def _step(self, previous, scores, states, straight):
+        """Viterbi step: best score and back-pointer of each state, or None if none is reachable"""
+        lengths = self._lengths
+        limit = 2 * straight + self.slack_km
+        goals = {state[1] for state in states}
+        reached = {}
+        new_scores, back = [], []
+        for edge, u, _, fraction, distance in states:
+            best, arg = -INF, -1
+            for i, (prev_edge, _, prev_v, prev_fraction, _) in enumerate(previous):
+                if prev_edge == edge:
+                    # Signed, so slipping back along a road costs like driving the other way
+                    driven = (fraction - prev_fraction) * lengths[edge]
+                else:
+                    ahead = (1 - prev_fraction) * lengths[prev_edge]
+                    if ahead > limit:
+                        continue
+                    if prev_v not in reached:
+                        reached[prev_v] = self._lengths_from(prev_v, goals, limit)
+                    between = reached[prev_v].get(u)
+                    if between is None:
+                        continue
+                    driven = ahead + between + fraction * lengths[edge]
+                if driven > limit:
+                    continue
+                score = scores[i] - abs(driven - straight) / self.beta_km
+                if score > best:
+                    best, arg = score, i
+            new_scores.append(best - 0.5 * (distance / self.sigma_km)**2)
+            back.append(arg)
+        top = max(new_scores)
+        if top == -INF:
+            return None
+        return [score - top for score in new_scores], back
+
+    def match(self, fix):
+        """Add ``fix`` to its unit's window and return its :class:`Match`"""
+        coord = (fix.lat, fix.lon)
+        states = self.candidates(coord)
+        if not states:
+            return Match(fix.unit, fix.timestamp, None, None, None, None, None)
+
+        unit = self.units.get(fix.unit)
+        step = None
+        if unit is not None:
+            step = self._step(unit["states"], unit["scores"], states, haversine_distance(unit["coord"], coord))
+        if step is None:
+            # First fix, or nothing reachable from the last one: start the chain again
+            emissions = [-0.5 * (state[4] / self.sigma_km)**2 for state in states]
+            top = max(emissions)
+            step = [score - top for score in emissions], [-1] * len(states)
+            unit = self.units[fix.unit] = {"history": deque(maxlen=self.window)}
+        scores, back = step
+        unit.update(coord=coord, states=states, scores=scores)
+        unit["history"].append((states, back))
+
+        best = scores.index(max(scores))
+        _, u, v, fraction, distance = states[best]
+        coords = self.graph.coords
+        matched = tuple((coords[u] * (1 - fraction) + coords[v] * fraction).tolist())
+        return Match(fix.unit, fix.timestamp, u, v, fraction, matched, distance * 1000)
+
+    def recent(self, unit, count):
+        """The decoded states of the unit's last ``count`` fixes, oldest first"""
+        window = self.units.get(unit)
+        if window is None:
+            return []
+        index = window["scores"].index(max(window["scores"]))
+        decoded = []
+        for states, back in reversed(window["history"]):
+            if len(decoded) == count or index < 0:
+                break
+            decoded.append(states[index])
+            index = back[index]
+        return decoded[::-1]
+
+    def forget(self, unit):
+        """Drop a unit's window (it went off duty or its stream restarted)"""
+        self.units.pop(unit, None)
+
+
+class GpsTracker:
+    """
+    Map matching and deviation handling for a :class:`RoutingEngine`.
+
+    Units given a route with :meth:`assign` are tracked through the
+    engine's ``active_routes``, so road closures flag them too. A matched
+    position is on the route when it is on one of the route's roads (in
+    either direction) or within ``off_route_m`` of a route junction along
+    another road, which absorbs the matcher's hesitation at junctions. A
+    unit whose decoded positions for its last ``patience`` fixes are all
+    off its route is re-routed with :meth:`RoutingEngine.reroute` from the
+    end of the road it is on. ``reroutes`` counts them.
+    """
+
+    def __init__(self, engine, patience=3, off_route_m=30.0, **matcher_options):
+        self.engine = engine
+        self.patience = patience
+        self.off_route_km = off_route_m / 1000
+        self.matcher_options = matcher_options
+        self.matcher = None
+        self.routes = {}
+        self.reroutes = 0
+
+    def _matcher(self):
+        if self.matcher is None or self.matcher.graph is not self.engine.graph:
+            self.matcher = MapMatcher(self.engine.graph, self.engine.registry, **self.matcher_options)
+        return self.matcher
+
+    def assign(self, unit, route, entry=None):
+        """
+        Follow ``unit`` along ``route`` (a RouteResult). ``entry`` is an
+        extra directed road that counts as on the route: the one the unit
+        is on when it is re-routed.
+        """
+        roads = set(zip(route.path, route.path[1:]))
+        if entry is not None:
+            roads.add(entry)
+        roads |= {(v, u) for u, v in roads}
+        self.routes[unit] = {"route": route, "roads": roads, "nodes": set(route.path), "fixes": 0}
+        self.engine.track(unit, route)
+
+    def release(self, unit):
+        """Stop following a unit's route (it arrived or was stood down)"""
+        self.routes.pop(unit, None)
+        self.engine.untrack(unit)
+
+    def _on_route(self, assigned, state):
+        edge, u, v, fraction, _ = state
+        if (u, v) in assigned["roads"]:
+            return True
+        length = self.engine.graph.lengths[edge]
+        return ((u in assigned["nodes"] and fraction * length <= self.off_route_km)
+                or (v in assigned["nodes"] and (1 - fraction) * length <= self.off_route_km))
+
+    def ingest(self, fix):
+        """Match one fix and re-route its unit if it has left its route; returns a :class:`TrackUpdate`"""
+        matcher = self._matcher()
+        match = matcher.match(fix)
+        assigned = self.routes.get(fix.unit)
+        if assigned is None or match.source is None:
+            return TrackUpdate(match, None, None)
+
+        assigned["fixes"] += 1
+        decoded = matcher.recent(fix.unit, self.patience)
+        if self._on_route(assigned, decoded[-1]):
+            return TrackUpdate(match, True, None)
+        if (assigned["fixes"] < self.patience or len(decoded) < self.patience
+                or any(self._on_route(assigned, state) for state in decoded)):
+            return TrackUpdate(match, False, None)
+
+        route = self.engine.reroute(match.target, assigned["route"].path[-1])
+        if route.path is None:
+            return TrackUpdate(match, False, None)
+        self.reroutes += 1
+        self.assign(fix.unit, route, entry=(match.source, match.target))
+        return TrackUpdate(match, False, route)
+
+    def run(self, fixes):
+        """Yield a :class:`TrackUpdate` for every fix of a stream"""
+        for fix in fixes:
+            yield self.ingest(fix)
+
+
+def update_record(update):
+    """JSON-serialisable dict for a :class:`TrackUpdate`"""
+    match = update.match
+    record = {"unit": match.unit, "timestamp": match.timestamp}
+    if match.source is not None:
+        record.update(lat=round(match.coords[0], 6), lon=round(match.coords[1], 6),
+                      road=[match.source, match.target], error_m=round(match.error_m, 1))
+    if update.on_route is not None:
+        record["on_route"] = update.on_route
+    if update.route is not None:
+        record["reroute"] = {"path": update.route.path, "distance_km": update.route.distance_km,
+                             "eta_minutes": update.route.eta_minutes}
+    return record
+
+
+def main(argv=None):
+    from .engine import RoutingEngine
+
+    parser = argparse.ArgumentParser(prog="python -m routing.gps", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixes", nargs="?", default="-", help="CSV or JSONL fix file, or - for standard input")
+    parser.add_argument("--listen", metavar="HOST:PORT", help="read fixes from TCP clients instead")
+    parser.add_argument("--destination", action="append", default=[], metavar="UNIT=PLACE",
+                        help="route UNIT from its first fix to PLACE and watch for deviations")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: standard output)")
+    parser.add_argument("--road-file", help="local .osm, .osm.pbf or .graphml road network")
+    parser.add_argument("--snapshot", default="shegaon_network.snapshot",
+                        help="graph snapshot to reuse or create")
+    args = parser.parse_args(argv)
+
+    engine = RoutingEngine(road_file=args.road_file, snapshot_file=args.snapshot).load()
+    tracker = GpsTracker(engine)
+    # Resolve every destination before the stream starts, so a typo cannot stop it halfway
+    destinations = {}
+    for item in args.destination:
+        unit, sep, place = item.partition("=")
+        if not sep or not unit or not place:
+            parser.error(f"--destination must be UNIT=PLACE, got '{item}'")
+        try:
+            destinations[unit] = engine.resolve(place)
+        except ValueError as e:
+            parser.error(f"--destination {item}: {e}")
+
+    def skipped(line, error):
+        print(error, file=sys.stderr)
+
+    if args.listen:
+        host, port = args.listen.rsplit(":", 1)
+        source = None
+        fixes = socket_fixes(host, int(port), on_error=skipped)
+    else:
+        source = sys.stdin if args.fixes == "-" else open(args.fixes, newline="", encoding="utf-8")
+        fixes = read_fixes(source, on_error=skipped)
+    out = sys.stdout if not args.output else open(args.output, "w", encoding="utf-8")
+    count = 0
+    try:
+        for fix in fixes:
+            if fix.unit in destinations:
+                route = engine.route((fix.lat, fix.lon), destinations.pop(fix.unit))
+                if route.path is not None:
+                    tracker.assign(fix.unit, route)
+            record = update_record(tracker.ingest(fix))
+            out.write(json.dumps(record))
+            out.write("\n")
+            out.flush()
+            count += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{count} fixes matched, {tracker.reroutes} re-routes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import hashlib
+import math
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_distance(coord1, coord2):
+    """Calculate the distance between two (lat, lon) coordinates in km"""
+    lat1, lon1 = math.radians(coord1[0]), math.radians(coord1[1])
+    lat2, lon2 = math.radians(coord2[0]), math.radians(coord2[1])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = math.sin(dlat / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """Broadcasting haversine over arrays of coordinates in degrees"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_one_to_many(coord, coords):
+    """Distances in km from one (lat, lon) to each row of an (N, 2) array"""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    return _haversine(coord[0], coord[1], coords[:, 0], coords[:, 1])
+
+
+def haversine_many_to_many(coords1, coords2):
+    """(N, M) matrix of distances in km between two coordinate arrays"""
+    coords1 = np.asarray(coords1, dtype=np.float64).reshape(-1, 2)
+    coords2 = np.asarray(coords2, dtype=np.float64).reshape(-1, 2)
+    return _haversine(coords1[:, 0, None], coords1[:, 1, None], coords2[None, :, 0], coords2[None, :, 1])
+
+
+def haversine_pairwise(coords1, coords2):
+    """Distances in km between matching rows of two (N, 2) arrays"""
+    coords1 = np.asarray(coords1, dtype=np.float64).reshape(-1, 2)
+    coords2 = np.asarray(coords2, dtype=np.float64).reshape(-1, 2)
+    return _haversine(coords1[:, 0], coords1[:, 1], coords2[:, 0], coords2[:, 1])
+
+
+class RoadGraph:
+    """
+    Directed road graph with integer node IDs stored in CSR form.
+
+    The outgoing edges of node ``u`` are ``targets[offsets[u]:offsets[u + 1]]``
+    with matching ``weights``. Node names are optional; synthetic graphs with
+    millions of nodes are addressed purely by ID.
+
+    ``metric`` says what the weights measure: ``"distance"`` (km) or
+    ``"time"`` (minutes). ``lengths`` always holds road lengths in km and
+    defaults to the weights for distance graphs. ``cost_per_km`` is a lower
+    bound on edge cost per km of straight-line distance, used to turn
+    haversine distances into admissible A* heuristics: 1.0 for distance
+    graphs, 60 / top speed for time graphs.
+
+    ``version`` starts at 0 and is bumped whenever the edge weights change,
+    so results computed on an older version can be recognised as stale.
+    """
+
+    def __init__(self, coords, offsets, targets, weights, names=None, cost_per_km=1.0,
+                 lengths=None, metric="distance"):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        # Any indexable sequence works (e.g. a lazily decoded snapshot table)
+        self.names = list(names) if names is not None and not hasattr(names, "__getitem__") else names
+        self.cost_per_km = cost_per_km
+        self.metric = metric
+        self.lengths = (np.asarray(lengths, dtype=np.float64) if lengths is not None
+                        else self.weights)
+
+        if metric not in ("distance", "time"):
+            raise ValueError(f"Unknown metric: {metric}")
+
+        if len(self.offsets) != len(self.coords) + 1:
+            raise ValueError("offsets must have one entry per node plus one")
+        if len(self.targets) != len(self.weights) or len(self.lengths) != len(self.weights):
+            raise ValueError("targets, weights and lengths must have the same length")
+
+        self.version = 0
+        self._lists = None
+        self._reverse = None
+        self._reverse_positions = None
+        self._radians = None
+        self._name_to_id = None
+        self._fingerprint = None
+        self._topology_fingerprint = None
+
+    def __getstate__(self):
+        # Cached list copies and views are rebuilt on demand; don't ship them to worker processes
+        state = self.__dict__.copy()
+        state.update(_lists=None, _reverse=None, _reverse_positions=None, _radians=None, _name_to_id=None)
+        return state
+
+    @classmethod
+    def from_edges(cls, coords, sources, targets, weights, names=None, cost_per_km=1.0,
+                   lengths=None, metric="distance"):
+        """Build a graph from parallel edge arrays (in any order)"""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+
+        # Group edges by source node; a stable sort keeps insertion order per node
+        order = np.argsort(sources, kind="stable")
+        counts = np.bincount(sources, minlength=len(coords))
+        offsets = np.zeros(len(coords) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        if lengths is not None:
+            lengths = np.asarray(lengths, dtype=np.float64)[order]
+
+        return cls(coords, offsets, targets[order], weights[order], names=names,
+                   cost_per_km=cost_per_km, lengths=lengths, metric=metric)
+
+    @classmethod
+    def from_road_network(cls, locations, road_network):
+        """Build a graph from ``[(name, (lat, lon))]`` and ``{name: [(name, km)]}``"""
+        names = [name for name, _ in locations]
+        coords = [coords for _, coords in locations]
+        index = {name: i for i, name in enumerate(names)}
+
+        sources, targets, weights = [], [], []
+        for name1, connections in road_network.items():
+            for name2, distance in connections:
+                sources.append(index[name1])
+                targets.append(index[name2])
+                weights.append(distance)
+
+        return cls.from_edges(coords, sources, targets, weights, names=names)
+
+    @property
+    def num_nodes(self):
+        return len(self.coords)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    @property
+    def nbytes(self):
+        """Memory held by the coordinate and CSR arrays"""
+        lengths = self._own_lengths()
+        return (self.coords.nbytes + self.offsets.nbytes + self.targets.nbytes + self.weights.nbytes
+                + (lengths.nbytes if lengths is not None else 0))
+
+    def fingerprint(self):
+        """Return a hex digest identifying the topology and edge weights (cached per version)"""
+        if self._fingerprint is None or self._fingerprint[0] != self.version:
+            digest = hashlib.sha1()
+            for array in (self.offsets, self.targets, self.weights):
+                digest.update(np.ascontiguousarray(array).data)
+            self._fingerprint = (self.version, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def topology_fingerprint(self):
+        """
+        Return a hex digest of the edges and node coordinates only (cached).
+        Weight changes leave it alone, so it keys what is drawn of the network.
+        """
+        if self._topology_fingerprint is None:
+            digest = hashlib.sha1()
+            for array in (self.offsets, self.targets, self.coords):
+                digest.update(np.ascontiguousarray(array).data)
+            self._topology_fingerprint = digest.hexdigest()
+        return self._topology_fingerprint
+
+    @property
+    def name_to_id(self):
+        """Mapping from node name to ID, built on first use"""
+        if self._name_to_id is None:
+            self._name_to_id = ({name: i for i, name in enumerate(self.names)}
+                                if self.names is not None else {})
+        return self._name_to_id
+
+    def node_id(self, name):
+        """Return the integer ID for a named node"""
+        try:
+            return self.name_to_id[name]
+        except KeyError:
+            raise KeyError(f"Unknown location: {name}") from None
+
+    def node_name(self, node):
+        """Return the display name of a node, falling back to its ID"""
+        if self.names is not None:
+            return self.names[node]
+        return str(node)
+
+    def edges(self):
+        """Return (sources, targets, weights) arrays for every edge"""
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.offsets))
+        return sources, self.targets, self.weights
+
+    def _own_lengths(self):
+        """Return lengths only when they are stored separately from weights"""
+        return None if self.lengths is self.weights else self.lengths
+
+    def edge_index(self, u, v):
+        """Return the CSR index of the cheapest edge ``u -> v``"""
+        start, end = self.offsets[u], self.offsets[u + 1]
+        matches = np.flatnonzero(self.targets[start:end] == v)
+        if len(matches) == 0:
+            raise KeyError(f"No edge {u} -> {v}")
+        return start + matches[np.argmin(self.weights[start + matches])]
+
+    def path_length(self, path):
+        """Return the road length in km along a node-ID path"""
+        return float(sum(self.lengths[self.edge_index(u, v)] for u, v in zip(path, path[1:])))
+
+    def neighbours(self, node):
+        """Return the (targets, weights) arrays of a node's outgoing edges"""
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return self.targets[start:end], self.weights[start:end]
+
+    def adjacency_lists(self):
+        """
+        Return the CSR arrays as plain Python lists.
+
+        Element access on NumPy arrays is slow inside pure-Python search loops,
+        so the searches iterate over these cached list copies instead.
+        """
+        if self._lists is None:
+            self._lists = (self.offsets.tolist(), self.targets.tolist(),
+                           self.weights.tolist())
+        return self._lists
+
+    def coord_radians(self):
+        """Return cached (lat, lon, cos(lat)) lists in radians for heuristics"""
+        if self._radians is None:
+            lat = np.radians(self.coords[:, 0])
+            lon = np.radians(self.coords[:, 1])
+            self._radians = (lat.tolist(), lon.tolist(), np.cos(lat).tolist())
+        return self._radians
+
+    def reverse(self):
+        """Return the graph with every edge reversed (cached)"""
+        if self._reverse is None:
+            sources, targets, _ = self.edges()
+            self._reverse = RoadGraph.from_edges(self.coords, targets, sources,
+                                                 self.weights, names=self.names,
+                                                 cost_per_km=self.cost_per_km,
+                                                 lengths=self._own_lengths(),
+                                                 metric=self.metric)
+            # from_edges groups the reversed edges with a stable sort on their
+            # new source, so reverse edge j is edge order[j] of this graph
+            order = np.argsort(targets, kind="stable")
+            self._reverse_positions = np.empty_like(order)
+            self._reverse_positions[order] = np.arange(len(order))
+        return self._reverse
+
+    def reverse_positions(self, edges):
+        """Return the positions in :meth:`reverse` of the edges at CSR indexes ``edges``"""
+        self.reverse()
+        return self._reverse_positions[np.asarray(edges, dtype=np.int64)]
+
+    def set_weights(self, edges, weights):
+        """
+        Change the weights of the edges at CSR indexes ``edges`` (road
+        closures, live traffic) and bump ``version``. Road lengths are left
+        as they were. Returns the previous weights of those edges.
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1)
+        if self.lengths is self.weights or not self.weights.flags.writeable:
+            # Detach from the lengths (and from read-only snapshot pages)
+            self.weights = self.weights.copy()
+        previous = self.weights[edges].copy()
+        self.weights[edges] = weights
+        new_weights = self.weights[edges]
+
+        # Patch the cached views in place; rebuilding them costs O(edges)
+        if self._lists is not None:
+            weight_list = self._lists[2]
+            for edge, weight in zip(edges.tolist(), new_weights.tolist()):
+                weight_list[edge] = weight
+        if self._reverse is not None:
+            self._reverse.set_weights(self._reverse_positions[edges], new_weights)
+        self.version += 1
+        return previous
+
+    def invalidate(self):
+        """Drop cached views and bump ``version`` after the weights were modified in place"""
+        self.version += 1
+        self._lists = None
+        self._reverse = None
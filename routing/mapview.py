@@ -0,0 +1,330 @@
+"""
+Folium map output: a base map rendered once per road network, with routes
+and markers delivered as small GeoJSON overlays.
+
+The base page (tiles, roads, location markers) is written to a cache
+directory under a key derived from the topology and node coordinates, so
+an unchanged network is never re-rendered; weight changes (closures, live
+traffic) only reach the page through the overlay. Each page polls a sibling
+``overlay.js``; writing a new overlay swaps the route layer in place
+without touching the base layer. Overlay polylines carry Douglas-Peucker
+simplifications for several zoom levels and the page draws the one that
+fits the current zoom.
+
+This module needs folium, so the ``routing`` package does not import it.
+"""
+import glob
+import hashlib
+import json
+import math
+import os
+import time
+
+import folium
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+from .graph import EARTH_RADIUS_KM
+from .metrics import metrics
+
+
+# Zoom levels that get their own simplification of overlay lines, and the
+# largest deviation allowed at each one, in screen pixels
+OVERLAY_ZOOMS = (10, 12, 14, 16, 18)
+PIXEL_TOLERANCE = 1.0
+
+# Decimal places kept in coordinates (about 0.1 m)
+COORD_DECIMALS = 6
+
+# Part of the base page cache key; bump when the page script changes
+PAGE_VERSION = 4
+
+
+class OverlayLoader(MacroElement):
+    """Page script that polls ``overlay`` and swaps the overlay layer of its map in place"""
+
+    _template = Template("""
+{% macro script(this, kwargs) %}
+    (function() {
+        var map = {{ this._parent.get_name() }}, layer = null, data = null, stamp = null, vehicle = null;
+        function draw() {
+            if (layer) { map.removeLayer(layer); }
+            layer = L.layerGroup();
+            if (data) {
+                var zoom = map.getZoom();
+                (data.areas || []).forEach(function(area) {
+                    // Even-odd fill keeps holes open whichever ring they come with
+                    var polygon = L.polygon(area.rings, {color: area.color, weight: 1, fillColor: area.color,
+                                                         fillOpacity: area.opacity, fillRule: "evenodd"});
+                    if (area.tooltip) { polygon.bindTooltip(area.tooltip, {sticky: true}); }
+                    layer.addLayer(polygon);
+                });
+                data.lines.forEach(function(line) {
+                    var coords = line.levels[0][1];
+                    line.levels.forEach(function(level) { if (level[0] <= zoom) { coords = level[1]; } });
+                    var polyline = L.polyline(coords, {color: line.color, weight: line.weight, opacity: line.opacity});
+                    if (line.tooltip) { polyline.bindTooltip(line.tooltip); }
+                    layer.addLayer(polyline);
+                });
+                data.markers.forEach(function(spec) {
+                    var marker = L.marker(spec.location, {icon: L.AwesomeMarkers.icon(
+                        {icon: spec.icon, prefix: "fa", markerColor: spec.color})});
+                    if (spec.popup) { marker.bindPopup(spec.popup); }
+                    if (spec.tooltip) { marker.bindTooltip(spec.tooltip); }
+                    layer.addLayer(marker);
+                });
+            }
+            layer.addTo(map);
+        }
+        function animate(track) {
+            if (vehicle) { cancelAnimationFrame(vehicle.frame); map.removeLayer(vehicle.marker); vehicle = null; }
+            if (!track || track.geometry.coordinates.length < 2) { return; }
+            var coords = track.geometry.coordinates, times = track.properties.times;
+            var playback = track.properties.playback || 1, i = 0;
+            vehicle = {marker: L.marker([coords[0][1], coords[0][0]], {zIndexOffset: 1000, icon: L.AwesomeMarkers.icon(
+                {icon: track.properties.icon, prefix: "fa", markerColor: track.properties.color})}).addTo(map)};
+            if (track.properties.tooltip) { vehicle.marker.bindTooltip(track.properties.tooltip); }
+            function step() {
+                // Departure was at times[0] on the wall clock, so a reloaded page picks up mid-trip
+                var t = times[0] + (Date.now() - times[0]) * playback;
+                while (i < times.length - 2 && times[i + 1] <= t) { i++; }
+                var span = times[i + 1] - times[i];
+                var f = span > 0 ? Math.min(Math.max((t - times[i]) / span, 0), 1) : 1;
+                vehicle.marker.setLatLng([coords[i][1] + f * (coords[i + 1][1] - coords[i][1]),
+                                          coords[i][0] + f * (coords[i + 1][0] - coords[i][0])]);
+                if (t < times[times.length - 1]) { vehicle.frame = requestAnimationFrame(step); }
+            }
+            vehicle.frame = requestAnimationFrame(step);
+        }
+        window.setOverlay = function(overlay) {
+            if (overlay.stamp === stamp) { return; }
+            stamp = overlay.stamp;
+            data = overlay;
+            draw();
+            animate(overlay.track);
+            if (overlay.fit && data.lines.length) {
+                var bounds = L.latLngBounds([]);
+                data.lines.forEach(function(line) { bounds.extend(line.levels[line.levels.length - 1][1]); });
+                map.fitBounds(bounds, {padding: [30, 30]});
+            }
+        };
+        map.on("zoomend", draw);
+        function poll() {
+            var script = document.createElement("script");
+            script.src = "{{ this.overlay }}?" + Date.now();
+            script.onload = script.onerror = function() { script.remove(); };
+            document.head.appendChild(script);
+        }
+        poll();
+        setInterval(poll, {{ this.interval }});
+    })();
+{% endmacro %}
+""")
+
+    def __init__(self, overlay, interval=1500):
+        super().__init__()
+        self._name = "OverlayLoader"
+        self.overlay = overlay
+        self.interval = interval
+
+
+def meters_per_pixel(zoom, latitude):
+    """Ground resolution of a web-mercator tile map at ``zoom``"""
+    return 2 * math.pi * EARTH_RADIUS_KM * 1000 * math.cos(math.radians(latitude)) / (256 * 2**zoom)
+
+
+def simplification_ranks(coords):
+    """
+    Douglas-Peucker significance of each point of a polyline, in metres.
+
+    A point's rank is the deviation at which Douglas-Peucker would split on
+    it, capped by the ranks of the points above it, so simplifying with any
+    tolerance is just ``coords[ranks >= tolerance]``. The endpoints rank
+    infinite.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    ranks = np.zeros(n)
+    if n == 0:
+        return ranks
+    ranks[0] = ranks[-1] = np.inf
+
+    # Local equirectangular projection in metres is plenty at town scale
+    scale = EARTH_RADIUS_KM * 1000 * math.pi / 180
+    y = coords[:, 0] * scale
+    x = coords[:, 1] * scale * math.cos(math.radians(coords[:, 0].mean()))
+
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length_sq = dx * dx + dy * dy
+        if length_sq > 0:
+            # Distance to the segment, clamping the projection to its ends
+            t = np.clip((px * dx + py * dy) / length_sq, 0, 1)
+            distances = np.hypot(px - t * dx, py - t * dy)
+        else:
+            distances = np.hypot(px, py)
+        split = int(np.argmax(distances))
+        rank = min(float(distances[split]), cap)
+        ranks[first + 1 + split] = rank
+        stack.append((first, first + 1 + split, rank))
+        stack.append((first + 1 + split, last, rank))
+    return ranks
+
+
+def zoom_levels(coords, zooms=OVERLAY_ZOOMS, pixels=PIXEL_TOLERANCE):
+    """
+    Return ``[(min_zoom, coords)]``: the line simplified to ``pixels`` of
+    deviation at each zoom, skipping levels that keep the same points.
+    """
+    coords = np.round(np.asarray(coords, dtype=np.float64).reshape(-1, 2), COORD_DECIMALS)
+    if len(coords) == 0:
+        return []
+    ranks = simplification_ranks(coords)
+    latitude = float(coords[:, 0].mean())
+    levels, kept = [], -1
+    for zoom in zooms:
+        keep = ranks >= meters_per_pixel(zoom, latitude) * pixels
+        if int(keep.sum()) != kept:
+            kept = int(keep.sum())
+            levels.append((zoom, coords[keep].tolist()))
+    return levels
+
+
+def _area_rings(rings, tolerance=0.0):
+    """Round (and with ``tolerance`` metres, simplify) closed rings, dropping any that collapse"""
+    result = []
+    for ring in rings:
+        ring = np.round(np.asarray(ring, dtype=np.float64).reshape(-1, 2), COORD_DECIMALS)
+        if tolerance > 0:
+            ring = ring[simplification_ranks(ring) >= tolerance]
+        if len(ring) >= 4:
+            result.append(ring.tolist())
+    return result
+
+
+def _undirected_roads(graph):
+    """Each road once, as an (N, 2, 2) array of segment endpoints"""
+    sources, targets, _ = graph.edges()
+    pairs = np.unique(np.sort(np.column_stack([sources, targets]), axis=1), axis=0)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.round(graph.coords[pairs], COORD_DECIMALS)
+
+
+class MapView:
+    """
+    Base map and overlay files for one road network.
+
+    ``directory`` holds the cached base pages and the shared ``overlay.js``.
+    ``render_seconds`` is the time the last base render took (0 when the
+    cached page was reused).
+    """
+
+    def __init__(self, directory="map_cache", centre=(20.7937, 76.6994), zoom_start=15,
+                 tiles="cartodbpositron", poll_ms=1500):
+        self.directory = directory
+        self.centre = centre
+        self.zoom_start = zoom_start
+        self.tiles = tiles
+        self.poll_ms = poll_ms
+        self.overlay_file = os.path.join(directory, "overlay.js")
+        self.render_seconds = 0.0
+
+    def base_key(self, graph, locations):
+        """Cache key for the base page of ``graph`` (topology and coordinates) and the locations"""
+        digest = hashlib.sha1(graph.topology_fingerprint().encode("ascii"))
+        digest.update(json.dumps([PAGE_VERSION, [[name, list(coords)] for name, coords in locations],
+                                  list(self.centre), self.zoom_start, self.tiles]).encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def base_path(self, graph, locations):
+        return os.path.join(self.directory, f"base-{self.base_key(graph, locations)}.html")
+
+    def base(self, graph, locations):
+        """Return the path of the base page, rendering it only if no cached copy exists"""
+        path = self.base_path(graph, locations)
+        if os.path.exists(path):
+            self.render_seconds = 0.0
+            metrics.count("map.base.cache_hits")
+            return path
+
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        m = folium.Map(location=self.centre, zoom_start=self.zoom_start, tiles=self.tiles)
+
+        # All roads as one GeoJSON layer instead of a polyline object per road
+        roads = _undirected_roads(graph)
+        folium.GeoJson(
+            {"type": "Feature", "properties": {},
+             "geometry": {"type": "MultiLineString", "coordinates": roads[:, :, ::-1].tolist()}},
+            name="Roads",
+            style_function=lambda feature: {"color": "gray", "weight": 2, "opacity": 0.7},
+        ).add_to(m)
+
+        for name, coords in locations:
+            folium.Marker(
+                location=[coords[0], coords[1]],
+                popup=f"<b>{name}</b>",
+                tooltip=name,
+                icon=folium.Icon(icon="map-marker", prefix="fa", color="blue")
+            ).add_to(m)
+
+        OverlayLoader(os.path.basename(self.overlay_file), self.poll_ms).add_to(m)
+
+        # Write under a temporary name so a half-written page is never served
+        partial = path + ".tmp"
+        m.save(partial)
+        os.replace(partial, path)
+        for stale in glob.glob(os.path.join(self.directory, "base-*.html")):
+            if stale != path:
+                os.remove(stale)
+        self.render_seconds = time.perf_counter() - started
+        metrics.record("map.base", self.render_seconds, bytes_written=os.path.getsize(path))
+        return path
+
+    def show(self, lines=(), markers=(), fit=False, track=None, areas=()):
+        """
+        Replace the overlay: ``lines`` are dicts with ``coords`` and optional
+        ``color``, ``weight``, ``opacity`` and ``tooltip``; ``markers`` are
+        dicts with ``location``, ``icon``, ``color`` and optional ``popup`` and
+        ``tooltip``. ``track`` is a :func:`timestamped_feature` stamped from
+        the wall-clock departure, which the page animates with a marker
+        (``icon``, ``color``, ``tooltip`` and ``playback`` speed-up in its
+        properties). ``areas`` are dicts with ``rings`` (closed (lat, lon)
+        rings such as :func:`routing.coverage.isochrones` returns), ``color``
+        and optional ``opacity``, ``tooltip`` and ``tolerance`` (metres of
+        Douglas-Peucker smoothing); they are drawn under the lines. Returns
+        the overlay size in bytes.
+        """
+        started = time.perf_counter()
+        overlay = {
+            "stamp": f"{time.time():.6f}",
+            "fit": fit,
+            "lines": [{"levels": zoom_levels(line["coords"]), "color": line.get("color", "#FF5722"),
+                       "weight": line.get("weight", 5), "opacity": line.get("opacity", 0.8),
+                       "tooltip": line.get("tooltip")} for line in lines],
+            "markers": [dict(marker, location=[round(float(c), COORD_DECIMALS) for c in marker["location"]])
+                        for marker in markers],
+            "track": track,
+            "areas": [{"rings": _area_rings(area["rings"], area.get("tolerance", 0.0)),
+                       "color": area.get("color", "#3388ff"), "opacity": area.get("opacity", 0.3),
+                       "tooltip": area.get("tooltip")} for area in areas],
+        }
+        text = f"window.setOverlay && window.setOverlay({json.dumps(overlay, separators=(',', ':'))});\n"
+        os.makedirs(self.directory, exist_ok=True)
+        partial = self.overlay_file + ".tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(partial, self.overlay_file)
+        size = len(text.encode("utf-8"))
+        metrics.record("map.overlay", time.perf_counter() - started, bytes_written=size)
+        return size
+
+    def clear(self):
+        """Remove every route and marker overlay"""
+        return self.show()
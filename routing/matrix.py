@@ -0,0 +1,173 @@
+"""
+Batch travel-time queries: one-to-many, many-to-one and many-to-many
+matrices, plus nearest-source lookups for dispatch.
+
+Each matrix row is a single Dijkstra search that stops once every wanted
+target is settled. When there are fewer targets than sources the searches
+run backwards from the targets over the reversed graph instead, so an
+N x M matrix always costs min(N, M) searches. Nearest-source queries use
+one multi-source search seeded with every source at once. Large matrices
+can be split across a process pool; each worker receives the graph once.
+"""
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .search import INF
+
+
+def _row(graph, source, targets):
+    """Costs from ``source`` to each node in ``targets``, searching no further than needed"""
+    offsets, heads, weights = graph.adjacency_lists()
+    n = len(offsets) - 1
+
+    wanted = {}
+    for column, node in enumerate(targets):
+        wanted.setdefault(node, []).append(column)
+    remaining = len(wanted)
+    row = np.full(len(targets), INF)
+
+    distances = [INF] * n
+    done = [False] * n
+    distances[source] = 0.0
+    heap = [(0.0, source)]
+
+    while heap and remaining:
+        dist, node = heapq.heappop(heap)
+        if done[node]:
+            continue
+        done[node] = True
+
+        columns = wanted.get(node)
+        if columns is not None:
+            row[columns] = dist
+            remaining -= 1
+
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = heads[i]
+            new_distance = dist + weights[i]
+            if new_distance < distances[neighbour]:
+                distances[neighbour] = new_distance
+                heapq.heappush(heap, (new_distance, neighbour))
+
+    return row
+
+
+def _rows(graph, sources, targets):
+    return np.array([_row(graph, source, targets) for source in sources]).reshape(len(sources), len(targets))
+
+
+_worker_graph = None
+
+
+def _init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _worker_rows(sources, targets):
+    return _rows(_worker_graph, sources, targets)
+
+
+def travel_time_matrix(graph, sources, targets, processes=None, chunk_size=16):
+    """
+    Return the ``(len(sources), len(targets))`` array of shortest-path costs
+    between node IDs, with ``inf`` where a target is unreachable.
+
+    With ``processes`` > 1 the searches are split into chunks of
+    ``chunk_size`` and run on a process pool of that size.
+    """
+    sources = [int(node) for node in sources]
+    targets = [int(node) for node in targets]
+    if not sources or not targets:
+        return np.empty((len(sources), len(targets)))
+
+    # Search from whichever side is smaller
+    transpose = len(targets) < len(sources)
+    if transpose:
+        graph = graph.reverse()
+        sources, targets = targets, sources
+
+    if processes and processes > 1 and len(sources) > chunk_size:
+        chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(graph,)) as pool:
+            matrix = np.vstack(list(pool.map(_worker_rows, chunks, [targets] * len(chunks))))
+    else:
+        matrix = _rows(graph, sources, targets)
+
+    return matrix.T.copy() if transpose else matrix
+
+
+def one_to_many(graph, source, targets):
+    """Costs from one node to each of ``targets`` as a 1-D array"""
+    return travel_time_matrix(graph, [source], targets)[0]
+
+
+def many_to_one(graph, sources, target):
+    """Costs from each of ``sources`` to one node as a 1-D array"""
+    return travel_time_matrix(graph, sources, [target])[:, 0]
+
+
+def multi_source_dijkstra(graph, sources, targets=None):
+    """
+    Run one Dijkstra search seeded with every node in ``sources``.
+
+    Returns ``(distances, nearest)`` arrays indexed by node ID: the cost from
+    the closest source and that source's index in ``sources`` (-1 where
+    unreachable). When ``targets`` is given the search stops once they are
+    all settled, and only their entries are final.
+    """
+    offsets, heads, weights = graph.adjacency_lists()
+    n = len(offsets) - 1
+
+    distances = [INF] * n
+    nearest = [-1] * n
+    done = [False] * n
+    heap = []
+    for index, source in enumerate(sources):
+        source = int(source)
+        if distances[source] > 0.0:
+            distances[source] = 0.0
+            nearest[source] = index
+            heap.append((0.0, source))
+    heapq.heapify(heap)
+
+    remaining = set(int(node) for node in targets) if targets is not None else None
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if done[node]:
+            continue
+        done[node] = True
+
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+
+        origin = nearest[node]
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = heads[i]
+            new_distance = dist + weights[i]
+            if new_distance < distances[neighbour]:
+                distances[neighbour] = new_distance
+                nearest[neighbour] = origin
+                heapq.heappush(heap, (new_distance, neighbour))
+
+    return np.array(distances), np.array(nearest, dtype=np.int64)
+
+
+def nearest_source(graph, sources, targets):
+    """
+    For each node in ``targets``, find which of ``sources`` reaches it first.
+
+    Returns ``(indices, costs)`` arrays aligned with ``targets``: the index
+    into ``sources`` (-1 if none can reach it) and the travel cost. One
+    multi-source search answers every target.
+    """
+    targets = np.asarray(targets, dtype=np.int64).reshape(-1)
+    if len(sources) == 0:
+        return np.full(len(targets), -1, dtype=np.int64), np.full(len(targets), INF)
+    distances, nearest = multi_source_dijkstra(graph, sources, targets)
+    return nearest[targets], distances[targets]
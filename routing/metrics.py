@@ -0,0 +1,140 @@
+"""
+Runtime-switchable instrumentation for the routing and rendering hot paths.
+
+Code under measurement wraps a stage in ``with metrics.stage("map.base") as
+counts:`` (filling ``counts`` with anything worth adding up, such as
+``bytes_written``), reports a finished one with :meth:`Metrics.record` or
+bumps a standalone counter with :meth:`Metrics.count`. While instrumentation
+is off, the default, each call is one attribute test, so the calls stay in
+the production code; searches keep their heap counts in local variables and
+report them once per search.
+
+Turn it on with ``metrics.enable()`` or by setting ``ROUTING_METRICS=1``.
+:meth:`Metrics.snapshot` returns the calls, total, mean, max and last wall
+time of every stage and every counter; :meth:`Metrics.to_json` exports it.
+"""
+import json
+import os
+import threading
+import time
+
+
+class _Stage:
+    """Context manager timing one stage; the block fills the dict it returns with counters"""
+
+    __slots__ = ("metrics", "name", "counts", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.counts = {}
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self.counts
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.started, **self.counts)
+        return False
+
+
+class _Off:
+    """Stand-in for :class:`_Stage` while instrumentation is off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_OFF = _Off()
+
+
+class Metrics:
+    """
+    Wall time per stage and named counters, shared by every thread.
+
+    Stage names are dotted (``"search.dijkstra"``, ``"map.overlay"``); the
+    counters passed with a stage are stored as ``"<stage>.<counter>"``.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Forget every stage and counter"""
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.since = time.time()
+
+    def stage(self, name):
+        """Context manager timing the ``name`` stage; yields a dict for its counters"""
+        return _Stage(self, name) if self.enabled else _OFF
+
+    def record(self, name, seconds, **counters):
+        """Add one run of the ``name`` stage that took ``seconds``, with its counters"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {"calls": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+            stats["calls"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["last"] = seconds
+            for key, value in counters.items():
+                key = f"{name}.{key}"
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def count(self, name, value=1):
+        """Add ``value`` to the ``name`` counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """Return every stage (times in ms) and counter as a JSON-serialisable dict"""
+        with self._lock:
+            stages = {name: {"calls": stats["calls"],
+                             "total_ms": stats["total"] * 1000,
+                             "mean_ms": stats["total"] / stats["calls"] * 1000,
+                             "max_ms": stats["max"] * 1000,
+                             "last_ms": stats["last"] * 1000}
+                      for name, stats in sorted(self.stages.items())}
+            return {"enabled": self.enabled, "since": self.since, "stages": stages,
+                    "counters": dict(sorted(self.counters.items()))}
+
+    def to_json(self, path=None):
+        """Return the snapshot as JSON text, also writing it to ``path`` if given"""
+        text = json.dumps(self.snapshot(), indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def report(self):
+        """Return the snapshot as short text lines for a debug panel"""
+        snapshot = self.snapshot()
+        lines = [f"{name}: {stats['calls']}x, last {stats['last_ms']:.1f} ms, "
+                 f"mean {stats['mean_ms']:.1f} ms, max {stats['max_ms']:.1f} ms"
+                 for name, stats in snapshot["stages"].items()]
+        lines += [f"{name}: {value:,}" for name, value in snapshot["counters"].items()]
+        return lines
+
+
+# The process-wide instance every module reports to
+metrics = Metrics(enabled=os.environ.get("ROUTING_METRICS") == "1")
@@ -0,0 +1,321 @@
+"""
+Offline road-network loader for OpenStreetMap ``.osm`` XML, ``.osm.pbf``
+and osmnx-style GraphML files.
+
+Files are parsed as a stream: XML elements are cleared as soon as they are
+read and PBF blocks are decoded one at a time. Node coordinates and way
+node references are kept in compact typed arrays, so memory grows with the
+road data actually kept, not with the file's XML/tag overhead. Only drivable
+ways are kept; one-way tags decide edge direction and speed tags (or
+per-class defaults) turn lengths into travel times in minutes.
+"""
+import os
+import re
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+
+from .graph import RoadGraph, haversine_pairwise
+from .pbf import read_pbf
+
+
+# Default speeds in km/h for drivable highway classes without a maxspeed tag
+DEFAULT_SPEEDS_KMH = {
+    "motorway": 80, "motorway_link": 50,
+    "trunk": 60, "trunk_link": 40,
+    "primary": 50, "primary_link": 35,
+    "secondary": 40, "secondary_link": 30,
+    "tertiary": 35, "tertiary_link": 25,
+    "unclassified": 30, "road": 30,
+    "residential": 25, "living_street": 10, "service": 15,
+}
+
+_ONEWAY_YES = {"yes", "true", "1"}
+_ONEWAY_NO = {"no", "false", "0"}
+_NO_ACCESS = {"no", "private"}
+_MAXSPEED = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(mph|km/h|kmh|kph)?\s*$")
+
+# Report progress every this many parsed elements
+_PROGRESS_EVERY = 20000
+
+
+def parse_maxspeed(value, default):
+    """Convert an OSM ``maxspeed`` value to km/h, or return ``default``"""
+    if not value:
+        return default
+    match = _MAXSPEED.match(value.split(";")[0])
+    if not match:
+        return default
+    speed = float(match.group(1))
+    if match.group(2) == "mph":
+        speed *= 1.609344
+    return speed if speed > 0 else default
+
+
+def way_direction(tags):
+    """
+    Return how a drivable way may be travelled: 1 forward only, -1 backward
+    only, 0 both ways, or None if it is not drivable.
+    """
+    highway = tags.get("highway")
+    if highway not in DEFAULT_SPEEDS_KMH:
+        return None
+    if tags.get("area") == "yes":
+        return None
+    if tags.get("access") in _NO_ACCESS or tags.get("motor_vehicle") in _NO_ACCESS:
+        return None
+
+    oneway = tags.get("oneway", "")
+    if oneway == "-1":
+        return -1
+    if oneway in _ONEWAY_YES:
+        return 1
+    if oneway in _ONEWAY_NO:
+        return 0
+    if highway == "motorway" or tags.get("junction") in ("roundabout", "circular"):
+        return 1
+    return 0
+
+
+def way_speed(tags):
+    """Return the travel speed in km/h for a drivable way"""
+    return parse_maxspeed(tags.get("maxspeed"), DEFAULT_SPEEDS_KMH[tags["highway"]])
+
+
+class _RoadCollector:
+    """Accumulate nodes and drivable ways in typed arrays while streaming"""
+
+    def __init__(self):
+        self.node_ids = array("q")
+        self.lats = array("d")
+        self.lons = array("d")
+        self.refs = array("q")
+        self.way_ends = array("q")
+        self.way_speeds = array("d")
+        self.way_directions = array("b")
+
+    def add_node(self, node_id, lat, lon):
+        self.node_ids.append(node_id)
+        self.lats.append(lat)
+        self.lons.append(lon)
+
+    def add_way(self, refs, tags):
+        direction = way_direction(tags)
+        if direction is None or len(refs) < 2:
+            return
+        self.refs.extend(refs)
+        self.way_ends.append(len(self.refs))
+        self.way_speeds.append(way_speed(tags))
+        self.way_directions.append(direction)
+
+    def build(self):
+        refs = np.frombuffer(self.refs, dtype=np.int64) if self.refs else np.empty(0, np.int64)
+        ends = np.frombuffer(self.way_ends, dtype=np.int64) if self.way_ends else np.empty(0, np.int64)
+        way_of_ref = np.repeat(np.arange(len(ends)), np.diff(ends, prepend=0))
+
+        # Consecutive refs of the same way form road segments
+        same_way = way_of_ref[:-1] == way_of_ref[1:]
+        segment_way = way_of_ref[:-1][same_way]
+        speeds = np.asarray(self.way_speeds, dtype=np.float64)[segment_way]
+        directions = np.asarray(self.way_directions, dtype=np.int8)[segment_way]
+
+        forward = directions >= 0
+        backward = directions <= 0
+        sources = np.concatenate([refs[:-1][same_way][forward], refs[1:][same_way][backward]])
+        targets = np.concatenate([refs[1:][same_way][forward], refs[:-1][same_way][backward]])
+        speeds = np.concatenate([speeds[forward], speeds[backward]])
+
+        return _assemble(np.asarray(self.node_ids, dtype=np.int64),
+                         np.asarray(self.lats), np.asarray(self.lons),
+                         sources, targets, speeds)
+
+
+def _assemble(node_ids, lats, lons, sources, targets, speeds, lengths=None, minutes=None):
+    """
+    Build a travel-time :class:`RoadGraph` from edges given as external node
+    IDs. Edges referencing unknown nodes are dropped and only nodes used by
+    an edge are kept. Lengths (km) and minutes that are not given, or are
+    NaN, are derived from the coordinates and speeds.
+    """
+    order = np.argsort(node_ids, kind="stable")
+    sorted_ids = node_ids[order]
+
+    def locate(ids):
+        pos = np.clip(np.searchsorted(sorted_ids, ids), 0, max(len(sorted_ids) - 1, 0))
+        found = sorted_ids[pos] == ids if len(sorted_ids) else np.zeros(len(ids), bool)
+        return order[pos] if len(sorted_ids) else pos, found
+
+    source_rows, source_found = locate(sources)
+    target_rows, target_found = locate(targets)
+    keep = source_found & target_found & (source_rows != target_rows)
+    if not keep.any():
+        raise ValueError("No drivable roads found in the road file")
+
+    source_rows, target_rows = source_rows[keep], target_rows[keep]
+    used, compact = np.unique(np.concatenate([source_rows, target_rows]), return_inverse=True)
+    graph_sources, graph_targets = compact[:len(source_rows)], compact[len(source_rows):]
+    coords = np.column_stack([lats[used], lons[used]])
+
+    speeds = np.asarray(speeds, dtype=np.float64)[keep]
+    straight = haversine_pairwise(coords[graph_sources], coords[graph_targets])
+    if lengths is None:
+        lengths = straight
+    else:
+        lengths = np.asarray(lengths, dtype=np.float64)[keep]
+        lengths = np.where(np.isnan(lengths), straight, lengths)
+    estimated = lengths / speeds * 60
+    if minutes is None:
+        minutes = estimated
+    else:
+        minutes = np.asarray(minutes, dtype=np.float64)[keep]
+        minutes = np.where(np.isnan(minutes), estimated, minutes)
+
+    # Stored lengths or travel times may beat the straight-line / top-speed
+    # bound, so derive the heuristic scale from the data itself
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_km = np.where(straight > 0, minutes / straight, np.inf)
+    cost_per_km = min(60 / float(speeds.max()), float(per_km.min()))
+
+    return RoadGraph.from_edges(coords, graph_sources, graph_targets, minutes,
+                                cost_per_km=cost_per_km, lengths=lengths, metric="time")
+
+
+class _Progress:
+    """Turn byte offsets into ``progress(fraction)`` callbacks"""
+
+    def __init__(self, fileobj, callback):
+        self.fileobj = fileobj
+        self.callback = callback
+        self.size = max(os.fstat(fileobj.fileno()).st_size, 1)
+
+    def __call__(self, position=None):
+        if self.callback is not None:
+            position = self.fileobj.tell() if position is None else position
+            self.callback(min(position / self.size, 1.0))
+
+
+def _load_osm_xml(fileobj, report):
+    collector = _RoadCollector()
+    refs = []
+    tags = {}
+    count = 0
+
+    context = ET.iterparse(fileobj, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event == "start":
+            continue
+        tag = elem.tag
+        if tag == "node":
+            collector.add_node(int(elem.get("id")), float(elem.get("lat")), float(elem.get("lon")))
+        elif tag == "nd":
+            refs.append(int(elem.get("ref")))
+            continue
+        elif tag == "tag":
+            tags[elem.get("k")] = elem.get("v")
+            continue
+        elif tag == "way":
+            collector.add_way(refs, tags)
+        elif tag != "relation":
+            continue
+
+        # Finished a node or way: drop its subtree and reset the per-element state
+        refs = []
+        tags = {}
+        root.clear()
+        count += 1
+        if count % _PROGRESS_EVERY == 0:
+            report()
+
+    return collector.build()
+
+
+def _load_pbf(fileobj, report):
+    collector = _RoadCollector()
+    read_pbf(fileobj, on_node=collector.add_node, on_way=collector.add_way, progress=report)
+    return collector.build()
+
+
+def _load_graphml(fileobj, report):
+    """Load an osmnx-style directed GraphML file (lengths in metres, speeds in km/h)"""
+    keys = {}
+    node_ids, lats, lons = array("q"), array("d"), array("d")
+    sources, targets = array("q"), array("q")
+    lengths, speeds, minutes = array("d"), array("d"), array("d")
+    directed = True
+    data = {}
+    count = 0
+
+    context = ET.iterparse(fileobj, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        tag = elem.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            if tag == "graph":
+                directed = elem.get("edgedefault", "directed") == "directed"
+            continue
+
+        if tag == "key":
+            keys[elem.get("id")] = elem.get("attr.name")
+            continue
+        if tag == "data":
+            data[keys.get(elem.get("key"))] = elem.text or ""
+            continue
+
+        if tag == "node":
+            node_ids.append(int(elem.get("id")))
+            lats.append(float(data["y"]))
+            lons.append(float(data["x"]))
+        elif tag == "edge":
+            highway = data.get("highway", "unclassified").strip("[]'\" ").split("'")[0]
+            speed = float(data["speed_kph"]) if data.get("speed_kph") else parse_maxspeed(
+                data.get("maxspeed"), DEFAULT_SPEEDS_KMH.get(highway, 30))
+            length = float(data["length"]) / 1000 if data.get("length") else np.nan
+            travel = float(data["travel_time"]) / 60 if data.get("travel_time") else np.nan
+            pairs = [(int(elem.get("source")), int(elem.get("target")))]
+            if not directed:
+                pairs.append(pairs[0][::-1])
+            for u, v in pairs:
+                sources.append(u)
+                targets.append(v)
+                speeds.append(speed)
+                lengths.append(length)
+                minutes.append(travel)
+        else:
+            continue
+
+        data = {}
+        root.clear()
+        count += 1
+        if count % _PROGRESS_EVERY == 0:
+            report()
+
+    return _assemble(np.asarray(node_ids, dtype=np.int64), np.asarray(lats), np.asarray(lons),
+                     np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64),
+                     np.asarray(speeds), lengths=np.asarray(lengths), minutes=np.asarray(minutes))
+
+
+def load_road_file(path, progress=None):
+    """
+    Build a travel-time :class:`RoadGraph` from a local road file.
+
+    Supports ``.osm``/``.xml`` (OSM XML), ``.pbf`` (OSM PBF) and ``.graphml``.
+    ``progress(fraction)`` is called with values in [0, 1] as the file is read.
+    No network access is performed.
+    """
+    lower = path.lower()
+    if lower.endswith(".pbf"):
+        loader = _load_pbf
+    elif lower.endswith(".graphml"):
+        loader = _load_graphml
+    elif lower.endswith((".osm", ".xml")):
+        loader = _load_osm_xml
+    else:
+        raise ValueError(f"Unsupported road file type: {os.path.basename(path)}")
+
+    with open(path, "rb") as fileobj:
+        report = _Progress(fileobj, progress)
+        graph = loader(fileobj, report)
+        report(report.size)
+    return graph
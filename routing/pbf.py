@@ -0,0 +1,169 @@
+"""
+Minimal streaming reader for OpenStreetMap ``.osm.pbf`` files.
+
+Only what the road loader needs is decoded: node coordinates (plain and
+dense) and ways with their tags and node references. Each file block is
+read, inflated and decoded on its own, so memory use is bounded by the
+largest block (at most 32 MB by the format spec) rather than the file.
+"""
+import struct
+import zlib
+
+
+def _varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _fields(buf):
+    """Yield ``(field_number, value)`` for varint and length-delimited fields"""
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _varint(buf, pos)
+        elif wire_type == 2:
+            length, pos = _varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire_type == 1:
+            pos += 8
+            continue
+        elif wire_type == 5:
+            pos += 4
+            continue
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield number, value
+
+
+def _packed(buf, signed=False):
+    values = []
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        value, pos = _varint(buf, pos)
+        values.append(_zigzag(value) if signed else value)
+    return values
+
+
+def _int64(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _delta(values):
+    total = 0
+    decoded = []
+    for value in values:
+        total += value
+        decoded.append(total)
+    return decoded
+
+
+def _blob_data(blob):
+    for number, value in _fields(blob):
+        if number == 1:
+            return bytes(value)
+        if number == 3:
+            return zlib.decompress(value)
+    raise ValueError("Unsupported PBF blob compression (only raw and zlib are supported)")
+
+
+def _tags(keys, vals, strings):
+    return {strings[k]: strings[v] for k, v in zip(keys, vals)}
+
+
+def _primitive_block(data, on_node, on_way):
+    strings = []
+    groups = []
+    granularity = 100
+    lat_offset = lon_offset = 0
+
+    for number, value in _fields(data):
+        if number == 1:
+            strings = [bytes(s).decode("utf-8") for n, s in _fields(value) if n == 1]
+        elif number == 2:
+            groups.append(value)
+        elif number == 17:
+            granularity = value
+        elif number == 19:
+            lat_offset = _int64(value)
+        elif number == 20:
+            lon_offset = _int64(value)
+
+    def degrees(raw, offset):
+        return 1e-9 * (offset + granularity * raw)
+
+    for group in groups:
+        for number, value in _fields(group):
+            if number == 1 and on_node is not None:
+                node_id = lat = lon = 0
+                for n, v in _fields(value):
+                    if n == 1:
+                        node_id = _zigzag(v)
+                    elif n == 8:
+                        lat = _zigzag(v)
+                    elif n == 9:
+                        lon = _zigzag(v)
+                on_node(node_id, degrees(lat, lat_offset), degrees(lon, lon_offset))
+            elif number == 2 and on_node is not None:
+                ids = lats = lons = ()
+                for n, v in _fields(value):
+                    if n == 1:
+                        ids = _delta(_packed(v, signed=True))
+                    elif n == 8:
+                        lats = _delta(_packed(v, signed=True))
+                    elif n == 9:
+                        lons = _delta(_packed(v, signed=True))
+                for node_id, lat, lon in zip(ids, lats, lons):
+                    on_node(node_id, degrees(lat, lat_offset), degrees(lon, lon_offset))
+            elif number == 3 and on_way is not None:
+                keys, vals, refs = (), (), ()
+                for n, v in _fields(value):
+                    if n == 2:
+                        keys = _packed(v)
+                    elif n == 3:
+                        vals = _packed(v)
+                    elif n == 8:
+                        refs = _delta(_packed(v, signed=True))
+                on_way(refs, _tags(keys, vals, strings))
+
+
+def read_pbf(fileobj, on_node=None, on_way=None, progress=None):
+    """
+    Stream an ``.osm.pbf`` file, calling ``on_node(id, lat, lon)`` and
+    ``on_way(refs, tags)``. ``progress(bytes_read)`` is called per block.
+    """
+    while True:
+        header_size = fileobj.read(4)
+        if not header_size:
+            break
+        (size,) = struct.unpack(">I", header_size)
+
+        blob_type = ""
+        data_size = 0
+        for number, value in _fields(fileobj.read(size)):
+            if number == 1:
+                blob_type = bytes(value).decode("ascii")
+            elif number == 3:
+                data_size = value
+
+        blob = fileobj.read(data_size)
+        if blob_type == "OSMData":
+            _primitive_block(memoryview(_blob_data(blob)), on_node, on_way)
+
+        if progress is not None:
+            progress(fileobj.tell())
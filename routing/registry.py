@@ -0,0 +1,138 @@
+from collections import namedtuple
+
+import numpy as np
+
+from .graph import haversine_distance
+from .spatial import GridIndex
+
+
+# Nearest point on a road: the edge (source -> target), how far along it the
+# point lies (0 at source, 1 at target), the point itself and its distance
+EdgeSnap = namedtuple("EdgeSnap", ["source", "target", "fraction", "coords", "distance_km"])
+
+
+class LocationRegistry:
+    """
+    Named places on a :class:`RoadGraph` plus coordinate snapping.
+
+    Names map to dense location IDs through a dict; ``coords`` and ``nodes``
+    are arrays indexed by location ID holding each place's own coordinates
+    and the graph node it is attached to. Arbitrary coordinates snap to the
+    nearest node or the nearest point on a road through grid indexes over
+    the nodes and over points sampled along every road.
+    """
+
+    # Candidate road samples examined per edge snap
+    EDGE_CANDIDATES = 16
+
+    def __init__(self, graph, locations=()):
+        self.graph = graph
+        self.node_index = GridIndex(graph.coords)
+        self._edge_index = None
+
+        self.names = [name for name, _ in locations]
+        self.name_to_id = {name: i for i, name in enumerate(self.names)}
+        if len(self.name_to_id) != len(self.names):
+            raise ValueError("Location names must be unique")
+        self.coords = np.asarray([coords for _, coords in locations], dtype=np.float64).reshape(-1, 2)
+        self.nodes = np.array([self.snap(coords) for coords in self.coords], dtype=np.int64)
+        self.node_to_name = {}
+        for name, node in zip(self.names, self.nodes.tolist()):
+            self.node_to_name.setdefault(node, name)
+
+    def __contains__(self, name):
+        return name in self.name_to_id
+
+    def __len__(self):
+        return len(self.names)
+
+    def location_id(self, name):
+        """Return the location ID for a name"""
+        try:
+            return self.name_to_id[name]
+        except KeyError:
+            raise KeyError(f"Unknown location: {name}") from None
+
+    def node(self, name):
+        """Return the graph node a named location is attached to"""
+        return int(self.nodes[self.location_id(name)])
+
+    def location_coords(self, name):
+        """Return the (lat, lon) of a named location"""
+        return tuple(self.coords[self.location_id(name)].tolist())
+
+    def name_at(self, node, default=None):
+        """Return the name of the location attached to ``node``, if any"""
+        return self.node_to_name.get(node, default)
+
+    def snap(self, coord):
+        """Return the graph node nearest to a (lat, lon)"""
+        return int(self.node_index.nearest(coord)[0][0])
+
+    def _edges(self):
+        """Grid index over points sampled along every road, built on first use"""
+        if self._edge_index is None:
+            sources, targets, _ = self.graph.edges()
+            sources, targets = sources.astype(np.int64), targets.astype(np.int64)
+            # One sample per road direction pair is enough
+            keep = sources < targets
+            keep |= ~np.isin(sources * self.graph.num_nodes + targets,
+                             targets * self.graph.num_nodes + sources)
+            sources, targets = sources[keep], targets[keep]
+
+            # Sample each road at about the node index's cell spacing
+            xy = self.node_index.xy
+            lengths = np.hypot(*(xy[targets] - xy[sources]).T)
+            counts = np.maximum(np.ceil(lengths / self.node_index.cell_km).astype(np.int64), 1) + 1
+            edge_of_sample = np.repeat(np.arange(len(sources)), counts)
+            starts = np.cumsum(counts) - counts
+            step = np.arange(len(edge_of_sample)) - np.repeat(starts, counts)
+            t = (step / np.repeat(counts - 1, counts))[:, None]
+            coords = self.graph.coords
+            samples = coords[sources][edge_of_sample] * (1 - t) + coords[targets][edge_of_sample] * t
+
+            self._edge_index = (GridIndex(samples), sources, targets, edge_of_sample)
+        return self._edge_index
+
+    def road_candidates(self, coord):
+        """
+        Return ``(sources, targets, fractions, distances_km)`` arrays for the
+        nearest point on each road near ``coord``, nearest first. Each road
+        appears once, in one of its directions; ``fractions`` run from
+        ``sources`` to ``targets`` and distances are planar km.
+        """
+        index, sources, targets, edge_of_sample = self._edges()
+        samples, _ = index.nearest(coord, k=self.EDGE_CANDIDATES)
+        candidates = np.unique(edge_of_sample[samples])
+
+        project = self.node_index.project
+        point = project(coord)[0]
+        a = project(self.graph.coords[sources[candidates]])
+        b = project(self.graph.coords[targets[candidates]])
+        ab = b - a
+        denom = np.maximum((ab**2).sum(axis=1), 1e-18)
+        fraction = np.clip(((point - a) * ab).sum(axis=1) / denom, 0.0, 1.0)
+        nearest = a + ab * fraction[:, None]
+        distance = np.sqrt(((nearest - point)**2).sum(axis=1))
+
+        order = np.argsort(distance, kind="stable")
+        return sources[candidates[order]], targets[candidates[order]], fraction[order], distance[order]
+
+    def snap_to_edge(self, coord):
+        """Return the :class:`EdgeSnap` for the nearest point on any road"""
+        sources, targets, fractions, _ = self.road_candidates(coord)
+        u, v, f = int(sources[0]), int(targets[0]), float(fractions[0])
+        snapped = tuple((self.graph.coords[u] * (1 - f) + self.graph.coords[v] * f).tolist())
+        return EdgeSnap(u, v, f, snapped, haversine_distance(coord, snapped))
+
+    def resolve(self, place):
+        """
+        Return the graph node for a location name or a raw (lat, lon).
+
+        Coordinates snap to the nearest point on a road and then to the
+        closer end of that road.
+        """
+        if isinstance(place, str):
+            return self.node(place)
+        snap = self.snap_to_edge(place)
+        return snap.source if snap.fraction <= 0.5 else snap.target
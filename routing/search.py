@@ -0,0 +1,265 @@
+import heapq
+import math
+import time
+from collections import namedtuple
+
+from .graph import EARTH_RADIUS_KM
+from .metrics import metrics
+
+
+INF = float("inf")
+
+# path is a list of node IDs (None if unreachable), distance is the path cost
+# and settled counts the nodes popped from the queue with a final distance
+SearchResult = namedtuple("SearchResult", ["path", "distance", "settled"])
+
+
+def _unwind(previous, source, target):
+    """Follow predecessor links back from target to source"""
+    path = [target]
+    while path[-1] != source:
+        path.append(previous[path[-1]])
+    path.reverse()
+    return path
+
+
+def _report(name, started, settled, pushes, queued):
+    """Record one search with the process-wide metrics (only called while they are on)"""
+    metrics.record(f"search.{name}", time.perf_counter() - started, settled=settled,
+                   heap_pushes=pushes, heap_pops=pushes - queued)
+
+
+def dijkstra(graph, source, target=None):
+    """
+    Run Dijkstra's algorithm from ``source`` over a :class:`RoadGraph`.
+
+    Uses a binary heap with lazy deletion: stale queue entries are skipped when
+    popped instead of being decreased in place. When ``target`` is given the
+    search stops as soon as it is settled.
+
+    Returns ``(distances, previous, settled)`` where ``distances`` and
+    ``previous`` are lists indexed by node ID.
+    """
+    started = time.perf_counter()
+    offsets, targets, weights = graph.adjacency_lists()
+    n = len(offsets) - 1
+
+    distances = [INF] * n
+    previous = [-1] * n
+    done = [False] * n
+    distances[source] = 0.0
+    heap = [(0.0, source)]
+    settled = 0
+    pushes = 1
+
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if done[node]:
+            continue
+        done[node] = True
+        settled += 1
+
+        if node == target:
+            break
+
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = targets[i]
+            new_distance = dist + weights[i]
+            if new_distance < distances[neighbour]:
+                distances[neighbour] = new_distance
+                previous[neighbour] = node
+                heapq.heappush(heap, (new_distance, neighbour))
+                pushes += 1
+
+    if metrics.enabled:
+        _report("dijkstra", started, settled, pushes, len(heap))
+    return distances, previous, settled
+
+
+def _dijkstra_path(graph, source, target):
+    distances, previous, settled = dijkstra(graph, source, target)
+
+    if distances[target] == INF:
+        return SearchResult(None, INF, settled)
+
+    return SearchResult(_unwind(previous, source, target), distances[target], settled)
+
+
+def straight_line_bound(graph, node):
+    """
+    Return ``h(v)``: a lower bound on the cost between ``v`` and ``node``.
+
+    The bound is the haversine distance scaled by ``graph.cost_per_km``, which
+    never overestimates and satisfies the triangle inequality, so it is a
+    consistent A* heuristic.
+    """
+    lat, lon, cos_lat = graph.coord_radians()
+    lat0, lon0, cos0 = lat[node], lon[node], cos_lat[node]
+    scale = 2 * EARTH_RADIUS_KM * graph.cost_per_km
+    sin, asin, sqrt = math.sin, math.asin, math.sqrt
+
+    def bound(v):
+        a = sin((lat[v] - lat0) / 2)**2 + cos_lat[v] * cos0 * sin((lon[v] - lon0) / 2)**2
+        return scale * asin(sqrt(min(a, 1.0)))
+
+    return bound
+
+
+def astar(graph, source, target):
+    """A* search guided by the straight-line distance to ``target``"""
+    started = time.perf_counter()
+    offsets, targets, weights = graph.adjacency_lists()
+    n = len(offsets) - 1
+    h = straight_line_bound(graph, target)
+
+    distances = [INF] * n
+    previous = [-1] * n
+    done = [False] * n
+    distances[source] = 0.0
+    heap = [(h(source), source)]
+    settled = 0
+    pushes = 1
+
+    while heap:
+        _, node = heapq.heappop(heap)
+        if done[node]:
+            continue
+        done[node] = True
+        settled += 1
+
+        if node == target:
+            break
+
+        dist = distances[node]
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = targets[i]
+            new_distance = dist + weights[i]
+            if new_distance < distances[neighbour]:
+                distances[neighbour] = new_distance
+                previous[neighbour] = node
+                heapq.heappush(heap, (new_distance + h(neighbour), neighbour))
+                pushes += 1
+
+    if metrics.enabled:
+        _report("astar", started, settled, pushes, len(heap))
+    if not done[target]:
+        return SearchResult(None, INF, settled)
+    return SearchResult(_unwind(previous, source, target), distances[target], settled)
+
+
+def _no_potential(node):
+    return 0.0
+
+
+def _bidirectional(graph, source, target, potential):
+    """
+    Bidirectional search over ``graph`` and its reverse.
+
+    ``potential(v)`` shifts forward keys by ``+p(v)`` and backward keys by
+    ``-p(v)``. With the average potential ``(h_t(v) - h_s(v)) / 2`` both
+    directions see the same reduced edge costs, so the usual stopping rule
+    (sum of the two queue minima reaches the best meeting cost) stays exact.
+    """
+    if source == target:
+        return SearchResult([source], 0.0, 1)
+
+    started = time.perf_counter()
+    forward = graph.adjacency_lists()
+    backward = graph.reverse().adjacency_lists()
+    n = len(forward[0]) - 1
+
+    distances = ([INF] * n, [INF] * n)
+    previous = ([-1] * n, [-1] * n)
+    done = ([False] * n, [False] * n)
+    distances[0][source] = 0.0
+    distances[1][target] = 0.0
+    heaps = ([(potential(source), source)], [(-potential(target), target)])
+
+    best = INF
+    meeting = -1
+    settled = 0
+    pushes = 2
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        # Expand the side whose queue minimum is smaller
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        _, node = heapq.heappop(heaps[side])
+        if done[side][node]:
+            continue
+        done[side][node] = True
+        settled += 1
+
+        offsets, targets, weights = backward if side else forward
+        own, other = distances[side], distances[1 - side]
+        links = previous[side]
+        sign = -1.0 if side else 1.0
+        dist = own[node]
+
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = targets[i]
+            new_distance = dist + weights[i]
+            if new_distance < own[neighbour]:
+                own[neighbour] = new_distance
+                links[neighbour] = node
+                heapq.heappush(heaps[side], (new_distance + sign * potential(neighbour), neighbour))
+                pushes += 1
+
+                total = new_distance + other[neighbour]
+                if total < best:
+                    best = total
+                    meeting = neighbour
+
+    if metrics.enabled:
+        _report("bidirectional", started, settled, pushes, len(heaps[0]) + len(heaps[1]))
+    if meeting < 0:
+        return SearchResult(None, INF, settled)
+
+    path = _unwind(previous[0], source, meeting)
+    node = meeting
+    while node != target:
+        node = previous[1][node]
+        path.append(node)
+
+    return SearchResult(path, best, settled)
+
+
+def bidirectional_dijkstra(graph, source, target):
+    """Bidirectional Dijkstra meeting in the middle"""
+    return _bidirectional(graph, source, target, _no_potential)
+
+
+def bidirectional_astar(graph, source, target):
+    """Bidirectional A* using the average of the two straight-line bounds"""
+    to_target = straight_line_bound(graph, target)
+    to_source = straight_line_bound(graph, source)
+
+    def potential(node):
+        return (to_target(node) - to_source(node)) / 2
+
+    return _bidirectional(graph, source, target, potential)
+
+
+SEARCH_MODES = {
+    "dijkstra": _dijkstra_path,
+    "astar": astar,
+    "bidijkstra": bidirectional_dijkstra,
+    "biastar": bidirectional_astar,
+}
+
+
+def shortest_path(graph, source, target, mode="dijkstra"):
+    """
+    Find the shortest path between two node IDs.
+
+    ``mode`` selects the search from :data:`SEARCH_MODES`. Every mode returns
+    an optimal path; they differ only in how many nodes they settle.
+    """
+    try:
+        search = SEARCH_MODES[mode]
+    except KeyError:
+        raise ValueError(f"Unknown search mode: {mode}") from None
+
+    return search(graph, source, target)
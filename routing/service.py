@@ -0,0 +1,276 @@
+"""
+Local HTTP/JSON route-query service built on asyncio.
+
+    python -m routing.service --port 8080 --workers 4
+
+Endpoints (GET parameters or a POST JSON body):
+
+- ``/route?start=Bus Stand&end=20.79,76.70&mode=astar``: one route between
+  location names, ``lat,lon`` points or node IDs, answered like a line of
+  the batch CLI (404 if the destination is unreachable); ``mode=td`` takes
+  a ``departure=HH:MM`` for time-of-day travel times, and ``mode=ch`` needs
+  the service started with ``--ch``
+- ``/matrix`` with ``{"sources": [...], "targets": [...]}``: travel-cost
+  matrix, ``null`` where unreachable
+- ``/nearest?lat=20.79&lon=76.70``: nearest road node to a coordinate
+- ``/stats`` and ``/health``
+
+The event loop only parses requests and writes responses. Searches, and
+resolving the places they start and end at, run on a pool of worker
+processes that each memory-map the graph snapshot, and concurrent
+identical requests share one in-flight search. With ``--ch`` the
+contraction hierarchy is built once before the workers start, so no
+worker preprocesses the graph on its first ``mode=ch`` request.
+"""
+import argparse
+import asyncio
+import json
+import math
+from urllib.parse import parse_qsl, urlsplit
+
+from .batch import _place, answer, json_safe
+from .engine import RoutingEngine, engine_pool, worker_engine
+from .graph import haversine_distance
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            500: "Internal Server Error"}
+
+# Largest accepted request body
+MAX_BODY = 1 << 20
+
+
+class BadRequest(ValueError):
+    """A request the service cannot parse or answer; reported as HTTP 400"""
+
+
+def _route_job(query, mode):
+    return json_safe(answer(worker_engine(), query, mode))
+
+
+def _matrix_job(sources, targets):
+    matrix = worker_engine().matrix(sources, targets)
+    return [[cost if math.isfinite(cost) else None for cost in row] for row in matrix.tolist()]
+
+
+async def _read_request(reader):
+    """Return (method, target, headers, body) for the next request, or None at EOF"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise BadRequest("Malformed request line") from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise BadRequest("Malformed Content-Length") from None
+    if length > MAX_BODY:
+        raise BadRequest("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+class RouteService:
+    """
+    Answers HTTP/JSON queries over a :class:`RoutingEngine`.
+
+    ``workers`` worker processes run the searches (0 runs them on one
+    background thread sharing ``engine``). ``ch`` builds the contraction
+    hierarchy before the workers start; without it, and with no hierarchy
+    in the snapshot, ``mode=ch`` requests are refused. ``requests``,
+    ``coalesced`` and ``errors`` count what the service has handled.
+    """
+
+    def __init__(self, engine, workers=1, ch=False):
+        self.engine = engine
+        self.workers = workers
+        self.ch = ch
+        self.pool = None
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._inflight = {}
+
+    async def _coalesce(self, key, job, *args):
+        """Run ``job(*args)`` on the pool, sharing the result with identical in-flight requests"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.get_running_loop().run_in_executor(self.pool, job, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._inflight.pop(key, None))
+        # A client hanging up must not cancel the search for everyone else
+        return await asyncio.shield(future)
+
+    async def _route(self, params):
+        query = {"id": params.get("id"), "start": _place(params.get("start")),
+                 "end": _place(params.get("end")), "mode": params.get("mode") or "dijkstra",
+                 "departure": params.get("departure")}
+        if query["mode"] == "ch" and self.engine.hierarchy is None:
+            # Each worker would otherwise preprocess the whole graph on its first request
+            raise ValueError("mode=ch needs the service started with --ch")
+        key = json.dumps(["route", query["start"], query["end"], query["mode"], query["departure"]])
+        result = dict(await self._coalesce(key, _route_job, query, query["mode"]))
+        result["id"] = query["id"]
+        if "error" not in result:
+            return 200, result
+        return (404 if result["error"] == "No route found" else 400), result
+
+    async def _matrix(self, params):
+        sources, targets = params.get("sources"), params.get("targets")
+        if not isinstance(sources, list) or not isinstance(targets, list):
+            raise BadRequest("matrix needs 'sources' and 'targets' lists")
+        sources, targets = [_place(p) for p in sources], [_place(p) for p in targets]
+        # Places are resolved (and snapped) in the worker; unknown ones come back as ValueError
+        key = json.dumps(["matrix", sources, targets])
+        costs = await self._coalesce(key, _matrix_job, sources, targets)
+        return 200, {"sources": sources, "targets": targets, "costs": costs}
+
+    def _nearest(self, params):
+        try:
+            point = (float(params["lat"]), float(params["lon"]))
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest("nearest needs numeric 'lat' and 'lon'") from None
+        registry = self.engine.registry
+        node = registry.snap(point)
+        coords = tuple(self.engine.graph.coords[node].tolist())
+        return 200, {"node": node, "coords": coords, "name": registry.name_at(node),
+                     "distance_km": haversine_distance(point, coords)}
+
+    def stats(self):
+        return {"requests": self.requests, "coalesced": self.coalesced, "errors": self.errors,
+                "in_flight": len(self._inflight), "workers": self.workers,
+                "nodes": self.engine.graph.num_nodes, "edges": self.engine.graph.num_edges}
+
+    async def dispatch(self, method, target, body):
+        """Return (status, payload) for one request"""
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        if method == "POST" and body:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise BadRequest("Body is not valid JSON") from None
+            if not isinstance(payload, dict):
+                raise BadRequest("Body must be a JSON object")
+            params.update(payload)
+        elif method not in ("GET", "POST"):
+            return 405, {"error": f"Method {method} not allowed"}
+
+        if url.path == "/route":
+            return await self._route(params)
+        if url.path == "/matrix":
+            return await self._matrix(params)
+        if url.path == "/nearest":
+            return self._nearest(params)
+        if url.path == "/stats":
+            return 200, self.stats()
+        if url.path == "/health":
+            return 200, {"status": "ok"}
+        return 404, {"error": f"Unknown endpoint {url.path}"}
+
+    async def handle(self, reader, writer):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    self.requests += 1
+                    status, payload = await self.dispatch(method, target, body)
+                except BadRequest as e:
+                    # The stream may be out of step with request boundaries now
+                    status, payload, keep_alive = 400, {"error": str(e)}, False
+                except (KeyError, ValueError) as e:
+                    status, payload = 400, {"error": str(e.args[0]) if e.args else str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                if status >= 400:
+                    self.errors += 1
+
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080, ready=None):
+        """Run until cancelled; ``ready(port)`` is called once the socket is listening"""
+        if self.ch:
+            # Built once here and shared through the snapshot (or pickled) with every worker
+            self.engine.contraction_hierarchy()
+        self.pool = engine_pool(self.engine, self.workers)
+        try:
+            server = await asyncio.start_server(self.handle, host, port)
+            async with server:
+                if ready is not None:
+                    ready(server.sockets[0].getsockname()[1])
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m routing.service", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (0 picks a free one)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="worker processes for searches (0 runs them on one thread)")
+    parser.add_argument("--road-file", help="local .osm, .osm.pbf or .graphml road network")
+    parser.add_argument("--snapshot", default="shegaon_network.snapshot",
+                        help="graph snapshot to reuse or create")
+    parser.add_argument("--use-snapshot", action="store_true",
+                        help="serve --snapshot as it is, without checking where it was built from")
+    parser.add_argument("--ch", action="store_true",
+                        help="build the contraction hierarchy at startup and serve mode=ch")
+    args = parser.parse_args(argv)
+
+    if args.use_snapshot:
+        engine = RoutingEngine.from_snapshot(args.snapshot)
+    else:
+        engine = RoutingEngine(road_file=args.road_file, snapshot_file=args.snapshot).load()
+
+    service = RouteService(engine, workers=args.workers, ch=args.ch)
+
+    def ready(port):
+        print(f"Serving on http://{args.host}:{port}", flush=True)
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready=ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Versioned, memory-mapped binary snapshots of a routing graph.
+
+A snapshot file is laid out as::
+
+    magic (8 bytes) | header length (uint64 LE) | JSON header | padding
+    array 0 | padding | array 1 | padding | ...
+
+Every array starts on a 64-byte boundary and is read back with
+``np.frombuffer`` over a single read-only ``mmap``, so loading costs a
+header parse plus page faults on first touch, and processes that map the
+same file share one copy in the page cache. The header records the
+format version and a caller-supplied ``source`` description; a snapshot
+whose source no longer matches is reported as stale.
+"""
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+from collections.abc import Sequence
+
+import numpy as np
+
+from .contraction import ContractionHierarchy
+from .graph import RoadGraph
+
+
+MAGIC = b"ARFSNAP\0"
+FORMAT_VERSION = 1
+_ALIGN = 64
+_CSR_FIELDS = ("offsets", "targets", "weights", "middles")
+
+Snapshot = namedtuple("Snapshot", ["graph", "hierarchy", "source"])
+
+
+class StaleSnapshotError(ValueError):
+    """Raised when a snapshot was written by another format version or source"""
+
+
+class _NameTable(Sequence):
+    """Node names decoded on demand from a UTF-8 blob and offset array"""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+
+def _aligned(size):
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _encode_names(names):
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def save_snapshot(path, graph, source=None, hierarchy=None):
+    """
+    Write ``graph`` (and optionally its contraction ``hierarchy``) to ``path``.
+
+    ``source`` is any JSON-serialisable description of where the graph came
+    from; :func:`load_snapshot` compares it to detect stale files. The file
+    is written to a temporary name and atomically renamed, so processes
+    still mapping an older snapshot are unaffected.
+    """
+    arrays = {
+        "coords": graph.coords,
+        "offsets": graph.offsets,
+        "targets": graph.targets,
+        "weights": graph.weights,
+    }
+    if graph.lengths is not graph.weights:
+        arrays["lengths"] = graph.lengths
+    if graph.names is not None:
+        arrays["names_blob"], arrays["names_offsets"] = _encode_names(graph.names)
+    if hierarchy is not None:
+        arrays["ch_rank"] = hierarchy.rank
+        for prefix, csr in (("ch_up", hierarchy.up), ("ch_down", hierarchy.down)):
+            for name, array in zip(_CSR_FIELDS, csr):
+                arrays[f"{prefix}_{name}"] = array
+
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+        position = _aligned(position + array.nbytes)
+
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "source": source,
+        "metric": graph.metric,
+        "cost_per_km": graph.cost_per_km,
+        "hierarchy_fingerprint": hierarchy.fingerprint if hierarchy is not None else None,
+        "arrays": layout,
+    }).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.data)
+        f.truncate(data_start + position)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(path):
+    """Return the JSON header of a snapshot file"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a road network snapshot: {path}")
+        (length,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(length))
+
+
+def load_snapshot(path, source=None):
+    """
+    Memory-map a snapshot written by :func:`save_snapshot`.
+
+    Raises :class:`StaleSnapshotError` if the format version differs or, when
+    ``source`` is given, if the snapshot was built from a different source.
+    """
+    header = read_snapshot_header(path)
+    if header["format_version"] != FORMAT_VERSION:
+        raise StaleSnapshotError(f"Snapshot format {header['format_version']} != {FORMAT_VERSION}")
+    if source is not None and header["source"] != source:
+        raise StaleSnapshotError("Snapshot was built from a different road network source")
+
+    with open(path, "rb") as f:
+        # The mapping stays alive as long as any array views it
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data_start = _aligned(len(MAGIC) + 8 + struct.unpack_from("<Q", mapped, len(MAGIC))[0])
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        array = np.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + spec["offset"])
+        arrays[name] = array.reshape(spec["shape"])
+
+    names = None
+    if "names_blob" in arrays:
+        names = _NameTable(arrays["names_blob"], arrays["names_offsets"])
+
+    graph = RoadGraph(arrays["coords"], arrays["offsets"], arrays["targets"], arrays["weights"],
+                      names=names, cost_per_km=header["cost_per_km"],
+                      lengths=arrays.get("lengths"), metric=header["metric"])
+
+    hierarchy = None
+    if "ch_rank" in arrays:
+        hierarchy = ContractionHierarchy(
+            arrays["ch_rank"],
+            tuple(arrays[f"ch_up_{name}"] for name in _CSR_FIELDS),
+            tuple(arrays[f"ch_down_{name}"] for name in _CSR_FIELDS),
+            fingerprint=header["hierarchy_fingerprint"])
+
+    return Snapshot(graph, hierarchy, header["source"])
+
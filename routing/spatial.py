@@ -0,0 +1,145 @@
+import math
+
+import numpy as np
+
+from .graph import EARTH_RADIUS_KM, haversine_one_to_many
+
+
+class GridIndex:
+    """
+    Uniform-grid spatial index over (lat, lon) points.
+
+    Points are projected to a local equirectangular plane in km, which is
+    accurate to well under a metre across a town or district, and bucketed
+    into square cells stored CSR-style (``cell_offsets`` into ``order``).
+    Neighbour searches grow a square block of cells around the query until
+    the block is guaranteed to contain the k nearest points.
+    """
+
+    def __init__(self, coords, cell_km=None):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        n = len(self.coords)
+        if n == 0:
+            raise ValueError("cannot index an empty set of points")
+
+        self.cos_lat0 = math.cos(math.radians(float(self.coords[:, 0].mean())))
+        self.xy = self.project(self.coords)
+        self.origin = self.xy.min(axis=0)
+        extent = self.xy.max(axis=0) - self.origin
+
+        if cell_km is None:
+            # Aim for about two points per cell; fall back for degenerate extents
+            area = float(extent[0] * extent[1])
+            cell_km = max(math.sqrt(2 * area / n), 2 * float(extent.max()) / n, 1e-6)
+        self.cell_km = cell_km
+
+        self.shape = (extent // cell_km).astype(np.int64) + 1
+        cells = self._cells(self.xy)
+        self.order = np.argsort(cells, kind="stable")
+        self.cell_offsets = np.zeros(int(self.shape[0] * self.shape[1]) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=len(self.cell_offsets) - 1), out=self.cell_offsets[1:])
+
+    def project(self, coords):
+        """Project (lat, lon) degrees to planar (x, y) km"""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        scale = EARTH_RADIUS_KM * math.pi / 180
+        return np.column_stack([coords[:, 1] * scale * self.cos_lat0, coords[:, 0] * scale])
+
+    def _cell_xy(self, xy):
+        cxy = ((xy - self.origin) // self.cell_km).astype(np.int64)
+        return np.clip(cxy, 0, self.shape - 1)
+
+    def _cells(self, xy):
+        cxy = self._cell_xy(xy)
+        return cxy[:, 0] * self.shape[1] + cxy[:, 1]
+
+    def _block(self, cx, cy, radius):
+        """Return the point indices in the cells within ``radius`` of (cx, cy)"""
+        nx, ny = self.shape
+        y0, y1 = max(cy - radius, 0), min(cy + radius, ny - 1)
+        offsets = self.cell_offsets
+        parts = [self.order[offsets[x * ny + y0]:offsets[x * ny + y1 + 1]]
+                 for x in range(max(cx - radius, 0), min(cx + radius, nx - 1) + 1)]
+        return np.concatenate(parts)
+
+    def _clearance(self, xy, cx, cy, radius):
+        """Distance from ``xy`` to the nearest point that could lie outside the block"""
+        nx, ny = self.shape
+        x0, y0 = self.origin + np.array([cx - radius, cy - radius]) * self.cell_km
+        x1, y1 = self.origin + np.array([cx + radius + 1, cy + radius + 1]) * self.cell_km
+        gaps = [math.inf]
+        if cx - radius > 0:
+            gaps.append(xy[0] - x0)
+        if cx + radius < nx - 1:
+            gaps.append(x1 - xy[0])
+        if cy - radius > 0:
+            gaps.append(xy[1] - y0)
+        if cy + radius < ny - 1:
+            gaps.append(y1 - xy[1])
+        return min(gaps)
+
+    def _covers_all(self, cx, cy, radius):
+        nx, ny = self.shape
+        return cx - radius <= 0 and cy - radius <= 0 and cx + radius >= nx - 1 and cy + radius >= ny - 1
+
+    def nearest(self, coord, k=1):
+        """
+        Return ``(indices, distances_km)`` of the ``k`` points nearest ``coord``.
+
+        Distances are haversine km; ordering uses the planar projection.
+        """
+        k = min(k, len(self.coords))
+        xy = self.project(coord)
+        cx, cy = self._cell_xy(xy)[0]
+        xy = xy[0]
+
+        radius = 0
+        while True:
+            candidates = self._block(cx, cy, radius)
+            if len(candidates) >= k:
+                d2 = ((self.xy[candidates] - xy)**2).sum(axis=1)
+                kth = np.partition(d2, k - 1)[k - 1]
+                # Stop once nothing outside the block can be closer than the kth hit
+                if kth <= max(self._clearance(xy, cx, cy, radius), 0.0)**2:
+                    break
+            radius += 1
+
+        best = np.argsort(d2, kind="stable")[:k]
+        indices = candidates[best]
+        return indices, haversine_one_to_many(coord, self.coords[indices])
+
+    def knn_all(self, k):
+        """
+        Return an (N, k) array with the k nearest other points of every point,
+        nearest first.
+        """
+        n = len(self.coords)
+        k = min(k, n - 1)
+        result = np.empty((n, k), dtype=np.int64)
+        if k <= 0:
+            return result
+
+        ny = self.shape[1]
+        offsets = self.cell_offsets
+        for cell in np.flatnonzero(np.diff(offsets)):
+            members = self.order[offsets[cell]:offsets[cell + 1]]
+            cx, cy = divmod(int(cell), ny)
+            points = self.xy[members]
+
+            radius = 1
+            while True:
+                candidates = self._block(cx, cy, radius)
+                if len(candidates) > k:
+                    d2 = ((points[:, None, :] - self.xy[candidates][None, :, :])**2).sum(axis=2)
+                    d2[candidates[None, :] == members[:, None]] = np.inf
+                    nearest = np.argpartition(d2, k - 1, axis=1)[:, :k]
+                    kth = np.take_along_axis(d2, nearest, axis=1).max()
+                    if kth <= (radius * self.cell_km)**2 or self._covers_all(cx, cy, radius):
+                        break
+                radius += 1
+
+            ranked = np.take_along_axis(
+                nearest, np.argsort(np.take_along_axis(d2, nearest, axis=1), axis=1, kind="stable"), axis=1)
+            result[members] = candidates[ranked]
+
+        return result
@@ -0,0 +1,148 @@
+"""
+Background tasks for interactive frontends.
+
+:class:`TaskRunner` runs slow work (searches, map rendering, browser
+launches) on a small thread pool so the UI thread never blocks, and hands
+progress and results back through a ``post`` callable that runs a function
+on the UI thread (for Tk, ``lambda fn: root.after(0, fn)``).
+
+Tasks are submitted on named channels ("route", "map", ...). A new task on
+a channel cancels the one before it: a task still queued never starts, a
+running one stops at its next :meth:`Task.check`, and whatever it returns
+is dropped, so a stale answer can never overwrite a newer one.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Cancelled(Exception):
+    """Raised inside a task by :meth:`Task.check` once it has been superseded or cancelled"""
+
+
+class Task:
+    """
+    One unit of background work. The work function receives the task and
+    reports through :meth:`progress` and :meth:`check`.
+    """
+
+    def __init__(self, runner, channel, serial):
+        self.runner = runner
+        self.channel = channel
+        self.serial = serial
+        self.submitted = time.perf_counter()
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Mark the task cancelled; returns True if it had not started yet and never will"""
+        self._cancelled.set()
+        return self.future is not None and self.future.cancel()
+
+    def check(self):
+        """Raise :class:`Cancelled` if the task is no longer wanted"""
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+    def progress(self, fraction, message=None):
+        """Report progress (0-1) to the UI, then stop here if the task was cancelled"""
+        self.check()
+        self.runner._post_progress(self, fraction, message)
+
+
+class TaskRunner:
+    """
+    Thread pool behind a UI. ``post(fn)`` must run ``fn()`` on the UI
+    thread; ``on_progress(task, fraction, message)`` (optional) is called
+    there for every progress report of a current task.
+
+    ``completed``, ``cancelled`` and ``failed`` count finished tasks;
+    ``stale`` counts results dropped because a newer task had replaced
+    them by the time they came back.
+    """
+
+    def __init__(self, post, workers=2, on_progress=None):
+        self.post = post
+        self.on_progress = on_progress
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ui-task")
+        self._lock = threading.Lock()
+        self._current = {}
+        self._serial = 0
+        self.completed = self.cancelled = self.failed = self.stale = 0
+
+    def submit(self, channel, work, on_done=None, on_error=None):
+        """
+        Run ``work(task)`` in the pool, cancelling the task before it on
+        ``channel``. ``on_done(result)`` or ``on_error(exception)`` then runs
+        on the UI thread, unless the task was superseded meanwhile. Returns
+        the :class:`Task`.
+        """
+        with self._lock:
+            self._serial += 1
+            task = Task(self, channel, self._serial)
+            previous = self._current.get(channel)
+            self._current[channel] = task
+        if previous is not None and previous.cancel():
+            self.cancelled += 1
+        task.future = self.executor.submit(self._run, task, work, on_done, on_error)
+        return task
+
+    def _run(self, task, work, on_done, on_error):
+        try:
+            task.check()
+            result = work(task)
+        except Cancelled:
+            self.post(lambda: self._finish(task, "cancelled"))
+        except Exception as e:
+            self.post(lambda error=e: self._finish(task, "failed", on_error, error))
+        else:
+            self.post(lambda: self._finish(task, "completed", on_done, result))
+
+    def _finish(self, task, outcome, callback=None, value=None):
+        """Deliver a result on the UI thread if ``task`` is still the newest on its channel"""
+        if outcome == "cancelled":
+            self.cancelled += 1
+            return
+        if not self.is_current(task):
+            self.stale += 1
+            return
+        with self._lock:
+            del self._current[task.channel]
+        if outcome == "failed":
+            self.failed += 1
+        else:
+            self.completed += 1
+        if callback is not None:
+            callback(value)
+
+    def _post_progress(self, task, fraction, message):
+        if self.on_progress is not None:
+            self.post(lambda: self.is_current(task) and self.on_progress(task, fraction, message))
+
+    def is_current(self, task):
+        """Whether ``task`` is still the newest on its channel and not cancelled"""
+        return not task.cancelled and self._current.get(task.channel) is task
+
+    def busy(self, channel):
+        """Whether a task on ``channel`` is queued or running"""
+        return channel in self._current
+
+    def cancel(self, channel):
+        """Cancel the task on ``channel``, if any"""
+        with self._lock:
+            task = self._current.pop(channel, None)
+        if task is not None and task.cancel():
+            self.cancelled += 1
+
+    def shutdown(self):
+        """Cancel every task and stop the pool without waiting for running work"""
+        with self._lock:
+            tasks = list(self._current.values())
+            self._current.clear()
+        for task in tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
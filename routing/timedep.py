@@ -0,0 +1,214 @@
+"""
+Time-dependent routing: travel times that follow the time of day.
+
+Every edge points at a speed profile, 96 fifteen-minute buckets of speed
+factors relative to free flow (1.0 = free flow, 0.3 = 30% of it). Edges
+with identical profiles share one row of a single NumPy array, so a
+town-wide network needs only a handful of rows.
+
+A vehicle crosses an edge at the speed of the bucket it is in, carrying
+over into the next bucket when one ends. Travel times computed this way
+are FIFO (leaving later never means arriving earlier), so a Dijkstra
+search on arrival times gives exact earliest arrivals. Speed factors never
+exceed 1, which keeps the straight-line A* bound admissible.
+"""
+import datetime
+import heapq
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from .graph import haversine_pairwise
+from .search import INF, SearchResult, _unwind, straight_line_bound
+
+
+BUCKET_MINUTES = 15
+BUCKETS = 24 * 60 // BUCKET_MINUTES
+
+# Result of an earliest-arrival query: the node-ID path (None if
+# unreachable), the departure and arrival times in minutes since midnight
+# and the nodes settled
+ArrivalResult = namedtuple("ArrivalResult", ["path", "departure", "arrival", "settled"])
+
+
+def parse_departure(value=None):
+    """
+    Turn a departure time into minutes since midnight: ``None`` means now,
+    numbers are minutes, and ``"HH:MM"`` strings, ``datetime.time`` and
+    ``datetime.datetime`` values are read as clock times.
+    """
+    if value is None:
+        value = datetime.datetime.now()
+    if isinstance(value, (datetime.datetime, datetime.time)):
+        return value.hour * 60 + value.minute + value.second / 60
+    if isinstance(value, str):
+        hours, sep, minutes = value.strip().partition(":")
+        try:
+            value = int(hours) * 60 + int(minutes) if sep else float(hours)
+        except ValueError:
+            raise ValueError(f"Departure time must be HH:MM, got '{value}'") from None
+    minutes = float(value)
+    if not 0 <= minutes < 24 * 60:
+        raise ValueError(f"Departure time must be within one day, got {minutes} minutes")
+    return minutes
+
+
+def format_clock(minutes):
+    """Format minutes since midnight as ``HH:MM`` (wrapping past midnight)"""
+    minutes = int(round(minutes)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def daily_profile(peaks=(), slowest=1.0):
+    """
+    Return 96 speed factors that stay at free flow except for dips down to
+    ``slowest`` around each ``(hour, width_hours)`` peak.
+    """
+    hours = (np.arange(BUCKETS) + 0.5) * BUCKET_MINUTES / 60
+    dip = np.zeros(BUCKETS)
+    for hour, width in peaks:
+        gap = np.abs(hours - hour)
+        gap = np.minimum(gap, 24 - gap)
+        dip = np.maximum(dip, np.exp(-0.5 * (gap / width)**2))
+    return 1 - (1 - slowest) * dip
+
+
+class SpeedProfiles:
+    """
+    Deduplicated time-of-day speed profiles for the edges of a graph.
+
+    ``profiles`` is a ``(P, 96)`` float32 array of speed factors in (0, 1]
+    and ``edge_profile`` maps each CSR edge to its row.
+    """
+
+    def __init__(self, profiles, edge_profile):
+        self.profiles = np.asarray(profiles, dtype=np.float32).reshape(-1, BUCKETS)
+        self.edge_profile = np.asarray(edge_profile, dtype=np.int32)
+        if not np.all((self.profiles > 0) & (self.profiles <= 1)):
+            raise ValueError("Speed factors must be in (0, 1]")
+        if len(self.edge_profile) and (self.edge_profile.min() < 0
+                                       or self.edge_profile.max() >= len(self.profiles)):
+            raise ValueError("edge_profile refers to a missing profile")
+        self._lists = None
+
+    @classmethod
+    def from_edges(cls, edge_profiles):
+        """Build from an ``(edges, 96)`` array with one profile per edge, sharing repeated rows"""
+        edge_profiles = np.asarray(edge_profiles, dtype=np.float32).reshape(-1, BUCKETS)
+        profiles, edge_profile = np.unique(edge_profiles, axis=0, return_inverse=True)
+        return cls(profiles, edge_profile.reshape(-1))
+
+    @classmethod
+    def free_flow(cls, graph):
+        """Every edge at free-flow speed all day"""
+        return cls(np.ones((1, BUCKETS)), np.zeros(graph.num_edges, dtype=np.int32))
+
+    @classmethod
+    def by_zone(cls, graph, centre, zones):
+        """
+        Assign profiles by distance from ``centre``: ``zones`` is a list of
+        ``(radius_km, profile)`` sorted by radius, and each edge takes the
+        first zone that contains its midpoint (the last zone otherwise).
+        """
+        sources, targets, _ = graph.edges()
+        midpoints = (graph.coords[sources] + graph.coords[targets]) / 2
+        distances = haversine_pairwise(np.broadcast_to(centre, midpoints.shape), midpoints)
+        radii = np.array([radius for radius, _ in zones], dtype=np.float64)
+        zone = np.minimum(np.searchsorted(radii, distances), len(zones) - 1)
+        return cls([profile for _, profile in zones], zone)
+
+    @property
+    def nbytes(self):
+        return self.profiles.nbytes + self.edge_profile.nbytes
+
+    def profile_lists(self):
+        """Return (profile rows, edge profile) as Python lists for the search loop"""
+        if self._lists is None:
+            self._lists = (self.profiles.astype(np.float64).tolist(), self.edge_profile.tolist())
+        return self._lists
+
+
+def travel_minutes(factors, start, free_flow):
+    """
+    Minutes to cross an edge that takes ``free_flow`` minutes at full speed,
+    entering at ``start`` (minutes since midnight, may exceed one day) under
+    the speed ``factors`` of its profile.
+    """
+    if free_flow == INF:
+        return INF
+    time, remaining = start, free_flow
+    while True:
+        bucket_end = (math.floor(time / BUCKET_MINUTES) + 1) * BUCKET_MINUTES
+        factor = factors[int(time // BUCKET_MINUTES) % BUCKETS]
+        if time + remaining / factor <= bucket_end:
+            return time + remaining / factor - start
+        remaining -= (bucket_end - time) * factor
+        time = bucket_end
+
+
+def earliest_arrival(graph, profiles, source, target, departure, minutes_per_unit=1.0,
+                     guided=True):
+    """
+    Earliest arrival at ``target`` leaving ``source`` at ``departure``
+    (minutes since midnight).
+
+    Edge weights times ``minutes_per_unit`` are the free-flow travel times;
+    pass ``60 / speed`` for distance graphs. With ``guided`` the search is
+    A* on arrival times using the straight-line bound at free-flow speed.
+    Returns an :class:`ArrivalResult`.
+    """
+    offsets, targets, weights = graph.adjacency_lists()
+    rows, edge_profile = profiles.profile_lists()
+    n = len(offsets) - 1
+    if guided:
+        bound = straight_line_bound(graph, target)
+
+        def h(node):
+            return bound(node) * minutes_per_unit
+    else:
+        def h(node):
+            return 0.0
+
+    arrivals = [INF] * n
+    previous = [-1] * n
+    done = [False] * n
+    arrivals[source] = departure
+    heap = [(departure + h(source), source)]
+    settled = 0
+
+    while heap:
+        _, node = heapq.heappop(heap)
+        if done[node]:
+            continue
+        done[node] = True
+        settled += 1
+
+        time = arrivals[node]
+        if node == target:
+            return ArrivalResult(_unwind(previous, source, target), departure, time, settled)
+
+        bucket = int(time // BUCKET_MINUTES)
+        bucket_end = (bucket + 1) * BUCKET_MINUTES
+        bucket %= BUCKETS
+        for i in range(offsets[node], offsets[node + 1]):
+            neighbour = targets[i]
+            if done[neighbour]:
+                continue
+            free_flow = weights[i] * minutes_per_unit
+            factors = rows[edge_profile[i]]
+            # Almost every edge is crossed within the current bucket
+            arrival = time + free_flow / factors[bucket]
+            if arrival > bucket_end:
+                arrival = time + travel_minutes(factors, time, free_flow)
+            if arrival < arrivals[neighbour]:
+                arrivals[neighbour] = arrival
+                previous[neighbour] = node
+                heapq.heappush(heap, (arrival + h(neighbour), neighbour))
+
+    return ArrivalResult(None, departure, INF, settled)
+
+
+def as_search_result(result):
+    """View an :class:`ArrivalResult` as a :class:`SearchResult` costing the travel minutes"""
+    return SearchResult(result.path, result.arrival - result.departure, result.settled)
@@ -0,0 +1,62 @@
+"""
+Vehicle trajectories along a route, sampled at a fixed tick for animation.
+
+:func:`route_track` turns a node path into time-stamped positions in one
+pass: the vehicle moves at constant speed along each road segment, every
+junction is kept as a sample so the track follows the roads exactly, and
+extra samples are interpolated every ``tick_seconds`` in between.
+:func:`timestamped_feature` packs the result as a GeoJSON feature in the
+``properties.times`` layout used by Leaflet's TimestampedGeoJson.
+"""
+import numpy as np
+
+
+def segment_seconds(graph, path, total_minutes):
+    """
+    Seconds spent on each edge of ``path``: the trip's ``total_minutes``
+    split in proportion to the edge costs, so any ETA (free-flow, live or
+    time-of-day) is honoured.
+    """
+    costs = np.array([graph.weights[graph.edge_index(u, v)] for u, v in zip(path, path[1:])],
+                     dtype=np.float64)
+    total = costs.sum()
+    if len(costs) == 0:
+        return costs
+    if not np.isfinite(total) or total <= 0:
+        costs = np.ones(len(costs))
+        total = len(costs)
+    return costs / total * total_minutes * 60
+
+
+def route_track(coords, seconds, tick_seconds=1.0):
+    """
+    Return ``(times, positions)``: seconds since departure and (lat, lon)
+    rows, one every ``tick_seconds`` plus one at each junction of the
+    polyline ``coords``. ``seconds[i]`` is the time from ``coords[i]`` to
+    ``coords[i + 1]``.
+    """
+    if tick_seconds <= 0:
+        raise ValueError("tick_seconds must be positive")
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    junctions = np.concatenate([[0.0], np.cumsum(seconds)])
+    if len(coords) != len(junctions):
+        raise ValueError("seconds must have one entry per segment of coords")
+
+    times = np.union1d(np.arange(0.0, junctions[-1], tick_seconds), junctions)
+    # Interpolate along the segment each sample falls in, by its share of that segment's time
+    segment = np.clip(np.searchsorted(junctions, times, side="right") - 1, 0, max(len(coords) - 2, 0))
+    span = junctions[np.minimum(segment + 1, len(junctions) - 1)] - junctions[segment]
+    fraction = np.divide(times - junctions[segment], span, out=np.ones_like(times), where=span > 0)
+    ends = coords[np.minimum(segment + 1, len(coords) - 1)]
+    positions = coords[segment] + np.clip(fraction, 0, 1)[:, None] * (ends - coords[segment])
+    return times, positions
+
+
+def timestamped_feature(times, positions, start_ms=0, **properties):
+    """GeoJSON LineString feature with one epoch-millisecond ``times`` entry per position"""
+    return {
+        "type": "Feature",
+        "geometry": {"type": "LineString",
+                     "coordinates": np.round(positions[:, ::-1], 6).tolist()},
+        "properties": dict(properties, times=(start_ms + np.round(times * 1000)).astype(np.int64).tolist()),
+    }
@@ -0,0 +1,56 @@
+"""Alternative routes start with the shortest one and stay within the allowed stretch"""
+import math
+
+import pytest
+
+from benchmarks.common import grid_graph, random_geometric_graph, random_queries
+from routing import RoadGraph, RoutingEngine, alternative_routes, dijkstra
+from routing.cache import ShortestPathTree
+
+
+def trees(graph, source, target):
+    forward = ShortestPathTree(source, *dijkstra(graph, source)[:2])
+    backward = ShortestPathTree(target, *dijkstra(graph.reverse(), target)[:2])
+    return forward, backward
+
+
+def path_cost(graph, path):
+    return sum(graph.weights[graph.edge_index(u, v)] for u, v in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("make, seed", [(grid_graph, 1), (random_geometric_graph, 2), (random_geometric_graph, 3)])
+def test_first_route_is_shortest(make, seed):
+    graph = make(600, seed=seed)
+    for source, target in random_queries(graph, 40, seed=seed):
+        best = dijkstra(graph, source, target)[0][target]
+        routes = alternative_routes(*trees(graph, source, target), k=3, stretch=0.25)
+        if best == math.inf:
+            assert routes == []
+            continue
+        assert routes[0].distance == pytest.approx(best)
+        for route in routes:
+            assert (route.path[0], route.path[-1]) == (source, target)
+            assert len(set(route.path)) == len(route.path)
+            assert path_cost(graph, route.path) == pytest.approx(route.distance)
+            assert route.distance <= best * 1.25 + 1e-9
+        assert [route.distance for route in routes[1:]] == sorted(route.distance for route in routes[1:])
+
+
+def test_equal_cost_ties_keep_the_shortest_first():
+    # Two equal 3-unit routes that the trees break differently, and a 3.41
+    # detour whose plateau is nearly all of it
+    edges = [(0, 2, 1), (2, 5, 1), (5, 1, 1), (0, 4, 1), (4, 3, 1), (3, 1, 1),
+             (0, 6, 0.01), (6, 7, 3.39), (7, 1, 0.01)]
+    sources, targets, weights = zip(*edges)
+    graph = RoadGraph.from_edges([(20.79 + 0.001 * i, 76.69) for i in range(8)], sources, targets, weights)
+    routes = alternative_routes(*trees(graph, 0, 1), k=3, stretch=0.25)
+    assert [route.distance for route in routes] == pytest.approx([3.0, 3.0, 3.41])
+    assert routes[0].path in ([0, 2, 5, 1], [0, 4, 3, 1])
+
+
+def test_engine_alternatives_start_with_the_route(tmp_path):
+    engine = RoutingEngine(snapshot_file=str(tmp_path / "net.snapshot")).load()
+    route = engine.route("Bus Stand", "Civil Hospital")
+    alternatives = engine.alternatives("Bus Stand", "Civil Hospital", k=3)
+    assert alternatives[0].cost == pytest.approx(route.cost)
+    assert all(alternative.cost >= route.cost - 1e-9 for alternative in alternatives)
@@ -0,0 +1,96 @@
+"""Batch query parsing and answering, and engine snapshot reuse"""
+import io
+import json
+import os
+
+import pytest
+
+from routing import RoutingEngine, load_snapshot
+from routing.snapshot import read_snapshot_header
+from routing.batch import answer, json_safe, read_queries, run_batch
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return RoutingEngine(snapshot_file=str(tmp_path / "net.snapshot")).load()
+
+
+def test_read_csv():
+    lines = io.StringIO("id,start,end,mode\n1,Bus Stand,Civil Hospital,astar\n2,3,7,\n")
+    assert list(read_queries(lines, "csv")) == [
+        {"id": "1", "start": "Bus Stand", "end": "Civil Hospital", "mode": "astar"},
+        {"id": "2", "start": "3", "end": "7", "mode": ""},
+    ]
+
+
+def test_read_jsonl_reports_bad_lines():
+    lines = ['{"id": 1, "start": "Bus Stand", "end": "Civil Hospital"}\n', "\n",
+             '{"id": 2, "start":\n', "[1, 2]\n", '{"id": 3, "start": [20.79, 76.70], "end": 4}\n']
+    queries = list(read_queries(lines, "jsonl"))
+    assert [query.get("id") for query in queries] == [1, None, None, 3]
+    assert queries[1]["error"].startswith("Line 3: invalid JSON")
+    assert queries[2]["error"] == "Line 4: expected a JSON object"
+
+
+def test_answer(engine):
+    by_name = answer(engine, {"id": "a", "start": "Bus Stand", "end": "Civil Hospital"})
+    assert by_name["distance_km"] > 0 and "error" not in by_name
+
+    # CSV fields are strings; all-digit places are node IDs
+    node = engine.registry.node("Civil Hospital")
+    by_node = answer(engine, {"id": "b", "start": "Bus Stand", "end": str(node)}, mode="astar")
+    assert by_node["cost"] == pytest.approx(by_name["cost"])
+
+    assert answer(engine, {"id": "c", "start": "Nowhere", "end": "Bus Stand"})["error"]
+    assert answer(engine, {"id": "d", "start": "Bus Stand"})["error"] == "Query needs a start and an end"
+    assert answer(engine, {"error": "Line 9: expected a JSON object"})["error"] == "Line 9: expected a JSON object"
+
+
+def test_run_batch_keeps_order(engine):
+    names = [name for name, _ in engine.locations]
+    queries = [{"id": i, "start": names[i % len(names)], "end": names[(i * 3 + 1) % len(names)]}
+               for i in range(40)]
+    serial = [json_safe(result) for result in run_batch(engine, queries)]
+    pooled = [json_safe(result) for result in run_batch(engine, queries, processes=2, chunk_size=7)]
+    assert [result["id"] for result in pooled] == list(range(40))
+    assert json.dumps(pooled) == json.dumps(serial)
+
+
+def test_snapshot_reuse(tmp_path):
+    path = str(tmp_path / "net.snapshot")
+    built = RoutingEngine(snapshot_file=path).load()
+    source = built.network_source()
+    modified = os.stat(path).st_mtime_ns
+
+    # A matching source memory-maps the snapshot instead of rebuilding
+    reloaded = RoutingEngine(snapshot_file=path).load()
+    assert reloaded.graph.fingerprint() == built.graph.fingerprint()
+    assert not reloaded.graph.weights.flags.writeable
+
+    # Engines opened on a snapshot as it is keep its source and never write it back
+    opened = RoutingEngine.from_snapshot(path, seed=7)
+    assert opened.network_source() == source
+    opened.route("Bus Stand", "Civil Hospital", "ch")
+    assert os.stat(path).st_mtime_ns == modified
+    assert load_snapshot(path).source == source
+
+
+def test_pooled_hierarchy_from_read_only_engine(engine):
+    opened = RoutingEngine.from_snapshot(engine.snapshot_file)
+    names = [name for name, _ in opened.locations]
+    queries = [{"id": i, "start": names[i], "end": names[-1 - i]} for i in range(len(names))]
+    serial = [result["cost"] for result in run_batch(engine, queries)]
+    pooled = [result["cost"] for result in run_batch(opened, queries, mode="ch", processes=2)]
+    assert pooled == pytest.approx(serial)
+    assert "ch_rank" not in read_snapshot_header(engine.snapshot_file)["arrays"]
+
+
+def test_wrong_field_types_fail_one_line(engine):
+    lines = ['{"id": 1, "start": "Bus Stand", "end": "Civil Hospital", "mode": "td", "departure": [1]}\n',
+             '{"id": 2, "start": "Bus Stand", "end": "Civil Hospital", "mode": ["astar"]}\n',
+             '{"id": 3, "start": {"lat": 20.79}, "end": "Civil Hospital"}\n',
+             '{"id": 4, "start": "Bus Stand", "end": "Civil Hospital"}\n']
+    results = list(run_batch(engine, read_queries(lines, "jsonl")))
+    assert [result["id"] for result in results] == [1, 2, 3, 4]
+    assert all(result["error"] for result in results[:3])
+    assert "error" not in results[3] and results[3]["distance_km"] > 0
@@ -0,0 +1,86 @@
+"""Route cache counters: hits, misses, evictions and what a weight change invalidates"""
+import math
+
+import pytest
+
+from benchmarks.common import grid_graph
+from routing import RouteCache, shortest_path
+
+
+@pytest.fixture
+def graph():
+    return grid_graph(400, seed=6)
+
+
+class Search:
+    """A shortest_path call for one query that counts how often the cache runs it"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.calls = 0
+
+    def __call__(self, cache, source, target):
+        def search():
+            self.calls += 1
+            return shortest_path(self.graph, source, target)
+        return cache.route(self.graph, source, target, "dijkstra", search)
+
+
+def test_hits_and_misses(graph):
+    cache, search = RouteCache(maxsize=8), Search(graph)
+    first = search(cache, 0, 399)
+    assert search(cache, 0, 399) is first
+    assert (cache.hits, cache.misses, search.calls) == (1, 1, 1)
+    assert first.cost == pytest.approx(shortest_path(graph, 0, 399).distance)
+
+    # A cached tree answers any query from its source without a search
+    cache.tree(graph, 10)
+    assert search(cache, 10, 250).cost == pytest.approx(shortest_path(graph, 10, 250).distance)
+    assert (cache.hits, cache.misses, search.calls) == (2, 2, 1)
+    assert cache.stats() == {"hits": 2, "misses": 2, "evictions": 0, "invalidations": 0, "repairs": 0,
+                             "size": 3, "maxsize": 8}
+
+
+def test_least_recently_used_is_evicted(graph):
+    cache, search = RouteCache(maxsize=2), Search(graph)
+    search(cache, 0, 1)
+    search(cache, 0, 2)
+    search(cache, 0, 1)
+    search(cache, 0, 3)
+    assert cache.evictions == 1 and len(cache) == 2
+    search(cache, 0, 1)
+    search(cache, 0, 2)
+    assert search.calls == 4 and cache.misses == 4 and cache.hits == 2
+
+
+def test_new_version_misses(graph):
+    cache, search = RouteCache(), Search(graph)
+    search(cache, 0, 399)
+    graph.invalidate()
+    search(cache, 0, 399)
+    assert (cache.hits, cache.misses, search.calls) == (0, 2, 2)
+
+
+def test_weight_change_invalidates_only_affected_routes(graph):
+    cache, search = RouteCache(), Search(graph)
+    closed = search(cache, 0, 399)
+    untouched = search(cache, 380, 399)
+    tree = cache.tree(graph, 0)
+    edge = graph.edge_index(*closed.path[:2])
+    assert edge not in {graph.edge_index(u, v) for u, v in zip(untouched.path, untouched.path[1:])}
+
+    previous = graph.set_weights([edge], [math.inf])
+    cache.weights_changed(graph, [edge], previous)
+    assert cache.invalidations == 1 and cache.repairs == 1
+    assert cache.tree(graph, 0) is tree
+
+    calls = search.calls
+    assert search(cache, 380, 399) is untouched
+    rerouted = search(cache, 0, 399)
+    # The repaired tree answers the closed route without a new search
+    assert search.calls == calls
+    assert rerouted.cost == pytest.approx(shortest_path(graph, 0, 399).distance)
+    assert rerouted.path[:2] != closed.path[:2]
+
+    cache.clear()
+    assert len(cache) == 0 and cache.invalidations == 1 + 3
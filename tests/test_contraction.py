@@ -0,0 +1,60 @@
+"""The contraction hierarchy must answer like Dijkstra, before and after saving it"""
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.common import grid_graph, random_geometric_graph, random_queries
+from routing import ContractionHierarchy, RoutingEngine, dijkstra, load_snapshot
+from routing.snapshot import read_snapshot_header
+
+
+@pytest.mark.parametrize("make, nodes, seed", [(grid_graph, 400, 1), (random_geometric_graph, 500, 2),
+                                               (random_geometric_graph, 800, 3)])
+def test_matches_dijkstra(make, nodes, seed):
+    graph = make(nodes, seed=seed)
+    hierarchy = ContractionHierarchy.build(graph)
+    for source, target in random_queries(graph, 60, seed=seed):
+        expected = dijkstra(graph, source, target)[0][target]
+        result = hierarchy.shortest_path(source, target)
+        if expected == math.inf:
+            assert result.path is None
+            continue
+        assert result.distance == pytest.approx(expected)
+        assert (result.path[0], result.path[-1]) == (source, target)
+        assert graph.path_length(result.path) == pytest.approx(expected)
+
+
+def test_save_load_round_trip(tmp_path):
+    graph = random_geometric_graph(300, seed=4)
+    hierarchy = ContractionHierarchy.build(graph)
+    path = tmp_path / "net.ch.npz"
+    hierarchy.save(path)
+
+    loaded = ContractionHierarchy.load(path)
+    assert loaded.matches(graph)
+    np.testing.assert_array_equal(loaded.rank, hierarchy.rank)
+    for ours, theirs in zip(loaded.up + loaded.down, hierarchy.up + hierarchy.down):
+        np.testing.assert_array_equal(ours, theirs)
+    for source, target in random_queries(graph, 20, seed=4):
+        assert loaded.shortest_path(source, target) == hierarchy.shortest_path(source, target)
+
+    graph.set_weights([0], [graph.weights[0] * 2])
+    assert not loaded.matches(graph)
+
+
+def test_engine_embeds_hierarchy_in_snapshot(tmp_path):
+    path = str(tmp_path / "net.snapshot")
+    engine = RoutingEngine(snapshot_file=path).load()
+    assert "ch_rank" not in read_snapshot_header(path)["arrays"]
+
+    hierarchy = engine.contraction_hierarchy()
+    assert "ch_rank" in read_snapshot_header(path)["arrays"]
+    snapshot = load_snapshot(path)
+    assert snapshot.hierarchy.matches(snapshot.graph)
+    np.testing.assert_array_equal(snapshot.hierarchy.rank, hierarchy.rank)
+
+    reloaded = RoutingEngine(snapshot_file=path).load()
+    assert reloaded.hierarchy is not None
+    assert reloaded.route("Bus Stand", "Civil Hospital", "ch").cost == pytest.approx(
+        engine.route("Bus Stand", "Civil Hospital", "dijkstra").cost)
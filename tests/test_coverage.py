@@ -0,0 +1,86 @@
+"""Coverage must equal the nearest of per-facility searches; isochrones and placement build on it"""
+import numpy as np
+import pytest
+
+from benchmarks.common import random_geometric_graph
+from routing import CoveragePlanner, coverage, dijkstra, isochrones
+from routing.coverage import covered_share, reach_within
+
+MINUTES_PER_KM = 60 / 40
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return random_geometric_graph(700, seed=9)
+
+
+def per_source_minutes(graph, facilities):
+    """(facilities, nodes) array of minutes from each facility by its own search"""
+    return np.array([dijkstra(graph, facility)[0] for facility in facilities]) * MINUTES_PER_KM
+
+
+@pytest.mark.parametrize("facilities", [[0], [3, 250, 600], [10, 11, 400, 401, 699]])
+def test_coverage_is_nearest_facility(graph, facilities):
+    result = coverage(graph, facilities, MINUTES_PER_KM)
+    expected = per_source_minutes(graph, facilities)
+    np.testing.assert_allclose(result.minutes, expected.min(axis=0))
+    reached = np.isfinite(result.minutes)
+    assert (result.nearest[~reached] == -1).all()
+    nodes = np.nonzero(reached)[0]
+    np.testing.assert_allclose(expected[result.nearest[nodes], nodes], result.minutes[nodes])
+
+
+def test_reach_within_is_a_bounded_dijkstra(graph):
+    distances = dijkstra(graph, 42)[0]
+    nodes, costs = reach_within(graph, 42, 1.5)
+    np.testing.assert_array_equal(np.sort(nodes), np.nonzero(np.asarray(distances) <= 1.5)[0])
+    np.testing.assert_allclose(costs, np.asarray(distances)[nodes])
+
+
+def test_greedy_placement(graph):
+    threshold = 3.0
+    facilities = [0, 350]
+    planner = CoveragePlanner(graph, facilities, MINUTES_PER_KM)
+    candidates = list(range(0, graph.num_nodes, 7))
+    start = planner.share(threshold)
+    best = max(planner.gain(candidate, threshold) for candidate in candidates)
+    searches = planner.searches
+
+    picks = planner.greedy(candidates, 3, threshold)
+    assert picks and picks[0].gain == best
+    assert [pick.gain for pick in picks] == sorted((pick.gain for pick in picks), reverse=True)
+    # Every candidate was already searched while scoring the first round
+    assert planner.searches == searches
+
+    # The planner's running coverage agrees with a fresh search from every facility
+    fresh = coverage(graph, facilities + [pick.candidate for pick in picks], MINUTES_PER_KM)
+    assert planner.share(threshold) == pytest.approx(covered_share(fresh.minutes, threshold))
+    assert picks[-1].share == pytest.approx(planner.share(threshold))
+    gained = sum(pick.gain for pick in picks) / graph.num_nodes
+    assert planner.share(threshold) == pytest.approx(start + gained)
+
+
+def inside(point, rings):
+    """Even-odd test over every ring, as the map fills them"""
+    lat, lon = point
+    crossings = 0
+    for ring in rings:
+        for (lat1, lon1), (lat2, lon2) in zip(ring, ring[1:]):
+            if (lon1 > lon) != (lon2 > lon) and lat < lat1 + (lon - lon1) * (lat2 - lat1) / (lon2 - lon1):
+                crossings += 1
+    return crossings % 2 == 1
+
+
+def test_isochrones_contain_the_reached_nodes(graph):
+    result = coverage(graph, [5, 500], MINUTES_PER_KM)
+    areas = isochrones(graph, result.minutes, [2.0, 5.0], MINUTES_PER_KM)
+    assert [threshold for threshold, _ in areas] == [2.0, 5.0]
+
+    enclosed = []
+    for threshold, rings in areas:
+        assert rings and all(ring[0] == ring[-1] for ring in rings)
+        flags = np.array([inside(point, rings) for point in graph.coords.tolist()])
+        assert flags[result.minutes <= threshold].all()
+        enclosed.append(flags)
+    # The wider isochrone covers everything the narrower one does
+    assert (enclosed[1] | ~enclosed[0]).all()
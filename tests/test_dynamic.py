@@ -0,0 +1,48 @@
+"""Repaired shortest-path trees must equal a fresh search after every batch of edge updates"""
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.common import grid_graph, random_geometric_graph
+from routing import affected_routes, dijkstra, repair_tree, route_result, shortest_path
+from routing.cache import ShortestPathTree
+
+
+def assert_tree_valid(graph, tree):
+    expected, _, _ = dijkstra(graph, tree.source)
+    assert tree.distances == pytest.approx(expected)
+    for node, parent in enumerate(tree.previous):
+        if parent >= 0:
+            edge = graph.edge_index(parent, node)
+            assert tree.distances[node] == pytest.approx(tree.distances[parent] + graph.weights[edge])
+        elif node != tree.source:
+            assert tree.distances[node] == math.inf
+
+
+@pytest.mark.parametrize("make, seed", [(grid_graph, 1), (random_geometric_graph, 2), (random_geometric_graph, 3)])
+def test_repair_matches_recompute(make, seed):
+    graph = make(900, seed=seed)
+    rng = np.random.default_rng(seed)
+    distances, previous, _ = dijkstra(graph, 0)
+    tree = ShortestPathTree(0, distances, previous)
+
+    for _ in range(8):
+        edges = rng.choice(graph.num_edges, 25, replace=False)
+        # A mix of congestion, clearing traffic and closures
+        factors = rng.choice([0.5, 2.0, math.inf], len(edges), p=[0.4, 0.4, 0.2])
+        previous_weights = graph.set_weights(edges, graph.lengths[edges] * factors)
+        repair_tree(graph, tree, edges, previous_weights)
+        assert_tree_valid(graph, tree)
+
+
+def test_affected_routes_flags_closed_route():
+    graph = grid_graph(400, seed=4)
+    route = route_result(graph, shortest_path(graph, 0, 399))
+    other = route_result(graph, shortest_path(graph, 19, 380))
+    closed = graph.edge_index(route.path[5], route.path[6])
+    previous_weights = graph.set_weights([closed], [math.inf])
+    flagged = affected_routes(graph, {"a": route, "b": other}, [closed], previous_weights)
+    # A closure only slows down routes that use the closed road
+    uses_closed = (route.path[5], route.path[6]) in set(zip(other.path, other.path[1:]))
+    assert sorted(flagged) == (["a", "b"] if uses_closed else ["a"])
@@ -0,0 +1,56 @@
+"""Fleet simulation: dispatch rules and event order"""
+import numpy as np
+import pytest
+
+from benchmarks.common import grid_graph
+from routing import FleetSimulator, RoadGraph, RoutingEngine, fleet_summary
+from routing.fleet import poisson_calls
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """Two towns of 400 junctions with no road between them"""
+    town = grid_graph(400, seed=6)
+    sources, targets, weights = town.edges()
+    n = town.num_nodes
+    coords = np.vstack([town.coords, town.coords + [0.5, 0.0]])
+    graph = RoadGraph.from_edges(coords, np.concatenate([sources, sources + n]),
+                                 np.concatenate([targets, targets + n]),
+                                 np.concatenate([weights, weights]))
+    engine = RoutingEngine(locations=[])
+    engine.set_graph(graph)
+    return engine
+
+
+def run(engine, stations, calls=300, hours=3, seed=1):
+    simulator = FleetSimulator(engine, stations, hospitals=[210, 610], seed=seed)
+    call_minutes, call_nodes = poisson_calls(engine.graph.num_nodes, calls, hours=hours, seed=seed)
+    return simulator.run(call_minutes, call_nodes), call_nodes
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_waiting_calls_are_served_oldest_first(engine, seed):
+    # Units only reach calls in their own town, so a freed unit skips the other town's calls
+    report, call_nodes = run(engine, [0, 399, 400, 799, 5], seed=seed)
+    assert np.isnan(report.wait_minutes).sum() == 0
+    assert (report.wait_minutes > 0).sum() > 50
+    dispatched = report.call_minutes + report.wait_minutes
+    for town in (call_nodes < 400, call_nodes >= 400):
+        waited = town & (report.wait_minutes > 0)
+        order = np.argsort(report.call_minutes[waited], kind="stable")
+        assert np.all(np.diff(dispatched[waited][order]) >= 0)
+
+
+def test_units_stay_in_their_town(engine):
+    report, call_nodes = run(engine, [0, 399, 400, 799])
+    town_of_unit = np.array([0, 0, 1, 1])
+    assert np.array_equal(town_of_unit[report.unit], (call_nodes >= 400).astype(int))
+    assert np.all(report.response_minutes >= report.wait_minutes)
+    assert np.all(report.busy_minutes <= report.end_minutes)
+
+
+def test_summary(engine):
+    report, _ = run(engine, [0, 399, 400, 799], calls=20, hours=24)
+    summary = fleet_summary(report)
+    assert summary["served"] == 20
+    assert 0 < summary["utilisation"] <= 1
@@ -0,0 +1,136 @@
+"""GPS fix parsing, HMM map matching and deviation re-routing"""
+import itertools
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from benchmarks.common import grid_graph
+from routing import GpsTracker, MapMatcher, RoutingEngine
+from routing.gps import Fix, main, parse_fix, read_fixes, replay_fixes, socket_fixes
+
+SIDE = 50
+
+
+@pytest.fixture
+def engine():
+    engine = RoutingEngine()
+    engine.set_graph(grid_graph(SIDE * SIDE, seed=2))
+    return engine
+
+
+def node(row, col):
+    return row * SIDE + col
+
+
+def drive(engine, path):
+    """(path, minutes) for a trip along ``path`` at the engine's speed"""
+    return path, engine.graph.path_length(path) / engine.speed_kmh * 60
+
+
+def test_parse_fix():
+    assert parse_fix("amb1,100.5,20.79,76.69") == Fix("amb1", 100.5, 20.79, 76.69)
+    assert parse_fix('{"unit": 7, "timestamp": 3, "lat": 20.7, "lon": 76.6}') == Fix("7", 3.0, 20.7, 76.6)
+    assert parse_fix("unit,timestamp,lat,lon") is None
+    assert parse_fix("  \n") is None
+    with pytest.raises(ValueError):
+        parse_fix("amb1,soon,20.79,76.69")
+
+    errors = []
+    fixes = list(read_fixes(["a,1,20.7,76.6\n", "garbage\n", "b,2,20.8,76.7\n"],
+                            on_error=lambda line, e: errors.append(line)))
+    assert [fix.unit for fix in fixes] == ["a", "b"]
+    assert errors == ["garbage\n"]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def connect(port):
+    for _ in range(100):
+        try:
+            return socket.create_connection(("127.0.0.1", port))
+        except ConnectionRefusedError:
+            time.sleep(0.02)
+    raise ConnectionRefusedError(port)
+
+
+def test_socket_survives_a_reset_client():
+    port = free_port()
+    received = []
+    fixes = socket_fixes("127.0.0.1", port)
+    reader = threading.Thread(target=lambda: received.extend(itertools.islice(fixes, 2)), daemon=True)
+    reader.start()
+
+    dropped, kept = connect(port), connect(port)
+    dropped.sendall(b"a,1,20.79,76.69\na,2,20.7")
+    for _ in range(100):
+        if received:
+            break
+        time.sleep(0.02)
+    # Close with a TCP reset rather than a clean shutdown
+    dropped.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    dropped.close()
+    time.sleep(0.1)
+    kept.sendall(b"b,3,20.80,76.70\n")
+    reader.join(timeout=5)
+    kept.close()
+    assert [fix.unit for fix in received] == ["a", "b"]
+    fixes.close()
+
+
+def test_cli_rejects_bad_destinations(tmp_path, capsys):
+    snapshot = str(tmp_path / "net.snapshot")
+    for destination in ["amb1", "amb1=Nowhere Street"]:
+        with pytest.raises(SystemExit):
+            main(["--snapshot", snapshot, "--destination", destination, "/dev/null"])
+        assert "--destination" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("noise_m", [0.0, 5.0])
+def test_matcher_follows_the_driven_roads(engine, noise_m):
+    path = engine.route(node(5, 5), node(30, 40), "astar").path
+    roads = set(zip(path, path[1:]))
+    matcher = MapMatcher(engine.graph, engine.registry)
+    fixes = list(replay_fixes(engine.graph, {"amb": drive(engine, path)}, 1.0, noise_m, seed=3))
+    errors = [matcher.match(fix).error_m for fix in fixes]
+    assert max(errors) < 4 * noise_m + 10
+
+    # The decoded window lies on the driven roads, in driving direction; a
+    # fix at a junction may also match the first metres of a road leaving it
+    decoded = matcher.recent("amb", len(fixes))
+    assert len(decoded) == min(len(fixes), matcher.window)
+    for edge, u, v, fraction, _ in decoded:
+        assert (u, v) in roads or (u in path and fraction * engine.graph.lengths[edge] < 0.01)
+    matcher.forget("amb")
+    assert matcher.recent("amb", 3) == []
+
+
+def test_tracker_reroutes_only_deviating_units(engine):
+    target = node(25, 25)
+    planned = engine.route(node(25, 5), target, "astar")
+    tracker = GpsTracker(engine)
+    tracker.assign("kept", planned)
+    tracker.assign("left", planned)
+
+    # "left" turns off at the route's midpoint and drives two blocks away first
+    middle = planned.path[len(planned.path) // 2]
+    row, col = divmod(middle, SIDE)
+    detour = engine.route(middle, node(row + 8, col), "astar").path
+    back = engine.route(detour[-1], target, "astar").path
+    trips = {"kept": drive(engine, planned.path),
+             "left": drive(engine, planned.path[:len(planned.path) // 2] + detour + back[1:])}
+
+    rerouted = {}
+    for update in tracker.run(replay_fixes(engine.graph, trips, 1.0, 5.0, seed=4)):
+        if update.route is not None:
+            rerouted.setdefault(update.match.unit, update.route)
+    assert list(rerouted) == ["left"]
+    assert rerouted["left"].path[-1] == target
+    assert tracker.routes["left"]["route"] is not planned
+    assert tracker.routes["kept"]["route"] is planned
@@ -0,0 +1,30 @@
+"""The base page is keyed on what it draws; weight changes only reach the overlay"""
+import math
+
+from benchmarks.common import grid_graph
+from routing.mapview import MapView
+
+
+def test_fingerprint_follows_version():
+    graph = grid_graph(100, seed=1)
+    before = graph.fingerprint()
+    assert graph.fingerprint() is before
+    graph.set_weights([0], [math.inf])
+    assert graph.fingerprint() != before
+
+
+def test_base_page_survives_weight_changes(tmp_path):
+    graph = grid_graph(100, seed=1)
+    view = MapView(directory=str(tmp_path))
+    path = view.base(graph, [])
+    assert view.render_seconds > 0
+
+    topology = graph.topology_fingerprint()
+    graph.set_weights([0, 1], graph.weights[[0, 1]] * 3)
+    assert graph.topology_fingerprint() == topology
+    assert view.base(graph, []) == path
+    assert view.render_seconds == 0.0
+
+    moved = grid_graph(100, seed=1)
+    moved.coords[0] += 0.001
+    assert view.base_key(moved, []) != view.base_key(graph, [])
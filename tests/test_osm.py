@@ -0,0 +1,172 @@
+"""Road files must load into the same directed, timed graph whatever their format"""
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from routing import haversine_distance
+from routing.osm import load_road_file, parse_maxspeed
+
+# Five nodes along a street; node 5 is on no drivable way and must be dropped
+NODES = [(1, 20.7900, 76.6900), (2, 20.7910, 76.6905), (3, 20.7925, 76.6912),
+         (4, 20.7931, 76.6930), (5, 20.7950, 76.6950)]
+WAYS = [
+    (10, [1, 2], {"highway": "residential"}),
+    (11, [2, 3], {"highway": "primary", "oneway": "yes", "maxspeed": "30 mph"}),
+    (12, [3, 4], {"highway": "secondary", "oneway": "-1", "maxspeed": "60"}),
+    (13, [1, 4, 5], {"highway": "footway"}),
+    (14, [2, 4], {"highway": "service", "access": "private"}),
+]
+# (from, to, km/h) for every edge the ways above allow
+EXPECTED = [(1, 2, 25), (2, 1, 25), (2, 3, 30 * 1.609344), (4, 3, 60)]
+
+
+def assert_expected(graph):
+    coords = {node: (lat, lon) for node, lat, lon in NODES}
+    assert graph.num_nodes == 4 and graph.num_edges == len(EXPECTED)
+    assert graph.metric == "time"
+    # Nodes keep the order of their OSM IDs, so node ``i`` is ID ``i + 1``
+    np.testing.assert_allclose(graph.coords, [coords[i] for i in range(1, 5)])
+    for u, v, speed in EXPECTED:
+        edge = graph.edge_index(u - 1, v - 1)
+        km = haversine_distance(coords[u], coords[v])
+        assert graph.lengths[edge] == pytest.approx(km)
+        assert graph.weights[edge] == pytest.approx(km / speed * 60)
+    with pytest.raises(KeyError):
+        graph.edge_index(3 - 1, 2 - 1)
+
+
+@pytest.mark.parametrize("value, expected", [("50", 50), ("30 mph", 30 * 1.609344), ("40 km/h", 40),
+                                             ("40;60", 40), ("none", 25), ("0", 25), (None, 25)])
+def test_parse_maxspeed(value, expected):
+    assert parse_maxspeed(value, 25) == pytest.approx(expected)
+
+
+def test_osm_xml(tmp_path):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    lines += [f'  <node id="{node}" lat="{lat}" lon="{lon}"/>' for node, lat, lon in NODES]
+    for way, refs, tags in WAYS:
+        lines.append(f'  <way id="{way}">')
+        lines += [f'    <nd ref="{ref}"/>' for ref in refs]
+        lines += [f'    <tag k="{k}" v="{v}"/>' for k, v in tags.items()]
+        lines.append("  </way>")
+    lines += ['  <relation id="20"><member type="way" ref="10" role=""/></relation>', "</osm>"]
+    path = tmp_path / "town.osm"
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+    fractions = []
+    assert_expected(load_road_file(str(path), progress=fractions.append))
+    assert fractions[-1] == 1.0
+
+
+def test_graphml(tmp_path):
+    path = tmp_path / "town.graphml"
+    path.write_text("""<?xml version="1.0" encoding="utf-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="d4" for="node" attr.name="y" attr.type="string"/>
+  <key id="d5" for="node" attr.name="x" attr.type="string"/>
+  <key id="d9" for="edge" attr.name="highway" attr.type="string"/>
+  <key id="d10" for="edge" attr.name="maxspeed" attr.type="string"/>
+  <key id="d11" for="edge" attr.name="length" attr.type="string"/>
+  <key id="d12" for="edge" attr.name="speed_kph" attr.type="string"/>
+  <key id="d13" for="edge" attr.name="travel_time" attr.type="string"/>
+  <graph edgedefault="directed">
+    <node id="1"><data key="d4">20.79</data><data key="d5">76.69</data></node>
+    <node id="2"><data key="d4">20.80</data><data key="d5">76.69</data></node>
+    <node id="3"><data key="d4">20.80</data><data key="d5">76.70</data></node>
+    <edge source="1" target="2"><data key="d9">primary</data><data key="d11">1200.0</data>
+      <data key="d12">40.0</data><data key="d13">120.0</data></edge>
+    <edge source="2" target="3"><data key="d9">residential</data><data key="d10">30</data>
+      <data key="d11">1500.0</data></edge>
+    <edge source="3" target="2"><data key="d9">['secondary', 'tertiary']</data></edge>
+    <edge source="3" target="9"><data key="d9">primary</data></edge>
+  </graph>
+</graphml>
+""", encoding="utf-8")
+
+    graph = load_road_file(str(path))
+    assert graph.num_nodes == 3 and graph.num_edges == 3
+    # Stored length and travel time win over the speed
+    assert graph.lengths[graph.edge_index(0, 1)] == pytest.approx(1.2)
+    assert graph.weights[graph.edge_index(0, 1)] == pytest.approx(2.0)
+    # Length but no travel time: minutes from the maxspeed tag
+    assert graph.weights[graph.edge_index(1, 2)] == pytest.approx(1.5 / 30 * 60)
+    # Neither: straight-line length at the first highway class's default speed
+    km = haversine_distance((20.80, 76.70), (20.80, 76.69))
+    assert graph.lengths[graph.edge_index(2, 1)] == pytest.approx(km)
+    assert graph.weights[graph.edge_index(2, 1)] == pytest.approx(km / 40 * 60)
+    with pytest.raises(KeyError):
+        graph.edge_index(1, 0)
+
+
+def varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def field(number, value):
+    """Encode a varint (int) or length-delimited (bytes) protobuf field"""
+    if isinstance(value, int):
+        return varint(number << 3) + varint(value)
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def packed(values, signed=False, delta=False):
+    if delta:
+        values = [b - a for a, b in zip([0] + values, values)]
+    return b"".join(varint(zigzag(v) if signed else v) for v in values)
+
+
+def file_block(blob_type, data, compress):
+    blob = (field(2, len(data)) + field(3, zlib.compress(data))) if compress else field(1, data)
+    header = field(1, blob_type.encode("ascii")) + field(3, len(blob))
+    return struct.pack(">I", len(header)) + header + blob
+
+
+def pbf_bytes(compress):
+    """A header block, then dense nodes and ways in one data block at the default granularity"""
+    strings = [""]
+    for _, _, tags in WAYS:
+        for text in (s for item in tags.items() for s in item):
+            if text not in strings:
+                strings.append(text)
+
+    ids = [node for node, _, _ in NODES]
+    # Degrees in units of 100 nanodegrees, as granularity 100 stores them
+    lats = [round(lat * 1e7) for _, lat, _ in NODES]
+    lons = [round(lon * 1e7) for _, _, lon in NODES]
+    dense = (field(1, packed(ids, signed=True, delta=True)) + field(8, packed(lats, signed=True, delta=True))
+             + field(9, packed(lons, signed=True, delta=True)))
+    ways = b"".join(
+        field(3, field(1, way) + field(2, packed([strings.index(k) for k in tags]))
+              + field(3, packed([strings.index(v) for v in tags.values()]))
+              + field(8, packed(refs, signed=True, delta=True)))
+        for way, refs, tags in WAYS)
+    block = (field(1, b"".join(field(1, s.encode("utf-8")) for s in strings))
+             + field(2, field(2, dense)) + field(2, ways))
+    header = field(4, b"OsmSchema-V0.6") + field(4, b"DenseNodes")
+    return file_block("OSMHeader", header, compress) + file_block("OSMData", block, compress)
+
+
+@pytest.mark.parametrize("compress", [False, True], ids=["raw", "zlib"])
+def test_pbf(tmp_path, compress):
+    path = tmp_path / "town.osm.pbf"
+    path.write_bytes(pbf_bytes(compress))
+    assert_expected(load_road_file(str(path)))
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported road file type"):
+        load_road_file(str(tmp_path / "town.shp"))
@@ -0,0 +1,82 @@
+"""Registry lookups and snapping must agree with brute force over the graph"""
+import numpy as np
+import pytest
+
+from benchmarks.common import grid_graph, random_geometric_graph
+from routing import LocationRegistry, haversine_distance
+from routing.graph import haversine_one_to_many
+
+
+def brute_force_road(graph, coord):
+    """Planar distance to the nearest point on any road, as the registry measures it"""
+    registry = LocationRegistry(graph)
+    project = registry.node_index.project
+    point = project(coord)[0]
+    sources, targets, _ = graph.edges()
+    a, b = project(graph.coords[sources]), project(graph.coords[targets])
+    ab = b - a
+    fraction = np.clip(((point - a) * ab).sum(axis=1) / np.maximum((ab**2).sum(axis=1), 1e-18), 0, 1)
+    return np.sqrt(((a + ab * fraction[:, None] - point)**2).sum(axis=1)).min()
+
+
+def query_points(graph, count, seed):
+    rng = np.random.default_rng(seed)
+    low, high = graph.coords.min(axis=0), graph.coords.max(axis=0)
+    return [tuple(point) for point in rng.uniform(low, high, size=(count, 2)).tolist()]
+
+
+@pytest.fixture(scope="module", params=[(grid_graph, 1), (random_geometric_graph, 2)])
+def graph(request):
+    make, seed = request.param
+    return make(900, seed=seed)
+
+
+def test_names(graph):
+    locations = [(f"Place {i}", tuple(graph.coords[i * 7].tolist())) for i in range(20)]
+    registry = LocationRegistry(graph, locations)
+    assert len(registry) == 20 and "Place 3" in registry and "Nowhere" not in registry
+    assert registry.node("Place 3") == 21
+    assert registry.location_coords("Place 3") == locations[3][1]
+    assert registry.name_at(21) == "Place 3" and registry.name_at(22, "none") == "none"
+    assert registry.resolve("Place 19") == 133
+    with pytest.raises(KeyError, match="Unknown location: Nowhere"):
+        registry.node("Nowhere")
+    with pytest.raises(ValueError, match="unique"):
+        LocationRegistry(graph, locations + [locations[0]])
+
+
+def test_snap_to_nearest_node(graph):
+    registry = LocationRegistry(graph)
+    for point in query_points(graph, 50, seed=3):
+        node = registry.snap(point)
+        assert haversine_distance(point, graph.coords[node]) == pytest.approx(
+            haversine_one_to_many(point, graph.coords).min(), abs=1e-6)
+
+
+def test_snap_to_edge(graph):
+    registry = LocationRegistry(graph)
+    for point in query_points(graph, 50, seed=4):
+        snap = registry.snap_to_edge(point)
+        sources, targets, _, distances = registry.road_candidates(point)
+        assert distances[0] == pytest.approx(brute_force_road(graph, point), abs=1e-9)
+        assert (snap.source, snap.target) == (sources[0], targets[0])
+        assert 0 <= snap.fraction <= 1
+        expected = graph.coords[snap.source] * (1 - snap.fraction) + graph.coords[snap.target] * snap.fraction
+        np.testing.assert_allclose(snap.coords, expected)
+        assert snap.distance_km == pytest.approx(haversine_distance(point, snap.coords))
+
+        # Coordinates resolve to the closer end of the snapped road
+        assert registry.resolve(point) == (snap.source if snap.fraction <= 0.5 else snap.target)
+
+
+def test_point_on_a_road_snaps_onto_it():
+    graph = grid_graph(400, seed=5)
+    registry = LocationRegistry(graph)
+    sources, targets, _ = graph.edges()
+    for edge in range(0, graph.num_edges, 97):
+        u, v = int(sources[edge]), int(targets[edge])
+        point = tuple((graph.coords[u] * 0.3 + graph.coords[v] * 0.7).tolist())
+        snap = registry.snap_to_edge(point)
+        assert snap.distance_km == pytest.approx(0, abs=1e-6)
+        assert {snap.source, snap.target} == {u, v}
+        assert registry.resolve(point) == v
@@ -0,0 +1,47 @@
+"""Every search mode, and the contraction hierarchy, must agree with plain Dijkstra"""
+import math
+
+import pytest
+
+from benchmarks.common import grid_graph, random_geometric_graph, random_queries
+from routing import SEARCH_MODES, ContractionHierarchy, shortest_path
+
+GRAPHS = [(300 + 100 * seed, 3 + seed % 3, seed) for seed in range(6)]
+
+
+def path_cost(graph, path):
+    """Sum the cheapest edge weight along a node-ID path"""
+    total = 0.0
+    for u, v in zip(path, path[1:]):
+        targets, weights = graph.neighbours(u)
+        total += min(w for t, w in zip(targets, weights) if t == v)
+    return total
+
+
+def assert_matches(graph, result, source, target, expected):
+    if expected == math.inf:
+        assert result.path is None
+        return
+    assert result.path[0] == source and result.path[-1] == target
+    assert result.distance == pytest.approx(expected, rel=1e-9, abs=1e-12)
+    assert path_cost(graph, result.path) == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("nodes, k, seed", GRAPHS)
+def test_modes_match_dijkstra(nodes, k, seed):
+    graph = random_geometric_graph(nodes, k=k, seed=seed)
+    hierarchy = ContractionHierarchy.build(graph)
+    for source, target in random_queries(graph, 40, seed=seed):
+        expected = shortest_path(graph, source, target).distance
+        for mode in SEARCH_MODES:
+            assert_matches(graph, shortest_path(graph, source, target, mode=mode), source, target, expected)
+        assert_matches(graph, hierarchy.shortest_path(source, target), source, target, expected)
+
+
+def test_grid_same_node_and_unknown_mode():
+    graph = grid_graph(400, seed=3)
+    for mode in SEARCH_MODES:
+        result = shortest_path(graph, 7, 7, mode=mode)
+        assert result.path == [7] and result.distance == 0.0
+    with pytest.raises(ValueError):
+        shortest_path(graph, 0, 1, mode="teleport")
@@ -0,0 +1,78 @@
+"""HTTP service: routes, matrices and contraction-hierarchy startup"""
+import asyncio
+import json
+
+import pytest
+
+from routing import RoutingEngine
+from routing.service import RouteService
+from routing.snapshot import read_snapshot_header
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / "net.snapshot")
+    RoutingEngine(snapshot_file=path).load()
+    return path
+
+
+async def request(port, method, target, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    payload = json.loads(await reader.readexactly(length))
+    writer.close()
+    return status, payload
+
+
+def run_service(service, *requests):
+    """Start ``service``, send ``requests`` ((method, target, payload) tuples) and return the answers"""
+    async def main():
+        started = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(service.serve("127.0.0.1", 0, ready=started.set_result))
+        port = await started
+        try:
+            return [await request(port, *item) for item in requests]
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    return asyncio.run(main())
+
+
+def test_ch_needs_flag(snapshot):
+    service = RouteService(RoutingEngine.from_snapshot(snapshot), workers=0)
+    [(status, payload)] = run_service(service, ("GET", "/route?start=Bus%20Stand&end=Civil%20Hospital&mode=ch"))
+    assert status == 400 and "--ch" in payload["error"]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_ch_built_once_before_workers(snapshot, workers):
+    engine = RoutingEngine.from_snapshot(snapshot)
+    service = RouteService(engine, workers=workers, ch=True)
+    answers = run_service(service,
+                          ("GET", "/route?start=Bus%20Stand&end=Civil%20Hospital&mode=ch", None),
+                          ("GET", "/route?start=Bus%20Stand&end=Civil%20Hospital", None))
+    assert engine.hierarchy is not None
+    (ch_status, ch), (status, plain) = answers
+    assert ch_status == status == 200
+    assert ch["cost"] == pytest.approx(plain["cost"])
+    # A read-only engine hands its hierarchy to the workers without rewriting the shared file
+    assert "ch_rank" not in read_snapshot_header(snapshot)["arrays"]
+
+
+def test_matrix(snapshot):
+    service = RouteService(RoutingEngine.from_snapshot(snapshot), workers=2)
+    ok, unknown = run_service(service,
+                              ("POST", "/matrix", {"sources": ["Bus Stand", "3"], "targets": ["Civil Hospital"]}),
+                              ("POST", "/matrix", {"sources": ["Nowhere"], "targets": ["Civil Hospital"]}))
+    assert ok[0] == 200 and ok[1]["sources"] == ["Bus Stand", 3]
+    assert len(ok[1]["costs"]) == 2 and ok[1]["costs"][0][0] > 0
+    assert unknown[0] == 400 and "Nowhere" in unknown[1]["error"]
@@ -0,0 +1,46 @@
+"""Snapshots must give back the graph and hierarchy they were saved from"""
+import numpy as np
+import pytest
+
+from benchmarks.common import random_geometric_graph
+from routing import ContractionHierarchy, StaleSnapshotError, knn_graph, load_snapshot, save_snapshot
+
+
+@pytest.fixture
+def graph():
+    return random_geometric_graph(400, seed=5)
+
+
+def test_round_trip(tmp_path, graph):
+    path = tmp_path / "net.snapshot"
+    hierarchy = ContractionHierarchy.build(graph)
+    save_snapshot(path, graph, source={"road_file": "district.osm"}, hierarchy=hierarchy)
+
+    snapshot = load_snapshot(path, source={"road_file": "district.osm"})
+    assert snapshot.source == {"road_file": "district.osm"}
+    assert snapshot.graph.fingerprint() == graph.fingerprint()
+    for name in ("coords", "offsets", "targets", "weights"):
+        np.testing.assert_array_equal(getattr(snapshot.graph, name), getattr(graph, name))
+    assert snapshot.hierarchy.matches(snapshot.graph)
+    for source, target in [(0, 399), (17, 250), (300, 3)]:
+        assert (snapshot.hierarchy.shortest_path(source, target).distance
+                == pytest.approx(hierarchy.shortest_path(source, target).distance))
+
+
+def test_names_and_no_hierarchy(tmp_path):
+    coords = [(20.79 + i * 0.001, 76.69 + (i % 3) * 0.001) for i in range(8)]
+    names = [f"Place {i}" for i in range(8)]
+    path = tmp_path / "named.snapshot"
+    save_snapshot(path, knn_graph(coords, k=3, names=names, bidirectional=True))
+
+    snapshot = load_snapshot(path)
+    assert snapshot.hierarchy is None
+    assert list(snapshot.graph.names) == names
+    assert snapshot.graph.node_id("Place 5") == 5
+
+
+def test_stale_source(tmp_path, graph):
+    path = tmp_path / "net.snapshot"
+    save_snapshot(path, graph, source={"dummy_seed": 42})
+    with pytest.raises(StaleSnapshotError):
+        load_snapshot(path, source={"dummy_seed": 43})
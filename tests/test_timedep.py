@@ -0,0 +1,71 @@
+"""Earliest arrivals must be FIFO in the departure and reduce to Dijkstra under flat profiles"""
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.common import random_geometric_graph, random_queries
+from routing import dijkstra
+from routing.timedep import BUCKETS, SpeedProfiles, daily_profile, earliest_arrival, travel_minutes
+
+# Distance graphs are driven at 40 km/h free flow
+MINUTES_PER_KM = 60 / 40
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return random_geometric_graph(600, seed=7)
+
+
+@pytest.fixture(scope="module")
+def profiles(graph):
+    """Heavy rush hours near the centre, lighter ones further out"""
+    centre = tuple(graph.coords.mean(axis=0))
+    return SpeedProfiles.by_zone(graph, centre, [
+        (0.4, daily_profile([(8.5, 1.0), (18.0, 1.0)], slowest=0.25)),
+        (math.inf, daily_profile([(8.5, 1.5), (18.0, 1.5)], slowest=0.7)),
+    ])
+
+
+def test_edges_are_fifo(profiles):
+    starts = np.arange(0, 36 * 60, 0.5).tolist()
+    for factors in profiles.profile_lists()[0]:
+        for free_flow in (0.2, 3.0, 40.0):
+            arrivals = [start + travel_minutes(factors, start, free_flow) for start in starts]
+            assert all(later >= earlier - 1e-9 for earlier, later in zip(arrivals, arrivals[1:]))
+
+
+@pytest.mark.parametrize("guided", [False, True])
+def test_leaving_later_never_arrives_earlier(graph, profiles, guided):
+    departures = np.arange(6 * 60, 21 * 60, 20.0)
+    for source, target in random_queries(graph, 12, seed=3):
+        arrivals = [earliest_arrival(graph, profiles, source, target, departure, MINUTES_PER_KM,
+                                     guided=guided).arrival for departure in departures]
+        assert all(later >= earlier - 1e-9 for earlier, later in zip(arrivals, arrivals[1:]))
+        # Rush hour makes some trips slower than at free flow, never faster
+        static = dijkstra(graph, source, target)[0][target] * MINUTES_PER_KM
+        assert all(arrival - departure >= static - 1e-9 for arrival, departure in zip(arrivals, departures))
+
+
+def test_guided_matches_unguided(graph, profiles):
+    for source, target in random_queries(graph, 20, seed=4):
+        for departure in (7 * 60 + 50, 12 * 60, 17 * 60 + 45):
+            guided = earliest_arrival(graph, profiles, source, target, departure, MINUTES_PER_KM)
+            unguided = earliest_arrival(graph, profiles, source, target, departure, MINUTES_PER_KM,
+                                        guided=False)
+            assert guided.arrival == pytest.approx(unguided.arrival)
+
+
+@pytest.mark.parametrize("factor", [1.0, 0.5])
+def test_flat_profiles_match_dijkstra(graph, factor):
+    profiles = SpeedProfiles(np.full((1, BUCKETS), factor), np.zeros(graph.num_edges, dtype=np.int32))
+    for source, target in random_queries(graph, 20, seed=5):
+        static = dijkstra(graph, source, target)[0][target] * MINUTES_PER_KM / factor
+        for departure in (0.0, 8 * 60 + 7, 23 * 60 + 55):
+            for guided in (False, True):
+                result = earliest_arrival(graph, profiles, source, target, departure, MINUTES_PER_KM,
+                                          guided=guided)
+                assert result.arrival - departure == pytest.approx(static)
+                if result.path is not None:
+                    assert graph.path_length(result.path) * MINUTES_PER_KM / factor == pytest.approx(
+                        static)